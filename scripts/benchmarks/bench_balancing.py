@@ -0,0 +1,91 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Compares the balancing modes of train-model.py's in-memory pipeline:
+the original resample + concat against sample weights, undersampling
+and streamed balanced minibatches (balancing.py). Each run happens in
+a fresh child process so peak RSS is per mode
+
+F1 is scored on a fresh, independently generated corpus, since the
+concat path's own held-out F1 is inflated by duplicated rows
+
+Usage
+
+      python3 bench_balancing.py                 # 50k, 200k rows
+      python3 bench_balancing.py 1000000
+
+Ian Ferguson | Stanford University
+"""
+
+# ----- Imports
+import os, sys, time, json, tempfile, subprocess, warnings
+warnings.filterwarnings('ignore')
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from storage import write_table
+from synthetic import labeled_tweets
+from harness import load_script, peak_rss_mb
+
+
+# ----- Globals
+MODES = ['concat', 'weights', 'undersample', 'stream']
+
+
+# ----- Functions
+def child(PATH, MODE):
+      """
+      PATH => Training table path without extension
+      MODE => Balancing mode
+
+      Runs inside the child process - trains once and prints a JSON result
+      """
+
+      from sklearn.metrics import f1_score
+
+      train_model = load_script('hate-speech-classifier/analysis/train-model.py')
+      data = train_model.clean_text_data(train_model.read_table(PATH, COLUMNS=['tweet', 'label']), 'tweet')
+
+      # Footprint before training, so the delta is the balancing + fit cost
+      base_mb = peak_rss_mb()
+
+      start = time.perf_counter()
+      model, _, _ = train_model.train_pipeline(data, BALANCE=MODE)
+      seconds = time.perf_counter() - start
+
+      fresh = train_model.clean_text_data(labeled_tweets(20_000, SEED=7), 'tweet')
+      f1 = f1_score(fresh['label'], model.predict(fresh['tweet']))
+
+      print(json.dumps({'seconds': seconds, 'peak_mb': peak_rss_mb(), 'base_mb': base_mb, 'f1': f1}))
+
+
+def measure(PATH, MODE):
+      out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', PATH, MODE],
+                           stdout=subprocess.PIPE, text=True, check=True).stdout
+
+      return json.loads(out)
+
+
+def main():
+      sizes = [int(x) for x in sys.argv[1:]] or [50_000, 200_000]
+
+      print(f"\n{'rows':>10} {'mode':<13}{'train (s)':>10}{'peak RSS (MB)':>15}{'over load (MB)':>16}{'F1 (fresh)':>12}")
+
+      for n in sizes:
+            with tempfile.TemporaryDirectory() as tmp:
+                  path = os.path.join(tmp, 'train')
+                  write_table(labeled_tweets(n), path, CSV_EXPORT=False)
+
+                  for mode in MODES:
+                        r = measure(path, mode)
+                        print(f"{n:>10,} {mode:<13}{r['seconds']:>10.2f}{r['peak_mb']:>15.0f}"
+                              f"{r['peak_mb'] - r['base_mb']:>16.0f}{r['f1']:>12.3f}")
+
+
+if __name__ == "__main__":
+      if len(sys.argv) > 1 and sys.argv[1] == '--child':
+            child(sys.argv[2], sys.argv[3])
+      else:
+            main()
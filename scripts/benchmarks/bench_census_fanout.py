@@ -0,0 +1,172 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Block group acquisition against a local fake Census API (no network):
+the streamed fan-out in scrape_census.py (one call per county, parts
+written as they land) against fetching every call first and stacking
+the frames in memory. Each mode runs in a fresh child process so peak
+RSS is per mode
+
+Usage
+
+      python3 bench_census_fanout.py                   # 10 states x 40 counties x 500 block groups
+      python3 bench_census_fanout.py 100 1000
+
+Ian Ferguson | Stanford University
+"""
+
+# ----- Imports
+import os, sys, time, json, zlib, tempfile, subprocess, threading, warnings
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+warnings.filterwarnings('ignore')
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../census-acquisition'))
+
+import pandas as pd
+
+# Before anything imports instrument.py, so the trace stays off
+from harness import peak_rss_mb
+from census_fetch import CensusFetcher
+from scrape_census import format_call, to_frame, cleanup_subcounty_data, parent_codes, scrape_subcounty, SUBCOUNTY
+from storage import write_table
+from synthetic import census_response, STATES
+
+
+# ----- Globals
+HERE = os.path.dirname(os.path.abspath(__file__))
+YEARS = ['2000', '2010', '2020']
+LATENCY = 0.02
+
+
+# ----- Functions
+def serve(API_DATA, COUNTIES, ROWS):
+      """
+      API_DATA => Parsed api_call.json
+      COUNTIES => Counties per state
+      ROWS => Block groups per county
+
+      Starts a fake Census API on localhost, returns (server, base URL)
+      """
+
+      class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                  parts = urlsplit(self.path)
+                  query = parse_qs(parts.query)
+                  year = parts.path.split('/')[2]
+
+                  level = query['for'][0].split(':')[0].replace(' ', '-')
+                  parent = dict(x.split(':') for x in query.get('in', []))
+
+                  if level == 'state':
+                        data = [census_response(API_DATA, year, 'state', 1, STATE=s)[1] for s in STATES]
+                        data = [census_response(API_DATA, year, 'state', 0)[0]] + data
+
+                  elif level == 'county':
+                        data = [census_response(API_DATA, year, 'county', 1, STATE=s, COUNTY=f'{c:03d}')[1]
+                                for s in STATES for c in range(1, COUNTIES + 1)]
+                        data = [census_response(API_DATA, year, 'county', 0)[0]] + data
+
+                  else:
+                        seed = zlib.crc32(self.path.encode())
+                        data = census_response(API_DATA, year, level, ROWS, SEED=seed, **{k.upper(): v for k, v in parent.items()})
+
+                  time.sleep(LATENCY)
+                  body = json.dumps(data).encode()
+
+                  self.send_response(200)
+                  self.send_header('Content-Length', str(len(body)))
+                  self.end_headers()
+                  self.wfile.write(body)
+
+            def log_message(self, *args):
+                  pass
+
+      server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+      threading.Thread(target=server.serve_forever, daemon=True).start()
+
+      return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def local_api(BASE_URL):
+      with open(os.path.join(HERE, '../census-acquisition/api_call.json')) as incoming:
+            api_data = json.load(incoming)
+
+      for year in YEARS:
+            api_data[year]['url'] = {k: v.replace('https://api.census.gov', BASE_URL) for k, v in api_data[year]['url'].items()}
+
+      return api_data
+
+
+def child(BASE_URL, MODE, IN_FLIGHT):
+      """
+      Runs inside the child process - acquires every block group once and prints a JSON result
+      """
+
+      api_data = local_api(BASE_URL)
+
+      with tempfile.TemporaryDirectory() as tmp:
+            fetcher = CensusFetcher(CACHE=os.path.join(tmp, 'cache'), MODE='refresh', WORKERS=8)
+            output = os.path.join(tmp, 'block-group-demographics')
+
+            start = time.perf_counter()
+
+            if MODE == 'stream':
+                  sys.stdout = open(os.devnull, 'w')
+                  sink = scrape_subcounty('', api_data, 'block-group', fetcher, YEARS, output, IN_FLIGHT=IN_FLIGHT)
+                  sys.stdout = sys.__stdout__
+
+                  rows = sum(e['rows'] for e in sink.entries)
+
+            else:
+                  # Everything in memory, then one table
+                  keys, urls = [], []
+
+                  for year in YEARS:
+                        for parent in parent_codes(fetcher, '', year, api_data, 'block-group'):
+                              keys.append(year)
+                              urls.append(format_call('', year, api_data, 'block-group', **dict(zip(SUBCOUNTY['block-group'], parent))))
+
+                  responses = fetcher.fetch_many(urls)
+                  frame = pd.concat([cleanup_subcounty_data(to_frame(r, api_data, 'block-group'), y) for y, r in zip(keys, responses)])
+
+                  write_table(frame, output, CSV_EXPORT=False)
+                  rows = len(frame)
+
+            seconds = time.perf_counter() - start
+
+      print(json.dumps({'seconds': seconds, 'rows': rows, 'peak_mb': peak_rss_mb()}))
+
+
+def measure(BASE_URL, MODE, IN_FLIGHT):
+      out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', BASE_URL, MODE, str(IN_FLIGHT)],
+                           stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, check=True).stdout
+
+      return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+      counties = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+      rows = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+      server, base_url = serve(local_api('https://api.census.gov'), counties, rows)
+
+      print(f'\n{len(STATES)} states x {counties} counties x {rows} block groups x {len(YEARS)} years | {LATENCY * 1000:.0f} ms latency\n')
+      print(f"{'mode':<12}{'in flight':>10}{'seconds':>10}{'rows':>12}{'rows/sec':>12}{'peak RSS (MB)':>15}")
+
+      for mode, in_flight in [('collect', 0), ('stream', 4), ('stream', 16)]:
+            result = measure(base_url, mode, in_flight)
+
+            print(f"{mode:<12}{in_flight or '-':>10}{result['seconds']:>10.2f}{result['rows']:>12,}"
+                  f"{result['rows'] / result['seconds']:>12,.0f}{result['peak_mb']:>15.0f}")
+
+      server.shutdown()
+
+
+if __name__ == "__main__":
+      if len(sys.argv) > 1 and sys.argv[1] == '--child':
+            child(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+      else:
+            main()
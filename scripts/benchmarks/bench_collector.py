@@ -0,0 +1,67 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Measures collection throughput of the asyncio engine against a local
+fake_twitter.py server (no network). The same places are scraped one at
+a time and then concurrently, under the same simulated rate limit
+
+Usage
+
+      python3 bench_collector.py                       # 60 places x 200 tweets
+      python3 bench_collector.py 200 500
+
+Ian Richard Ferguson | Stanford University
+"""
+
+# ----- Imports
+import os, sys, time, asyncio
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../hate-speech-classifier'))
+
+from collector import HTTPClient, RateLimitScheduler, collect_places
+from fake_twitter import serve
+
+
+# ----- Globals
+LIMIT, WINDOW, LATENCY = 300, 5.0, 0.05
+
+
+# ----- Functions
+def run(BASE_URL, JOBS, COUNT, CONCURRENCY):
+      """
+      Scrapes every job once, returns (seconds, tweets)
+      """
+
+      tweets = []
+      scheduler = RateLimitScheduler({'search': (LIMIT, WINDOW), 'reverse_geocode': (LIMIT, WINDOW)})
+
+      start = time.perf_counter()
+      asyncio.run(collect_places(HTTPClient(BASE_URL), JOBS, COUNT, lambda job, s: tweets.append(len(s)),
+                                 CONCURRENCY=CONCURRENCY, SCHEDULER=scheduler))
+
+      return time.perf_counter() - start, sum(tweets)
+
+
+def main():
+      n_places = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+      count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+      jobs = [(f'{i:05d}', f'place{i:011d}', 'high') for i in range(n_places)]
+
+      print(f'\n{n_places} places x {count} tweets | limit {LIMIT} req / {WINDOW:.0f}s | {LATENCY * 1000:.0f} ms latency\n')
+      print(f"{'concurrency':>12}{'seconds':>10}{'tweets':>10}{'tweets/sec':>12}")
+
+      for concurrency in [1, 4, 16, 64]:
+            # Fresh server per run so every run starts with a full window
+            server, base_url = serve(LIMIT=LIMIT, WINDOW=WINDOW, TWEETS_PER_PLACE=count, LATENCY=LATENCY)
+
+            seconds, tweets = run(base_url, jobs, count, concurrency)
+            server.shutdown()
+
+            print(f'{concurrency:>12}{seconds:>10.2f}{tweets:>10,}{tweets / seconds:>12,.0f}')
+
+
+if __name__ == "__main__":
+      main()
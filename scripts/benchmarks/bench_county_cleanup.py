@@ -0,0 +1,88 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Benchmarks the vectorized cleanup_county_data against the original
+row-wise implementation and confirms both write identical CSVs
+
+Usage
+
+      python3 bench_county_cleanup.py                    # 10k => 10M rows
+      python3 bench_county_cleanup.py 10000 100000       # custom sizes
+
+Ian Ferguson | Stanford University
+"""
+
+# ----- Imports
+import os, sys, time, warnings
+warnings.filterwarnings('ignore')
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../census-acquisition'))
+
+from scrape_census import cleanup_county_data
+from synthetic import county_frame
+
+
+# ----- Functions
+def legacy_cleanup_county_data(DF):
+      """
+      DF => Pandas DataFrame object
+
+      Original row-wise implementation, kept as the parity reference
+      """
+
+      new_order = ["year", "county_state", "total_pop",
+                   "white_pop", "total_pop2",
+                   "non_hispanic_pop", "hispanic_pop",
+                   "non_hispanic_white_pop",
+                   "state_code", "county_code"]
+
+      DF = DF[new_order]
+
+      DF['county_name'] = DF['county_state'].apply(lambda x: x.split(',')[0])
+      DF['state_name'] = DF['county_state'].apply(lambda x: x.split(',')[1])
+
+      def get_fips(DF):
+            state = DF['state_code']
+            county = DF['county_code']
+
+            return f"{state}{county}"
+
+      DF['fips'] = DF.apply(get_fips, axis=1)
+      to_drop = ['county_state', 'state_code', 'county_code', 'total_pop2']
+      DF = DF.drop(columns=to_drop)
+
+      new_order = ['year', 'state_name', 'county_name', 'fips'] + list(DF.columns[:5])
+      return DF[new_order].sort_values(by='state_name').reset_index(drop=True)
+
+
+def timed(FUNC, DF):
+      start = time.perf_counter()
+      out = FUNC(DF)
+
+      return out, time.perf_counter() - start
+
+
+def main():
+      sizes = [int(x) for x in sys.argv[1:]] or [10_000, 100_000, 1_000_000, 10_000_000]
+
+      print(f"\n{'rows':>12}{'legacy (s)':>14}{'vectorized (s)':>16}{'speedup':>10}  parity")
+
+      for n in sizes:
+            frame = county_frame(n)
+
+            legacy, t_legacy = timed(legacy_cleanup_county_data, frame.copy())
+            vector, t_vector = timed(cleanup_county_data, frame.copy())
+
+            # Parity is checked on the artifact we actually persist
+            same = legacy.to_csv(index=False) == vector.to_csv(index=False)
+
+            print(f"{n:>12,}{t_legacy:>14.3f}{t_vector:>16.3f}{t_legacy / t_vector:>9.1f}x  {'OK' if same else 'MISMATCH'}")
+
+            if not same:
+                  raise AssertionError(f'Output mismatch at {n:,} rows')
+
+
+if __name__ == "__main__":
+      main()
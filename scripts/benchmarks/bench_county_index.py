@@ -0,0 +1,77 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Times the county grid index in county_index.py - build time from
+GeoJSON and points/sec for assign_fips - and checks it against a
+brute-force ray cast over every county
+
+Usage
+
+      python3 bench_county_index.py                  # 1M points
+      python3 bench_county_index.py 5000000
+
+Ian Ferguson | Stanford University
+"""
+
+# ----- Imports
+import os, sys, json, tempfile
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from synthetic import county_geojson
+from harness import load_script, timed
+
+
+# ----- Functions
+def brute_force(INDEX, LON, LAT):
+      """
+      Every point against every county - the reference answer
+      """
+
+      result = np.full(len(LON), -1, dtype=np.int64)
+
+      for county in range(len(INDEX.fips)):
+            inside = INDEX.contains(county, LON, LAT) & (result < 0)
+            result[inside] = county
+
+      return result
+
+
+def main():
+      n_points = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+      county_index = load_script('hate-speech-classifier/county_index.py')
+      rng = np.random.default_rng(101)
+
+      with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'counties.json')
+
+            with open(path, 'w') as outgoing:
+                  json.dump(county_geojson(), outgoing)
+
+            index, build_s = timed(county_index.read_geojson, path)
+
+      lon = rng.uniform(-126, -65, size=n_points)
+      lat = rng.uniform(23, 51, size=n_points)
+
+      fips, assign_s = timed(index.assign_fips, lon, lat)
+
+      sample = slice(0, 2_000)
+      expected = brute_force(index, lon[sample], lat[sample])
+      matches = np.array_equal(index.locate(lon[sample], lat[sample]), expected)
+
+      print(f'\n{len(index.fips):,} counties | {len(index.edges):,} edges | build {build_s:.2f}s')
+      print(f'{n_points:,} points in {assign_s:.2f}s ({n_points / assign_s:,.0f} points/sec), '
+            f'{np.mean(fips == None):.1%} outside')
+      print(f'Matches brute force on {expected.size:,} points: {matches}')
+
+      if not matches:
+            print('\nack! the grid index disagrees with brute force')
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+      main()
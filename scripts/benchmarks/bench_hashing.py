@@ -0,0 +1,70 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Compares the in-memory CountVectorizer / TF-IDF pipeline against the
+out-of-core hashing path in train-model.py: F1, training time, saved
+model size and scoring latency, at several corpus sizes
+
+The pipeline's own F1 is measured on a split of the oversampled data
+(duplicates leak across the split), so both models are also scored on
+a fresh, independently generated corpus
+
+Usage
+
+      python3 bench_hashing.py                        # 20k, 100k, 500k rows
+      python3 bench_hashing.py 1000000
+
+Ian Ferguson | Stanford University
+"""
+
+# ----- Imports
+import os, sys, tempfile, warnings
+warnings.filterwarnings('ignore')
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from sklearn.metrics import f1_score
+from storage import write_table
+from synthetic import labeled_tweets
+from harness import load_script, timed
+
+
+# ----- Functions
+def main():
+      sizes = [int(x) for x in sys.argv[1:]] or [20_000, 100_000, 500_000]
+
+      train_model = load_script('hate-speech-classifier/analysis/train-model.py')
+      clean = train_model.clean_text_data
+
+      fresh = clean(labeled_tweets(20_000, SEED=7), 'tweet')
+
+      print(f"\n{'rows':>10} {'mode':<10}{'F1 (own)':>10}{'F1 (fresh)':>12}{'train (s)':>11}{'model (MB)':>12}{'score 20k (ms)':>16}")
+
+      for n in sizes:
+            with tempfile.TemporaryDirectory() as tmp:
+                  path = os.path.join(tmp, 'train')
+                  write_table(labeled_tweets(n), path, CSV_EXPORT=False)
+
+                  def pipeline():
+                        data = clean(train_model.read_table(path, COLUMNS=['tweet', 'label']), 'tweet')
+                        return train_model.train_pipeline(data)
+
+                  runs = {'pipeline': pipeline,
+                          'hashing': lambda: train_model.train_hashing(path)}
+
+                  for mode, func in runs.items():
+                        (model, f1, _), train_s = timed(func)
+                        predicted, score_s = timed(model.predict, fresh['tweet'])
+
+                        saved = os.path.join(tmp, f'model-{mode}')
+                        train_model.save_model(model, saved)
+                        size_mb = sum(os.path.getsize(os.path.join(saved, f)) for f in os.listdir(saved)) / 1e6
+                        f1_fresh = f1_score(fresh['label'], predicted)
+
+                        print(f'{n:>10,} {mode:<10}{f1:>10.3f}{f1_fresh:>12.3f}{train_s:>11.2f}{size_mb:>12.1f}{score_s * 1000:>16.0f}')
+
+
+if __name__ == "__main__":
+      main()
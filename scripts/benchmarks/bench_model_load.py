@@ -0,0 +1,70 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Load time of the legacy pickled pipeline vs. the memory-mapped model
+directory from model_format.py, plus a decision_function parity check
+
+Usage
+
+      python3 bench_model_load.py                # 200k-term vocabulary
+      python3 bench_model_load.py 1000000
+
+Ian Ferguson | Stanford University
+"""
+
+# ----- Imports
+import os, sys, pickle, tempfile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../hate-speech-classifier/analysis'))
+
+import numpy as np
+from sklearn.pipeline import Pipeline
+from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
+from sklearn.linear_model import SGDClassifier
+
+from model_format import save_model, load_model
+from synthetic import tweet_text
+from harness import timed
+
+
+# ----- Functions
+def main():
+      vocab = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+
+      # Uniform draws over a large vocabulary so most terms make it in
+      texts = tweet_text(vocab // 2, VOCAB_SIZE=vocab, WORDS=(20, 40))
+      labels = np.arange(len(texts)) % 2
+
+      model = Pipeline([('vect', CountVectorizer()), ('tfidf', TfidfTransformer()), ('nb', SGDClassifier())])
+      model.fit(texts, labels)
+
+      with tempfile.TemporaryDirectory() as tmp:
+            legacy = os.path.join(tmp, 'model.sav')
+            saved = os.path.join(tmp, 'model')
+
+            with open(legacy, 'wb') as outgoing:
+                  pickle.dump(model, outgoing)
+
+            save_model(model, saved)
+
+            def unpickle():
+                  with open(legacy, 'rb') as incoming:
+                        return pickle.load(incoming)
+
+            _, pickle_s = timed(unpickle)
+            loaded, mmap_s = timed(load_model, saved)
+
+            same = np.allclose(model.decision_function(texts[:5_000]), loaded.decision_function(texts[:5_000]))
+
+            print(f"\n{len(model['vect'].vocabulary_):,} terms\n")
+            print(f"{'pickle.load':<16}{pickle_s * 1000:>10.1f} ms")
+            print(f"{'load_model':<16}{mmap_s * 1000:>10.1f} ms  parity {'OK' if same else 'MISMATCH'}")
+
+            if not same:
+                  raise AssertionError('load_model scores differ from the pickled pipeline')
+
+
+if __name__ == "__main__":
+      main()
@@ -0,0 +1,79 @@
+#!/bin/python3
+
+"""
+About this Script
+
+AFINN polarity two ways: the long-frame route semantics.R takes (one row
+per token, anti-join stop words, join the lexicon, group back by tweet)
+against the sparse tweet x term matrix in polarity.py. Both start from
+the same tokens and must give the same mean per tweet
+
+Usage
+
+      python3 bench_polarity.py                  # 100k, 1M tweets
+      python3 bench_polarity.py 500000
+
+Ian Ferguson | Stanford University
+"""
+
+# ----- Imports
+import os, sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../hate-speech-classifier/analysis'))
+
+from harness import timed, peak_rss_mb
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import CountVectorizer
+
+from polarity import PolarityIndex
+from text_normalize import normalize_series
+from synthetic import tweet_text
+
+
+# ----- Functions
+def long_frame_polarity(TOKENS, LEXICON, STOP_WORDS):
+      """
+      TOKENS => One token list per tweet
+      LEXICON => {word: score}
+
+      semantics.R's steps in pandas - returns mean score per tweet (NaN when nothing scored)
+      """
+
+      long = pd.DataFrame({'idx': np.repeat(np.arange(len(TOKENS)), [len(t) for t in TOKENS]),
+                           'word': [w for t in TOKENS for w in t]})
+
+      long = long[~long['word'].str.fullmatch(r'[0-9]*') & ~long['word'].isin(STOP_WORDS)]
+      long = long.merge(pd.DataFrame({'word': list(LEXICON), 'value': list(LEXICON.values())}), on='word')
+
+      return long.groupby('idx')['value'].mean().reindex(np.arange(len(TOKENS))).to_numpy()
+
+
+def main():
+      sizes = [int(x) for x in sys.argv[1:]] or [100_000, 1_000_000]
+
+      # Every third synthetic word carries a score
+      rng = np.random.default_rng(0)
+      lexicon = {f'w{i:05d}': int(rng.integers(-5, 6)) for i in range(0, 5_000, 3)}
+
+      index = PolarityIndex(lexicon, STEM=False)
+      analyze = CountVectorizer().build_analyzer()
+
+      print(f"\n{'tweets':>10}{'long frame (s)':>16}{'sparse (s)':>12}{'speedup':>9}{'match':>7}")
+
+      for n in sizes:
+            tokens = [analyze(t) for t in normalize_series(pd.Series(tweet_text(n)))]
+
+            long_mean, long_s = timed(long_frame_polarity, tokens, lexicon, index.stop_words)
+            (sparse_mean, _), sparse_s = timed(index.score_tokens, tokens)
+
+            same = np.allclose(long_mean, sparse_mean, equal_nan=True)
+
+            print(f'{n:>10,}{long_s:>16.2f}{sparse_s:>12.2f}{long_s / sparse_s:>8.1f}x{str(same):>7}')
+
+      print(f'\npeak RSS {peak_rss_mb():,.0f} MB')
+
+
+if __name__ == "__main__":
+      main()
@@ -0,0 +1,144 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Place ID planning against a local fake_twitter.py server (no network):
+
+      * reverse geocoding a county sample cold, then again from the cache
+      * scraping one job per (fips, place) pair against one job per
+        distinct place fanned out to every pair (scrape_twitter.plan_jobs)
+
+API calls are counted on the client, so the savings don't depend on latency
+
+Usage
+
+      python3 bench_scrape_plan.py                     # 300 counties x 100 tweets
+      python3 bench_scrape_plan.py 1000 200
+
+Ian Richard Ferguson | Stanford University
+"""
+
+# ----- Imports
+import os, sys, time, asyncio, tempfile, contextlib, io
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../hate-speech-classifier'))
+
+# Before anything imports instrument.py, so the trace stays off
+from harness import peak_rss_mb
+
+import numpy as np
+import pandas as pd
+
+from collector import HTTPClient, RateLimitScheduler, collect_places, geocode_all, statuses_to_frame
+from fake_twitter import serve
+from geocode_cache import GeocodeCache
+from generate_place_ids import resolve_places
+from scrape_twitter import plan_jobs, fan_out, TWEET_DTYPES
+from storage import PartitionedSink
+
+
+# ----- Globals
+LIMIT, WINDOW, LATENCY = 100_000, 5.0, 0.01
+
+
+# ----- Functions
+def scheduler():
+      return RateLimitScheduler({'search': (LIMIT, WINDOW), 'reverse_geocode': (LIMIT, WINDOW)})
+
+
+class CountingClient(HTTPClient):
+      """
+      HTTPClient that tallies calls per endpoint
+      """
+
+      def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.calls = {'search': 0, 'reverse_geocode': 0}
+
+      async def search(self, *args, **kwargs):
+            self.calls['search'] += 1
+            return await super().search(*args, **kwargs)
+
+      async def reverse_geocode(self, *args, **kwargs):
+            self.calls['reverse_geocode'] += 1
+            return await super().reverse_geocode(*args, **kwargs)
+
+
+def sample_counties(N, SEED=16):
+      """
+      Returns a geodata-like frame of N counties scattered over the lower 48
+      """
+
+      rng = np.random.default_rng(SEED)
+
+      return pd.DataFrame({'fips': [f'{i:05d}' for i in range(N)],
+                           'hispanic-pop-change': rng.choice(['low', 'mid', 'high'], N),
+                           'clat10': rng.uniform(25, 49, N),
+                           'clon10': rng.uniform(-124, -67, N)})
+
+
+def scrape(BASE_URL, JOBS, COUNT, OUTPUT):
+      """
+      Scrapes every job into a fresh sink, returns (seconds, search calls, rows written)
+      """
+
+      client = CountingClient(BASE_URL)
+      sink = PartitionedSink(OUTPUT, DTYPES=TWEET_DTYPES)
+
+      def flush(job, statuses):
+            targets, place = job
+            fips, dem_status = targets[0]
+            fan_out(statuses_to_frame(statuses, fips, place, dem_status).assign(county_fips=None), targets, place, sink)
+
+      start = time.perf_counter()
+      asyncio.run(collect_places(client, JOBS, COUNT, flush, CONCURRENCY=32, SCHEDULER=scheduler()))
+
+      return time.perf_counter() - start, client.calls['search'], sum(e['rows'] for e in sink.entries)
+
+
+def main():
+      n_counties = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+      count = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+      server, base_url = serve(LIMIT=LIMIT, GEO_LIMIT=LIMIT, WINDOW=WINDOW, TWEETS_PER_PLACE=count, LATENCY=LATENCY)
+      geodata = sample_counties(n_counties)
+
+      print(f'\n{n_counties} counties x {count} tweets per place | {LATENCY * 1000:.0f} ms latency\n')
+
+      with tempfile.TemporaryDirectory() as tmp:
+            cache = GeocodeCache(os.path.join(tmp, 'place-cache.sqlite'))
+
+            print(f"{'geocode':<16}{'API calls':>10}{'seconds':>10}")
+
+            for label in ['cold cache', 'warm cache']:
+                  client = CountingClient(base_url)
+                  lookup = lambda coords, on_result: asyncio.run(geocode_all(client, coords, CONCURRENCY=32, SCHEDULER=scheduler(),
+                                                                             ON_RESULT=on_result))
+                  start = time.perf_counter()
+
+                  with contextlib.redirect_stdout(io.StringIO()):
+                        resolve_places(geodata, lookup, cache)
+
+                  print(f"{label:<16}{client.calls['reverse_geocode']:>10,}{time.perf_counter() - start:>10.2f}")
+
+            cache.close()
+
+            # Deduplicated plan, then the same work expanded to one job per pair
+            jobs = plan_jobs(geodata, PartitionedSink(os.path.join(tmp, 'empty')))
+            pairs = [([target], place) for targets, place in jobs for target in targets]
+
+            print(f"\n{'scrape plan':<16}{'jobs':>10}{'API calls':>10}{'seconds':>10}{'rows':>12}")
+
+            for label, plan in [('per pair', pairs), ('deduplicated', jobs)]:
+                  seconds, calls, rows = scrape(base_url, plan, count, os.path.join(tmp, label.replace(' ', '-')))
+
+                  print(f'{label:<16}{len(plan):>10,}{calls:>10,}{seconds:>10.2f}{rows:>12,}')
+
+      server.shutdown()
+
+      print(f'\npeak RSS {peak_rss_mb():,.0f} MB')
+
+
+if __name__ == "__main__":
+      main()
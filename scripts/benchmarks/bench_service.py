@@ -0,0 +1,133 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Load test for serve-model.py on localhost: a synthetic model is served
+with micro-batching off (one tweet per batch) and on, and a separate
+load-generator process keeps N clients posting single tweets over
+keep-alive connections for a fixed time. Reports client-side throughput
+and p50 / p99 latency next to the service's own /metrics
+
+Usage
+
+      python3 bench_service.py                         # 32 clients, 5 s per config
+      python3 bench_service.py 64 10
+
+Ian Richard Ferguson | Stanford University
+"""
+
+# ----- Imports
+import os, sys, json, time, tempfile, subprocess, threading, http.client
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../hate-speech-classifier/analysis'))
+
+# Before anything imports instrument.py, so the trace stays off
+from harness import load_script, peak_rss_mb
+
+import numpy as np
+
+from model_format import save_model, load_model
+from text_normalize import clean_text_data
+from synthetic import labeled_tweets, tweet_text
+
+
+# ----- Globals
+# (max batch, max wait seconds) - (1, 0) scores every request on its own
+CONFIGS = [(1, 0.0), (16, 0.002), (64, 0.005), (256, 0.010)]
+
+
+# ----- Functions
+def load(BASE_URL, CLIENTS, SECONDS):
+      """
+      Runs inside the load-generator process - prints one JSON line of client-side results
+      """
+
+      host, port = BASE_URL.replace('http://', '').split(':')
+      texts = tweet_text(2_000, SEED=11)
+      latencies = [[] for _ in range(CLIENTS)]
+      stop = time.perf_counter() + SECONDS
+
+      def client(i):
+            connection = http.client.HTTPConnection(host, int(port))
+            n = i
+
+            while time.perf_counter() < stop:
+                  body = json.dumps({'tweet': texts[n % len(texts)]})
+                  start = time.perf_counter()
+
+                  connection.request('POST', '/score', body, {'Content-Type': 'application/json'})
+                  response = connection.getresponse()
+                  response.read()
+
+                  if response.status != 200:
+                        raise RuntimeError(f'HTTP {response.status}')
+
+                  latencies[i].append(time.perf_counter() - start)
+                  n += CLIENTS
+
+            connection.close()
+
+      threads = [threading.Thread(target=client, args=(i,)) for i in range(CLIENTS)]
+      start = time.perf_counter()
+
+      for t in threads:
+            t.start()
+
+      for t in threads:
+            t.join()
+
+      seconds = time.perf_counter() - start
+      flat = np.concatenate([np.array(l) for l in latencies]) * 1000
+
+      print(json.dumps({'requests': len(flat), 'seconds': seconds,
+                        'p50_ms': float(np.percentile(flat, 50)), 'p99_ms': float(np.percentile(flat, 99))}))
+
+
+def metrics(BASE_URL):
+      host, port = BASE_URL.replace('http://', '').split(':')
+      connection = http.client.HTTPConnection(host, int(port))
+      connection.request('GET', '/metrics')
+
+      return json.loads(connection.getresponse().read())
+
+
+def main():
+      clients = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+      seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+
+      serve_model = load_script('hate-speech-classifier/analysis/serve-model.py')
+      train_model = load_script('hate-speech-classifier/analysis/train-model.py')
+
+      with tempfile.TemporaryDirectory() as tmp:
+            model, _, _ = train_model.train_pipeline(clean_text_data(labeled_tweets(5_000, SEED=7), 'tweet'))
+            save_model(model, os.path.join(tmp, 'model'))
+            classifier = load_model(os.path.join(tmp, 'model'))
+
+            print(f'\n{clients} clients x {seconds:.0f} s per config | single-tweet requests\n')
+            print(f"{'max batch':>10}{'wait (ms)':>10}{'req/sec':>10}{'p50 (ms)':>10}{'p99 (ms)':>10}"
+                  f"{'mean batch':>12}{'server p99':>12}")
+
+            for max_batch, max_wait in CONFIGS:
+                  server, base_url, batcher, _ = serve_model.serve(classifier, PORT=0, MAX_BATCH=max_batch, MAX_WAIT=max_wait)
+
+                  out = subprocess.run([sys.executable, os.path.abspath(__file__), '--load', base_url, str(clients), str(seconds)],
+                                       stdout=subprocess.PIPE, text=True, check=True).stdout
+                  result = json.loads(out.strip().splitlines()[-1])
+                  served = metrics(base_url)
+
+                  server.shutdown()
+                  batcher.close()
+
+                  print(f"{max_batch:>10}{max_wait * 1000:>10.0f}{result['requests'] / result['seconds']:>10,.0f}"
+                        f"{result['p50_ms']:>10.1f}{result['p99_ms']:>10.1f}{served['mean_batch']:>12.1f}"
+                        f"{served['latency_p99_ms']:>12.1f}")
+
+      print(f'\npeak RSS {peak_rss_mb():,.0f} MB')
+
+
+if __name__ == "__main__":
+      if len(sys.argv) > 1 and sys.argv[1] == '--load':
+            load(sys.argv[2], int(sys.argv[3]), float(sys.argv[4]))
+      else:
+            main()
@@ -0,0 +1,88 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Sharded scoring in deploy-model.py from 1 to N worker processes. Every
+worker memory-maps the same saved model (and reads the same lexicon), so
+only tweet text and scored columns cross process boundaries. Each run is
+checked against in-process score_frame for identical, in-order output
+
+Usage
+
+      python3 bench_sharded_scoring.py                 # 400k tweets, 1 .. cpu_count workers
+      python3 bench_sharded_scoring.py 1000000 8
+
+Ian Richard Ferguson | Stanford University
+"""
+
+# ----- Imports
+import os, sys, tempfile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../hate-speech-classifier/analysis'))
+
+# Before anything imports instrument.py, so the trace stays off
+from harness import load_script, timed, peak_rss_mb
+
+from model_format import save_model, load_model
+from polarity import load_lexicon
+from text_normalize import clean_text_data
+from synthetic import labeled_tweets, tweet_frame
+
+
+# ----- Functions
+def job_counts(MAX_JOBS):
+      counts, n = [], 1
+
+      while n < MAX_JOBS:
+            counts.append(n)
+            n *= 2
+
+      return counts + [MAX_JOBS]
+
+
+def main():
+      n_tweets = int(sys.argv[1]) if len(sys.argv) > 1 else 400_000
+      max_jobs = int(sys.argv[2]) if len(sys.argv) > 2 else max(2, os.cpu_count() or 1)
+
+      deploy = load_script('hate-speech-classifier/analysis/deploy-model.py')
+      train_model = load_script('hate-speech-classifier/analysis/train-model.py')
+
+      with tempfile.TemporaryDirectory() as tmp:
+            model_path, lexicon_path = os.path.join(tmp, 'model'), os.path.join(tmp, 'AFINN-111.txt')
+
+            model, _, _ = train_model.train_pipeline(clean_text_data(labeled_tweets(5_000, SEED=7), 'tweet'))
+            save_model(model, model_path)
+
+            # Every third synthetic word carries a score
+            with open(lexicon_path, 'w') as outgoing:
+                  outgoing.writelines(f'w{i:05d}\t{(i % 11) - 5}\n' for i in range(0, 5_000, 3))
+
+            tweets = tweet_frame(n_tweets)
+            classifier = load_model(model_path)
+
+            reference, serial_s = timed(deploy.score_frame, tweets.copy(), classifier, classifier.calibration,
+                                        load_lexicon(lexicon_path))
+
+            print(f'\n{n_tweets:,} tweets | {os.cpu_count()} cores available\n')
+            print(f"{'jobs':>6}{'seconds':>10}{'rows/sec':>12}{'speedup':>9}{'identical':>11}")
+            print(f"{'serial':>6}{serial_s:>10.2f}{n_tweets / serial_s:>12,.0f}{1:>8.2f}x{'-':>11}")
+
+            for jobs in job_counts(max_jobs):
+                  scorer = deploy.ShardedScorer(model_path, lexicon_path, jobs)
+
+                  # Warm the pool so worker start-up isn't timed
+                  scorer.score(tweets.head(1_000).copy())
+
+                  scored, seconds = timed(scorer.score, tweets.copy())
+                  scorer.close()
+
+                  same = scored.equals(reference)
+
+                  print(f'{jobs:>6}{seconds:>10.2f}{n_tweets / seconds:>12,.0f}{serial_s / seconds:>8.2f}x{str(same):>11}')
+
+      print(f'\npeak RSS {peak_rss_mb():,.0f} MB (parent only)')
+
+
+if __name__ == "__main__":
+      main()
@@ -0,0 +1,95 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Compares load time and peak RSS for the CSV artifacts against the
+Parquet tables written by storage.py. Each load runs in a fresh child
+process so peak RSS is not polluted by earlier runs
+
+Usage
+
+      python3 bench_storage.py                 # 1M synthetic tweets
+      python3 bench_storage.py 5000000
+
+Ian Ferguson | Stanford University
+"""
+
+# ----- Imports
+import os, sys, time, json, tempfile, subprocess
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from storage import read_table, write_table
+from synthetic import tweet_frame
+from harness import peak_rss_mb
+
+
+# ----- Globals
+CASES = {'csv (full)': {'FORMAT': 'csv'},
+         'parquet (full)': {'FORMAT': 'parquet'},
+         'parquet (Tweet, fips)': {'FORMAT': 'parquet', 'COLUMNS': ['Tweet', 'fips']},
+         'parquet (Tweet, fips | high)': {'FORMAT': 'parquet', 'COLUMNS': ['Tweet', 'fips'],
+                                          'FILTERS': [('hispanic-pop-change', '==', 'high')]}}
+
+
+# ----- Functions
+def child(PATH, CASE):
+      """
+      PATH => Table path without extension
+      CASE => Case name from CASES
+
+      Runs inside the child process - loads once and prints elapsed seconds
+      """
+
+      spec = CASES[CASE]
+      start = time.perf_counter()
+
+      if spec['FORMAT'] == 'csv':
+            import pandas as pd
+            DF = pd.read_csv(f'{PATH}.csv', dtype={'fips': str})
+      else:
+            DF = read_table(PATH, COLUMNS=spec.get('COLUMNS'), FILTERS=spec.get('FILTERS'))
+
+      print(json.dumps({'seconds': time.perf_counter() - start, 'rows': len(DF), 'peak_mb': peak_rss_mb()}))
+
+
+def measure(PATH, CASE):
+      """
+      PATH => Table path without extension
+      CASE => Case name from CASES
+
+      Returns (seconds, rows, peak RSS in MB) for one load in a child process
+      """
+
+      out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', PATH, CASE],
+                           stdout=subprocess.PIPE, text=True, check=True).stdout
+
+      result = json.loads(out)
+
+      return result['seconds'], result['rows'], result['peak_mb']
+
+
+def main():
+      n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+      with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'all-tweets-scraped')
+            write_table(tweet_frame(n_rows), path)
+
+            csv_mb = os.path.getsize(f'{path}.csv') / 1e6
+            pq_mb = os.path.getsize(f'{path}.parquet') / 1e6
+            print(f'\n{n_rows:,} tweets | CSV {csv_mb:.1f} MB | Parquet {pq_mb:.1f} MB\n')
+
+            print(f"{'case':<32}{'rows':>12}{'load (s)':>10}{'peak RSS (MB)':>15}")
+
+            for case in CASES:
+                  seconds, rows, rss = measure(path, case)
+                  print(f'{case:<32}{rows:>12,}{seconds:>10.2f}{rss:>15.0f}')
+
+
+if __name__ == "__main__":
+      if len(sys.argv) > 1 and sys.argv[1] == '--child':
+            child(sys.argv[2], sys.argv[3])
+      else:
+            main()
@@ -0,0 +1,71 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Parity check + throughput benchmark (tweets/sec) for the shared text
+normalizer against the original three-pass clean_text_data
+
+Usage
+
+      python3 bench_text_normalize.py                  # 1M synthetic tweets
+      python3 bench_text_normalize.py 5000000 8        # 5M tweets, up to 8 workers
+
+Ian Richard Ferguson | Stanford University
+"""
+
+# ----- Imports
+import os, sys, re, time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../hate-speech-classifier/analysis'))
+
+import pandas as pd
+from text_normalize import normalize_series
+from synthetic import tweet_text
+
+
+# ----- Functions
+def legacy_clean(SERIES):
+      """
+      Original implementation (lower => per-row uncompiled re.sub => strip)
+      """
+
+      SERIES = SERIES.str.lower()
+      SERIES = SERIES.apply(lambda x: re.sub(r"(@[A-Za-z0-9]+)|([^0-9A-Za-z \t])|(\w+:\/\/\S+)|^rt|http.+?", "", x))
+
+      return SERIES.str.strip()
+
+
+def main():
+      n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+      max_jobs = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+
+      tweets = pd.Series(tweet_text(n_rows), name='Tweet', dtype=object)
+
+      # Edge cases the regex branches care about
+      tweets.iloc[:8] = ['RT @someone: Hi!!', 'rt is not a retweet', 'see http://a.co/x now', '  @a @b  ',
+                         'HTTPS://T.CO/AbC', '@ab_cd://x y', 'İstanbul café 😀', 'httpx http']
+
+      cases = [('legacy (3 passes)', lambda: legacy_clean(tweets))]
+      cases += [(f'single pass, {j} job(s)', lambda j=j: normalize_series(tweets, N_JOBS=j, CHUNKSIZE=100_000))
+                for j in sorted({1, 2, max_jobs})]
+
+      reference = None
+      print(f"\n{n_rows:,} tweets\n\n{'case':<26}{'seconds':>10}{'tweets/sec':>14}  parity")
+
+      for name, func in cases:
+            start = time.perf_counter()
+            out = func()
+            seconds = time.perf_counter() - start
+
+            reference = out if reference is None else reference
+            same = out.tolist() == reference.tolist()
+
+            print(f'{name:<26}{seconds:>10.2f}{n_rows / seconds:>14,.0f}  {"OK" if same else "MISMATCH"}')
+
+            if not same:
+                  raise AssertionError(f'{name} does not match the legacy cleaner')
+
+
+if __name__ == "__main__":
+      main()
@@ -0,0 +1,74 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Small helpers shared by the benchmark scripts
+
+Ian Ferguson | Stanford University
+"""
+
+# ----- Imports
+import os, sys, time, resource, importlib.util
+
+
+# ----- Globals
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Benchmarks shouldn't append to the pipeline trace (instrument.py) unless asked to
+os.environ.setdefault('PIPELINE_TRACE', 'off')
+
+sys.path.append(ROOT)
+from instrument import maxrss_mb
+
+
+# ----- Functions
+def load_script(RELATIVE_PATH):
+      """
+      RELATIVE_PATH => Script path relative to scripts/ (e.g., hate-speech-classifier/analysis/train-model.py)
+
+      Imports a pipeline script whose file name isn't a valid module name
+      """
+
+      path = os.path.abspath(os.path.join(ROOT, RELATIVE_PATH))
+      name = os.path.basename(path)[:-3].replace('-', '_')
+
+      # Let the script find its own sibling modules
+      sys.path.insert(0, os.path.dirname(path))
+
+      spec = importlib.util.spec_from_file_location(name, path)
+      module = importlib.util.module_from_spec(spec)
+
+      # Registered so pool workers can unpickle its functions by name
+      sys.modules[name] = module
+      spec.loader.exec_module(module)
+
+      return module
+
+
+def timed(FUNC, *args, **kwargs):
+      """
+      Returns (result, seconds) for one call
+      """
+
+      start = time.perf_counter()
+      out = FUNC(*args, **kwargs)
+
+      return out, time.perf_counter() - start
+
+
+def peak_rss_mb():
+      """
+      Returns this process's peak RSS in MB
+
+      VmHWM resets on exec, unlike ru_maxrss, which would report the
+      parent's footprint at fork time
+      """
+
+      if os.path.exists('/proc/self/status'):
+            with open('/proc/self/status') as incoming:
+                  for line in incoming:
+                        if line.startswith('VmHWM:'):
+                              return int(line.split()[1]) / 1024
+
+      return maxrss_mb(resource.getrusage(resource.RUSAGE_SELF))
@@ -0,0 +1,292 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Times every pipeline stage on synthetic inputs at 1x / 10x / 100x its
+base size and compares the results against a stored baseline
+
+      census_json     => to_frame + compile_frames on Census-shaped JSON (3 years)
+      county_cleanup  => cleanup_county_data
+      dw_to_vector    => build_ideology_index + one lookup per state x congress x year
+      demo_change     => population_changes + binning (bin_by_demo_change.py)
+      clean_text      => clean_text_data
+      train           => train_pipeline (resample + concat)
+      predict         => predict with a memory-mapped model from model_format.py
+
+Each timing is the best of several runs. Timings are divided by a fixed
+calibration workload before they're compared, so a baseline recorded on
+one machine still means something on another. A case fails when it's more
+than --tolerance slower than its baseline (and at least --floor seconds
+slower, so tiny cases don't flap)
+
+Usage
+
+      python3 run_benchmarks.py                          # 1x, 10x, 100x
+      python3 run_benchmarks.py --scales 1 10 --only clean_text train
+      python3 run_benchmarks.py --update-baseline        # record baseline.json
+
+Exits 1 on a regression
+
+Ian Ferguson | Stanford University
+"""
+
+# ----- Imports
+import os, sys, json, time, argparse, platform, tempfile, warnings
+warnings.filterwarnings('ignore')
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, '../census-acquisition'))
+sys.path.append(os.path.join(HERE, '../hate-speech-classifier/analysis'))
+sys.path.append(os.path.join(HERE, '../hate-speech-classifier'))
+
+import numpy as np
+
+# Before anything imports instrument.py, so the trace stays off
+from harness import load_script
+from scrape_census import to_frame, compile_frames, cleanup_county_data
+from compile_frame import build_ideology_index, dw_to_vector
+from bin_by_demo_change import population_changes, add_legacy_columns
+from text_normalize import clean_text_data
+from model_format import save_model, load_model
+from synthetic import county_frame, county_panel, census_response, nominate_frame, labeled_tweets, STATES
+
+
+# ----- Globals
+BASELINE = os.path.join(HERE, 'baseline.json')
+
+with open(os.path.join(HERE, '../census-acquisition/api_call.json')) as incoming:
+      API_DATA = json.load(incoming)
+
+YEARS = ['2000', '2010', '2020']
+
+
+# ----- Functions
+def calibrate(REPEATS=10):
+      """
+      Returns seconds for a fixed mix of NumPy, pandas-style string and
+      pure Python work - the unit every timing is expressed in
+      """
+
+      rng = np.random.default_rng(0)
+      values = rng.random(1_000_000)
+      words = [f'word{i % 5_000}' for i in range(200_000)]
+
+      def work():
+            np.sort(values)
+            sum(len(w.lower()) for w in words)
+            {w: i for i, w in enumerate(words)}
+
+      return best_of(work, REPEATS)
+
+
+def best_of(FUNC, REPEATS):
+      """
+      Returns the fastest of REPEATS calls, in seconds
+      """
+
+      best = float('inf')
+
+      for _ in range(REPEATS):
+            start = time.perf_counter()
+            FUNC()
+            best = min(best, time.perf_counter() - start)
+
+      return best
+
+
+def setup_census(N):
+      responses = [census_response(API_DATA, year, 'county', N, SEED=i) for i, year in enumerate(YEARS)]
+
+      def run():
+            frames = []
+
+            for year, data in zip(YEARS, responses):
+                  temp = to_frame(data, API_DATA, 'county')
+                  temp['year'] = [year] * len(temp)
+                  frames.append(temp)
+
+            return compile_frames(frames, 'county')
+
+      return run
+
+
+def setup_county_cleanup(N):
+      frame = county_frame(N)
+      return lambda: cleanup_county_data(frame)
+
+
+def setup_dw(N):
+      data = nominate_frame(N)
+      keys = [(state, congress) for state in STATES.values() for congress in range(106, 118)] * len(YEARS)
+
+      def run():
+            index = build_ideology_index(data)
+            return [dw_to_vector(index, state, congress) for state, congress in keys]
+
+      return run
+
+
+def setup_demo_change(N):
+      panel = county_panel(N)
+      return lambda: add_legacy_columns(population_changes(panel))
+
+
+def setup_clean_text(N):
+      frame = labeled_tweets(N)
+      return lambda: clean_text_data(frame, 'tweet')
+
+
+def setup_train(N):
+      train_model = load_script('hate-speech-classifier/analysis/train-model.py')
+      data = clean_text_data(labeled_tweets(N), 'tweet')
+
+      return lambda: train_model.train_pipeline(data)
+
+
+def setup_predict(N, WORKDIR):
+      train_model = load_script('hate-speech-classifier/analysis/train-model.py')
+      path = os.path.join(WORKDIR, 'model')
+
+      # The model itself stays fixed - only the number of rows scored grows
+      if not os.path.exists(path):
+            model, _, _ = train_model.train_pipeline(clean_text_data(labeled_tweets(5_000, SEED=7), 'tweet'))
+            save_model(model, path)
+
+      texts = clean_text_data(labeled_tweets(N), 'tweet')['tweet']
+
+      return lambda: load_model(path).predict(texts)
+
+
+# Case => (setup, base rows)
+CASES = {'census_json': (setup_census, 3_200),
+         'county_cleanup': (setup_county_cleanup, 10_000),
+         'dw_to_vector': (setup_dw, 12_000),
+         'demo_change': (setup_demo_change, 3_200),
+         'clean_text': (setup_clean_text, 10_000),
+         'train': (setup_train, 5_000),
+         'predict': (setup_predict, 10_000)}
+
+
+def run_case(NAME, SCALE, REPEATS, WORKDIR):
+      """
+      NAME => Key in CASES
+      SCALE => Multiplier on the base row count
+      REPEATS => Timed runs (the best one counts)
+      WORKDIR => Scratch directory shared across cases
+
+      Returns (rows, seconds)
+      """
+
+      setup, base = CASES[NAME]
+      rows = base * SCALE
+
+      func = setup(rows, WORKDIR) if NAME == 'predict' else setup(rows)
+
+      # Big runs are long enough that one timing is stable
+      return rows, best_of(func, REPEATS if SCALE < 100 else 1)
+
+
+def compare(RESULTS, BASELINE_DATA, TOLERANCE, FLOOR, UNIT):
+      """
+      RESULTS => {case@scale: seconds}
+      BASELINE_DATA => Parsed baseline.json
+      TOLERANCE => Allowed slowdown (0.3 => 30%)
+      FLOOR => Slowdowns under this many seconds never fail
+      UNIT => This machine's calibration seconds
+
+      Returns list of (key, seconds, expected seconds, ratio, verdict)
+      """
+
+      ratio_machine = UNIT / BASELINE_DATA['calibration_seconds']
+      rows = []
+
+      for key, seconds in RESULTS.items():
+            if key not in BASELINE_DATA['cases']:
+                  rows.append((key, seconds, None, None, 'new'))
+                  continue
+
+            expected = BASELINE_DATA['cases'][key] * ratio_machine
+            ratio = seconds / expected
+
+            slow = ratio > 1 + TOLERANCE and seconds - expected > FLOOR
+            rows.append((key, seconds, expected, ratio, 'REGRESSION' if slow else 'ok'))
+
+      return rows
+
+
+def parse_args():
+      parser = argparse.ArgumentParser(description='Benchmark every pipeline stage against a stored baseline')
+      parser.add_argument('--scales', nargs='+', type=int, default=[1, 10, 100])
+      parser.add_argument('--only', nargs='+', choices=list(CASES), default=list(CASES))
+      parser.add_argument('--repeats', type=int, default=3)
+      parser.add_argument('--tolerance', type=float, default=0.3, help='Allowed slowdown (0.3 => 30%%)')
+      parser.add_argument('--floor', type=float, default=0.05, help='Ignore slowdowns under this many seconds')
+      parser.add_argument('--baseline', default=BASELINE)
+      parser.add_argument('--update-baseline', action='store_true', help='Write these timings as the new baseline')
+
+      return parser.parse_args()
+
+
+def main():
+      args = parse_args()
+
+      unit = calibrate()
+      print(f'\ncalibration: {unit:.3f}s\n')
+      print(f"{'case':<26}{'rows':>12}{'seconds':>10}")
+
+      results = {}
+
+      with tempfile.TemporaryDirectory() as workdir:
+            for name in args.only:
+                  for scale in args.scales:
+                        rows, seconds = run_case(name, scale, args.repeats, workdir)
+                        results[f'{name}@{scale}x'] = seconds
+
+                        print(f"{name + f'@{scale}x':<26}{rows:>12,}{seconds:>10.3f}", flush=True)
+
+      if args.update_baseline:
+            # Merge, so a partial run (--only / --scales) keeps everything else
+            existing = {'cases': {}}
+
+            if os.path.exists(args.baseline):
+                  with open(args.baseline) as incoming:
+                        existing = json.load(incoming)
+
+            # New timings are rescaled into the stored calibration unit, so
+            # the cases already on file don't move
+            calibration = existing.get('calibration_seconds', unit)
+            cases = dict(existing['cases'])
+            cases.update({k: round(v * calibration / unit, 4) for k, v in results.items()})
+
+            with open(args.baseline, 'w') as outgoing:
+                  json.dump({'calibration_seconds': round(calibration, 4),
+                             'machine': f'{platform.machine()} / {os.cpu_count()} CPU / Python {platform.python_version()}',
+                             'cases': dict(sorted(cases.items()))}, outgoing, indent=4)
+
+            print(f'\nBaseline written to {args.baseline}')
+            return
+
+      if not os.path.exists(args.baseline):
+            print('\nNo baseline on file - rerun with --update-baseline')
+            return
+
+      with open(args.baseline) as incoming:
+            baseline = json.load(incoming)
+
+      print(f"\n{'case':<26}{'seconds':>10}{'expected':>10}{'ratio':>8}  verdict")
+
+      report = compare(results, baseline, args.tolerance, args.floor, unit)
+
+      for key, seconds, expected, ratio, verdict in report:
+            expected = f'{expected:>10.3f}' if expected is not None else f"{'-':>10}"
+            ratio = f'{ratio:>8.2f}' if ratio is not None else f"{'-':>8}"
+            print(f'{key:<26}{seconds:>10.3f}{expected}{ratio}  {verdict}')
+
+      if any(r[-1] == 'REGRESSION' for r in report):
+            print('\nack! performance regression against the baseline')
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+      main()
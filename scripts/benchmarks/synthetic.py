@@ -0,0 +1,279 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Synthetic data generators shaped like the real pipeline inputs,
+so stages can be benchmarked without the ../../data tree
+
+Ian Ferguson | Stanford University
+"""
+
+# ----- Imports
+import numpy as np
+import pandas as pd
+
+
+# ----- Globals
+STATES = {'01': 'Alabama', '04': 'Arizona', '06': 'California', '12': 'Florida',
+          '13': 'Georgia', '17': 'Illinois', '36': 'New York', '48': 'Texas',
+          '51': 'Virginia', '53': 'Washington'}
+
+# Geography columns the API appends to each record
+GEOGRAPHIES = {'state': ['state'], 'county': ['state', 'county'],
+               'tract': ['state', 'county', 'tract'],
+               'block-group': ['state', 'county', 'tract', 'block group']}
+
+ABBREVS = {'Alabama': 'AL', 'Arizona': 'AZ', 'California': 'CA', 'Florida': 'FL', 'Georgia': 'GA',
+           'Illinois': 'IL', 'New York': 'NY', 'Texas': 'TX', 'Virginia': 'VA', 'Washington': 'WA'}
+
+
+# ----- Functions
+def county_frame(N_ROWS, SEED=101):
+      """
+      N_ROWS => Number of county-year rows
+      SEED => Seed for the NumPy generator
+
+      Returns a stacked, pre-cleanup county frame (the input to cleanup_county_data)
+      """
+
+      rng = np.random.default_rng(SEED)
+
+      state_codes = rng.choice(list(STATES.keys()), size=N_ROWS)
+      county_codes = pd.Series(rng.integers(1, 999, size=N_ROWS)).astype(str).str.zfill(3)
+      state_names = pd.Series(state_codes).map(STATES)
+
+      total = rng.integers(1_000, 5_000_000, size=N_ROWS)
+      share = lambda lo, hi: (total * rng.uniform(lo, hi, size=N_ROWS)).astype(int)
+
+      frame = pd.DataFrame({'county_state': 'County ' + county_codes + ', ' + state_names,
+                            'total_pop': total,
+                            'white_pop': share(0.3, 0.9),
+                            'total_pop2': total,
+                            'non_hispanic_pop': share(0.5, 0.95),
+                            'hispanic_pop': share(0.05, 0.5),
+                            'non_hispanic_white_pop': share(0.2, 0.8),
+                            'state_code': state_codes,
+                            'county_code': county_codes,
+                            'year': rng.choice(['2000', '2010', '2020'], size=N_ROWS)})
+
+      # The Census API hands every value back as a string
+      return frame.astype(str)
+
+
+def county_panel(N_COUNTIES, SEED=101, YEARS=(2000, 2010, 2020)):
+      """
+      N_COUNTIES => Number of counties
+      SEED => Seed for the NumPy generator
+      YEARS => Census years
+
+      Returns a cleaned county table (the output of cleanup_county_data) with
+      every county in every year, shares drifting between counts
+      """
+
+      rng = np.random.default_rng(SEED)
+
+      state_codes = rng.choice(list(STATES.keys()), size=N_COUNTIES)
+      fips = pd.Series(np.arange(N_COUNTIES)).astype(str).str.zfill(5)
+
+      total = rng.integers(1_000, 5_000_000, size=N_COUNTIES).astype(float)
+      hispanic = rng.uniform(0.01, 0.5, size=N_COUNTIES)
+      white = rng.uniform(0.3, 0.9, size=N_COUNTIES)
+
+      frames = []
+
+      for year in YEARS:
+            total = total * rng.uniform(0.9, 1.3, size=N_COUNTIES)
+            hispanic = np.clip(hispanic * rng.uniform(0.8, 1.6, size=N_COUNTIES), 0.001, 0.95)
+            white = np.clip(white * rng.uniform(0.85, 1.05, size=N_COUNTIES), 0.05, 0.99)
+
+            frames.append(pd.DataFrame({'year': year,
+                                        'state_name': pd.Series(state_codes).map(STATES),
+                                        'county_name': 'County ' + fips.str[2:],
+                                        'fips': fips,
+                                        'total_pop': total.astype(int),
+                                        'white_pop': (total * white).astype(int),
+                                        'non_hispanic_pop': (total * (1 - hispanic)).astype(int),
+                                        'hispanic_pop': (total * hispanic).astype(int)}))
+
+      counts = ['year', 'total_pop', 'white_pop', 'non_hispanic_pop', 'hispanic_pop']
+
+      return pd.concat(frames, ignore_index=True).astype({c: 'Int64' for c in counts})
+
+
+def census_response(API_DATA, YEAR, ROI, N_ROWS, SEED=101, STATE=None, COUNTY=None):
+      """
+      API_DATA => Parsed api_call.json
+      YEAR => 2000, 2010, 2020
+      ROI => state, county, tract or block-group
+      N_ROWS => Number of geographies
+      SEED => Seed for the NumPy generator
+      STATE, COUNTY => Parent codes to pin (the in= clause of a sub-county call)
+
+      Returns decoded Census API JSON - a header row (NAME, the year's
+      census-vars, then the geography columns) followed by all-string records
+      """
+
+      rng = np.random.default_rng(SEED)
+
+      levels = GEOGRAPHIES[ROI]
+      header = ['NAME'] + API_DATA[YEAR]['census-vars'] + levels
+
+      state_codes = [STATE] * N_ROWS if STATE else rng.choice(list(STATES.keys()), size=N_ROWS)
+      county_codes = [COUNTY] * N_ROWS if COUNTY else [f'{x:03d}' for x in rng.integers(1, 999, size=N_ROWS)]
+      tract_codes = [f'{x:06d}' for x in rng.integers(100, 999_999, size=N_ROWS)]
+      group_codes = [str(x) for x in rng.integers(1, 9, size=N_ROWS)]
+
+      total = rng.integers(1_000, 5_000_000, size=N_ROWS)
+      counts = [(total * rng.uniform(lo, hi, size=N_ROWS)).astype(int) for lo, hi in
+                [(0.3, 0.9), (1, 1), (0.5, 0.95), (0.05, 0.5), (0.2, 0.8)]]
+
+      rows = []
+
+      for i in range(N_ROWS):
+            codes = {'state': str(state_codes[i]), 'county': county_codes[i],
+                     'tract': tract_codes[i], 'block group': group_codes[i]}
+
+            parts = {'state': STATES.get(state_codes[i], 'Alabama'), 'county': f'County {county_codes[i]}',
+                     'tract': f'Census Tract {tract_codes[i]}', 'block group': f'Block Group {group_codes[i]}'}
+
+            name = ', '.join(parts[level] for level in reversed(levels))
+
+            rows.append([name, str(total[i])] + [str(c[i]) for c in counts] + [codes[level] for level in levels])
+
+      return [header] + rows
+
+
+def nominate_frame(N_ROWS, SEED=101, CONGRESSES=(106, 117)):
+      """
+      N_ROWS => Number of lawmaker-congress rows
+      SEED => Seed for the NumPy generator
+      CONGRESSES => (first, last) session
+
+      Returns a frame shaped like the DW-NOMINATE lawmaker subset, with
+      longform state names already attached (the input to build_ideology_index)
+      """
+
+      rng = np.random.default_rng(SEED)
+      states = rng.choice(list(ABBREVS.keys()), size=N_ROWS)
+
+      return pd.DataFrame({'congress': rng.integers(CONGRESSES[0], CONGRESSES[1] + 1, size=N_ROWS),
+                           'state_abbrev': pd.Series(states).map(ABBREVS),
+                           'state': states,
+                           'nominate_dim1': rng.uniform(-1, 1, size=N_ROWS).round(3)})
+
+
+def tweet_text(N_ROWS, SEED=101, VOCAB_SIZE=5_000, WORDS=(5, 25)):
+      """
+      N_ROWS => Number of tweets
+      SEED => Seed for the NumPy generator
+      VOCAB_SIZE => Number of distinct synthetic words
+      WORDS => (min, max) words per tweet
+
+      Returns a list of tweet-like strings with mentions, links and punctuation
+      """
+
+      rng = np.random.default_rng(SEED)
+
+      vocab = np.array([f'w{i:05d}' for i in range(VOCAB_SIZE)])
+      extras = np.array(['@user123', 'https://t.co/abc123', 'RT', '!!', '#tag', 'http://x.co/q'])
+
+      lengths = rng.integers(WORDS[0], WORDS[1], size=N_ROWS)
+      words = vocab[rng.zipf(1.3, size=lengths.sum()) % VOCAB_SIZE]
+
+      # Sprinkle in tokens the text cleaner is supposed to strip
+      noisy = rng.random(len(words)) < 0.08
+      words[noisy] = extras[rng.integers(0, len(extras), size=noisy.sum())]
+
+      bounds = np.concatenate([[0], np.cumsum(lengths)])
+
+      return [' '.join(words[a:b]) for a, b in zip(bounds[:-1], bounds[1:])]
+
+
+def tweet_frame(N_ROWS, SEED=101):
+      """
+      N_ROWS => Number of tweets
+      SEED => Seed for the NumPy generator
+
+      Returns a frame shaped like all-tweets-scraped
+      """
+
+      rng = np.random.default_rng(SEED)
+
+      fips = pd.Series(rng.integers(1_001, 56_045, size=N_ROWS)).astype(str).str.zfill(5)
+      users = pd.Series(rng.integers(0, max(N_ROWS // 5, 1), size=N_ROWS)).astype(str)
+
+      return pd.DataFrame({'DateTime': pd.Timestamp('2021-06-01') + pd.to_timedelta(rng.integers(0, 86_400 * 30, size=N_ROWS), unit='s'),
+                           'UserName': 'User ' + users,
+                           'ScreenName': 'user_' + users,
+                           'Location': rng.choice(['', 'Austin, TX', 'Richmond, VA', 'Fresno, CA'], size=N_ROWS),
+                           'Tweet': tweet_text(N_ROWS, SEED),
+                           'Likes': rng.poisson(3, size=N_ROWS),
+                           'Retweets': rng.poisson(1, size=N_ROWS),
+                           'fips': fips,
+                           'hispanic-pop-change': rng.choice(['high', 'mid', 'low'], size=N_ROWS),
+                           'place_id': pd.Series(rng.integers(0, 2_000, size=N_ROWS)).map(lambda x: f'{x:016x}')})
+
+
+def labeled_tweets(N_ROWS, SEED=101, HATE_RATE=0.07):
+      """
+      N_ROWS => Number of labeled tweets
+      SEED => Seed for the NumPy generator
+      HATE_RATE => Share of rows labeled 1 (the real training set is ~7%)
+
+      Returns a frame shaped like hate-speech/train.csv (id, label, tweet).
+      Positive rows over-use a small block of marker words so there is
+      signal to learn, with overlap so the task isn't trivially separable
+      """
+
+      rng = np.random.default_rng(SEED)
+
+      label = (rng.random(N_ROWS) < HATE_RATE).astype(int)
+      text = tweet_text(N_ROWS, SEED)
+
+      markers = np.array([f'h{i:03d}' for i in range(200)])
+      n_markers = rng.poisson(np.where(label == 1, 2.0, 0.15))
+
+      tweet = [t + ' ' + ' '.join(rng.choice(markers, size=k)) if k else t for t, k in zip(text, n_markers)]
+
+      return pd.DataFrame({'id': np.arange(1, N_ROWS + 1), 'label': label, 'tweet': tweet})
+
+
+def county_geojson(NX=60, NY=50, SEED=101, POINTS_PER_EDGE=25):
+      """
+      NX, NY => Counties per row / column
+      SEED => Seed for the NumPy generator
+      POINTS_PER_EDGE => Vertices per side (real county outlines have hundreds)
+
+      Jittered grid of quadrilateral counties tiling the continental US
+      extent - neighbours share exact borders
+
+      Returns a GeoJSON FeatureCollection dictionary
+      """
+
+      rng = np.random.default_rng(SEED)
+
+      xs = np.linspace(-125, -66, NX + 1)
+      ys = np.linspace(24, 50, NY + 1)
+      gx, gy = np.meshgrid(xs, ys, indexing='ij')
+
+      # Move interior corners only, so the outer extent stays rectangular
+      step_x, step_y = (xs[1] - xs[0]) * 0.3, (ys[1] - ys[0]) * 0.3
+      gx[1:-1, 1:-1] += rng.uniform(-step_x, step_x, size=(NX - 1, NY - 1))
+      gy[1:-1, 1:-1] += rng.uniform(-step_y, step_y, size=(NX - 1, NY - 1))
+
+      t = np.linspace(0, 1, POINTS_PER_EDGE, endpoint=False)[:, None]
+      features = []
+
+      for i in range(NX):
+            for j in range(NY):
+                  corners = np.array([[gx[i, j], gy[i, j]], [gx[i + 1, j], gy[i + 1, j]],
+                                      [gx[i + 1, j + 1], gy[i + 1, j + 1]], [gx[i, j + 1], gy[i, j + 1]]])
+
+                  ring = np.vstack([a + t * (b - a) for a, b in zip(corners, np.roll(corners, -1, axis=0))])
+                  ring = np.vstack([ring, ring[:1]])
+
+                  features.append({'type': 'Feature', 'id': f'{i * NY + j + 1:05d}', 'properties': {},
+                                   'geometry': {'type': 'Polygon', 'coordinates': [ring.tolist()]}})
+
+      return {'type': 'FeatureCollection', 'features': features}
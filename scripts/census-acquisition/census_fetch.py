@@ -0,0 +1,237 @@
+#!/bin/python3
+
+"""
+About this Script
+
+* Pooled, retrying HTTP session for the Census API
+* Fans year x geography calls out over a thread pool
+* Streams large fan-outs (one call per state / county) with a bounded
+  number of calls in flight, so responses never pile up in memory
+* Persists raw responses in an on-disk, content-addressed cache
+* Replay mode serves every call from that cache and never touches the network
+
+Cache layout (keys never contain the API key)
+
+      <cache>/refs/<sha256 of stripped URL>.json    => {"url": ..., "object": ...}
+      <cache>/objects/<sha256 of response body>.json => raw response body
+
+Ian Ferguson | Stanford University
+"""
+
+# ----- Imports
+import os, json, hashlib, tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# ----- Globals
+CACHE_DIR = os.path.join('../../data/census-cache')
+MODES = ('online', 'refresh', 'replay')
+
+
+# ----- Functions
+def strip_key(URL):
+      """
+      URL => Complete API call from format_call
+
+      Drops the `key` query parameter so the API key never lands on disk
+      """
+
+      parts = urlsplit(URL)
+      query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k != 'key']
+
+      return urlunsplit(parts._replace(query=urlencode(query, safe=':*,')))
+
+
+def url_digest(URL):
+      """
+      URL => Complete API call from format_call
+
+      Returns the cache key for a call (sha256 of the key-stripped URL)
+      """
+
+      return hashlib.sha256(strip_key(URL).encode('utf-8')).hexdigest()
+
+
+def build_session(POOL_SIZE=8, RETRIES=5):
+      """
+      POOL_SIZE => Number of pooled connections per host
+      RETRIES => Max retries on connection errors / 429 / 5xx responses
+
+      Returns a requests.Session with connection pooling and exponential backoff
+      """
+
+      retry = Retry(total=RETRIES, backoff_factor=0.5,
+                    status_forcelist=[429, 500, 502, 503, 504],
+                    allowed_methods=['GET'])
+
+      adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry)
+
+      session = requests.Session()
+      session.mount('https://', adapter)
+      session.mount('http://', adapter)
+
+      return session
+
+
+class CensusFetcher:
+      """
+      CACHE => Directory for the content-addressed response cache
+      MODE => online (cache first, then network), refresh (always network), replay (cache only)
+      WORKERS => Max concurrent requests
+
+      Fetches Census API calls concurrently and returns decoded JSON
+      """
+
+      def __init__(self, CACHE=CACHE_DIR, MODE='online', WORKERS=6, TIMEOUT=60):
+            if MODE not in MODES:
+                  raise ValueError(f'Unknown fetch mode {MODE} - use one of {MODES}')
+
+            self.cache = CACHE
+            self.mode = MODE
+            self.workers = WORKERS
+            self.timeout = TIMEOUT
+            self.session = None if MODE == 'replay' else build_session(POOL_SIZE=WORKERS)
+
+            for sub in ['refs', 'objects']:
+                  os.makedirs(os.path.join(self.cache, sub), exist_ok=True)
+
+
+      def _ref_path(self, URL):
+            return os.path.join(self.cache, 'refs', f'{url_digest(URL)}.json')
+
+
+      def _object_path(self, DIGEST):
+            return os.path.join(self.cache, 'objects', f'{DIGEST}.json')
+
+
+      def _atomic_write(self, PATH, BODY):
+            # Write to a temp file in the same directory, then rename into place
+            handle, temp = tempfile.mkstemp(dir=os.path.dirname(PATH))
+
+            with os.fdopen(handle, 'wb') as outgoing:
+                  outgoing.write(BODY)
+
+            os.replace(temp, PATH)
+
+
+      def read_cache(self, URL):
+            """
+            URL => Complete API call
+
+            Returns cached response bytes, or None on a cache miss
+            """
+
+            ref = self._ref_path(URL)
+
+            if not os.path.exists(ref):
+                  return None
+
+            with open(ref) as incoming:
+                  digest = json.load(incoming)['object']
+
+            with open(self._object_path(digest), 'rb') as incoming:
+                  body = incoming.read()
+
+            # Objects are addressed by content, so a mismatch means corruption
+            if hashlib.sha256(body).hexdigest() != digest:
+                  raise OSError(f'Corrupt cache object {digest} for {strip_key(URL)}')
+
+            return body
+
+
+      def write_cache(self, URL, BODY):
+            """
+            URL => Complete API call
+            BODY => Raw response bytes
+
+            Stores response under its content hash and points the URL ref at it
+            """
+
+            digest = hashlib.sha256(BODY).hexdigest()
+            obj = self._object_path(digest)
+
+            if not os.path.exists(obj):
+                  self._atomic_write(obj, BODY)
+
+            ref = json.dumps({'url': strip_key(URL), 'object': digest}).encode('utf-8')
+            self._atomic_write(self._ref_path(URL), ref)
+
+
+      def fetch(self, URL):
+            """
+            URL => Complete API call
+
+            Returns decoded JSON for a single call, honoring the fetch mode
+            """
+
+            if self.mode != 'refresh':
+                  body = self.read_cache(URL)
+
+                  if body is not None:
+                        return json.loads(body)
+
+                  if self.mode == 'replay':
+                        raise OSError(f'Replay mode - no cached response for {strip_key(URL)}')
+
+            r = self.session.get(URL, timeout=self.timeout)
+            r.raise_for_status()
+
+            # The API answers 204 with no body when a geography has no rows
+            body = r.content or b'[]'
+            self.write_cache(URL, body)
+
+            return json.loads(body)
+
+
+      def fetch_many(self, URLS):
+            """
+            URLS => List of complete API calls
+
+            Fetches all calls concurrently, returns decoded JSON in input order
+            """
+
+            results = [None] * len(URLS)
+
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                  futures = {pool.submit(self.fetch, url): idx for idx, url in enumerate(URLS)}
+
+                  for future in as_completed(futures):
+                        results[futures[future]] = future.result()
+
+            return results
+
+
+      def fetch_iter(self, URLS, IN_FLIGHT=None):
+            """
+            URLS => Iterable of (key, complete API call) pairs
+            IN_FLIGHT => Max calls submitted but not yet consumed (defaults to 2 x WORKERS)
+
+            Yields (key, decoded JSON) in completion order. New calls are only
+            submitted as results are consumed, so at most IN_FLIGHT responses
+            are held in memory however many calls there are
+            """
+
+            window = IN_FLIGHT or 2 * self.workers
+            calls = iter(URLS)
+            pending = {}
+
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                  while True:
+                        for key, url in calls:
+                              pending[pool.submit(self.fetch, url)] = key
+
+                              if len(pending) >= window:
+                                    break
+
+                        if not pending:
+                              return
+
+                        finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+                        for future in finished:
+                              yield pending.pop(future), future.result()
@@ -4,19 +4,26 @@
 About this Script
 
 * Converts state abbreviation to long-form (VA - Virginia)
-* Reads in DW scores for all elected lawmakers from each state
-* Assigns vector to DataFrame
+* Indexes DW scores for all elected lawmakers by (state, congress)
+* Merges ideology vector + mean onto every demographic year in one pass
 
 Ian Ferguson | Stanford University
 """
 
 # ----- Imports
-import os, warnings, json
+import os, warnings, json, sys
 warnings.filterwarnings('ignore')
 
 import pandas as pd
 import numpy as np
-from tqdm import tqdm
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from storage import read_table, write_table
+from instrument import span, table_bytes
+
+# ----- Globals
+SESSIONS = {2000: 106, 2010: 111, 2020: 117}
+
 
 # ----- Functions
 def load_frames():
@@ -25,8 +32,9 @@ def load_frames():
       """
 
       data_dir = os.path.join('../../data')
-      ideo = pd.read_csv(os.path.join(data_dir, 'lawmaker-subset-106-117.csv'))
-      states = pd.read_csv(os.path.join(data_dir, 'state-demographics.csv'))
+      ideo = read_table(os.path.join(data_dir, 'lawmaker-subset-106-117'),
+                        COLUMNS=['state_abbrev', 'congress', 'nominate_dim1'])
+      states = read_table(os.path.join(data_dir, 'state-demographics'))
 
       with open('./states.json') as incoming:
             s_data = json.load(incoming)
@@ -34,62 +42,109 @@ def load_frames():
       return ideo, states, s_data
 
 
-def longform_state_id(X, STATE_DICT):
+def invert_state_dict(STATE_DICT):
       """
-      X => Incoming value from lambda function
       STATE_DICT => Dictionary with state names and abbreviations
 
-      Converts abbreviation to longform state (VA - Virginia)
+      Returns abbreviation => longform state map (VA - Virginia)
       """
 
-      for key, value in STATE_DICT.items():
-            if X == value:
-                  return key
+      return {value: key for key, value in STATE_DICT.items()}
 
 
-def dw_to_vector(DATA, STATE, SESSION):
+def congress_for_year(YEAR):
       """
-      DATA => Ideological data 
+      YEAR => Series of years (e.g., 2000)
+
+      Returns the session of Congress paired with each year. The original
+      demographic years keep their hand-picked sessions (2020 => 117, the first
+      Congress seated after the count); any other year maps to the Congress
+      seated in it (e.g., 1990 => 101)
+      """
+
+      seated = (YEAR - 1789) // 2 + 1
+
+      return YEAR.map(SESSIONS).fillna(seated).astype(int)
+
+
+def build_ideology_index(DATA):
+      """
+      DATA => Ideological data with longform state names
+
+      Sorts lawmakers once by (state, congress) and returns a dictionary of
+      (state, congress) => contiguous NumPy array of nominate_dim1 scores
+      """
+
+      # Stable sort keeps lawmakers in file order within each group
+      data = DATA.dropna(subset=['state']).sort_values(by=['state', 'congress'], kind='stable')
+
+      scores = np.ascontiguousarray(data['nominate_dim1'].to_numpy(dtype=float))
+      states = data['state'].to_numpy()
+      sessions = data['congress'].to_numpy()
+
+      # Row offsets where a new (state, congress) group begins
+      starts = np.flatnonzero((states[1:] != states[:-1]) | (sessions[1:] != sessions[:-1])) + 1
+      starts = np.concatenate([[0], starts]) if len(scores) else starts
+      bounds = np.append(starts, len(scores))
+
+      return {(states[a], int(sessions[a])): scores[a:b] for a, b in zip(bounds[:-1], bounds[1:])}
+
+
+def dw_to_vector(INDEX, STATE, SESSION):
+      """
+      INDEX => Output of build_ideology_index
       STATE => State of interest (e.g., Virginia)
       SESSION => Session of interest (e.g., 112)
 
       Returns a list of lawmaker ideology scores for the given state and session
       """
 
-      data = DATA[(DATA['state'] == STATE) & (DATA['congress'] == SESSION)].reset_index(drop=True)
+      return INDEX[(STATE, SESSION)].tolist() if (STATE, SESSION) in INDEX else []
 
-      if len(data) == 0:
-            return []
 
-      return list(data['nominate_dim1'])
+def ideology_table(INDEX):
+      """
+      INDEX => Output of build_ideology_index
+
+      Returns one row per (state, congress) with the ideology vector and its mean
+      """
+
+      keys = list(INDEX.keys())
+
+      return pd.DataFrame({'state': [k[0] for k in keys],
+                           'congress': [k[1] for k in keys],
+                           'ideo_vector': [v.tolist() for v in INDEX.values()],
+                           'ideo_mean': [v.mean() for v in INDEX.values()]})
 
 
 def main():
       # Read in data containers
-      ideo, demo, states = load_frames()
-
-      # Changes abbreviation to state name 
-      ideo['state'] = ideo['state_abbrev'].apply(lambda x: longform_state_id(x, states))
-      frames = []
+      with span('load') as s:
+            ideo, demo, states = load_frames()
+            s.add(rows_out=len(ideo) + len(demo),
+                  bytes_read=table_bytes('../../data/lawmaker-subset-106-117') + table_bytes('../../data/state-demographics'))
 
-      for year, session in zip([2000, 2010, 2020], [106, 111, 117]):
-            # Subset demographics data by year
-            temp = demo[demo['year'] == year].reset_index(drop=True)
+      with span('merge', rows_in=len(ideo) + len(demo)) as s:
+            # Changes abbreviation to state name
+            ideo['state'] = ideo['state_abbrev'].map(invert_state_dict(states))
 
-            # Create new vector column
-            temp['ideo_vector'] = temp['state'].apply(lambda x: dw_to_vector(ideo, x, session))
+            # Index every (state, congress) group once
+            index = build_ideology_index(ideo)
 
-            # Add dataframe to container
-            frames.append(temp)
+            # Pair each demographic year with its seated Congress (2000 => 106, 2020 => 117)
+            demo['congress'] = congress_for_year(demo['year'].astype(int))
 
-      # Combine dataframes
-      master = pd.concat(frames).sort_values(by='state')
+            # One merge attaches the vector + mean for every state and year
+            master = demo.merge(ideology_table(index), on=['state', 'congress'], how='left')
+            master['ideo_vector'] = [x if isinstance(x, list) else [] for x in master['ideo_vector']]
 
-      # Create average ideology column per year/state/session
-      master['ideo_mean'] = master['ideo_vector'].apply(lambda x: np.mean(x))
+            master = master.drop(columns=['congress']).sort_values(by='state')
+            s.add(rows_out=len(master))
 
-      # Save CSV locally
-      master.to_csv('../../data/state-ideo-data.csv', index=False)
+      # Save Parquet + CSV locally
+      with span('write', rows_out=len(master)) as s:
+            write_table(master, '../../data/state-ideo-data')
+            s.add(bytes_written=table_bytes('../../data/state-ideo-data'))
 
       print('\nSaved to data directory')
 
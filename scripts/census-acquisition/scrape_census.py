@@ -7,6 +7,19 @@ About this Script
 
 * Downloads state-wise racial demographic information from 2010 and 2020
 * Compiles resulting data in a DataFrame, with two rows per state (one / year)
+* Year x geography calls run concurrently and are cached in ../../data/census-cache
+* Tracts and block groups can only be queried within a state / county, so
+  those levels fan out into one call per parent geography. Responses stream
+  into a partitioned table (../../data/<level>-demographics/, one part per
+  year x parent) with a bounded number of calls in flight, and a rerun
+  skips every part already on disk
+
+Usage
+
+      python3 scrape_census.py state county            # cached, network on cache miss
+      python3 scrape_census.py county --refresh        # always hit the API, update cache
+      python3 scrape_census.py county --replay         # serve from cache only (no key needed)
+      python3 scrape_census.py tract block-group --in-flight=16
 
 Ian Ferguson | Stanford University
 """
@@ -18,22 +31,44 @@ warnings.filterwarnings('ignore')
 import pandas as pd
 from tqdm import tqdm
 
+from census_fetch import CensusFetcher
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from storage import write_table, PartitionedSink
+from instrument import span, table_bytes
+
+
+# ----- Globals
+# Sub-county level => parent geographies each call has to be scoped to
+SUBCOUNTY = {'tract': ['state'], 'block-group': ['state', 'county']}
+
+COUNTS = ['total_pop', 'white_pop', 'non_hispanic_pop', 'hispanic_pop', 'non_hispanic_white_pop']
+
+SUBCOUNTY_DTYPES = {'year': 'Int64', **{var: 'Int64' for var in COUNTS}}
+
 
 # ----- Functions
-def load_API():
+def load_API(REQUIRE_KEY=True):
       """
+      REQUIRE_KEY => If False, a missing API key is allowed (replay mode)
+
       Reads in API key (txt) and year-wise API parameters (JSON)
       """
 
-      for file in ['SECRET_api-key.txt', 'api_call.json']:
+      required = ['SECRET_api-key.txt', 'api_call.json'] if REQUIRE_KEY else ['api_call.json']
+
+      for file in required:
             # Confirm that both relevant files exist
             temp = os.path.join('.', file)
 
             if not os.path.exists(temp):
                   raise OSError(f'Looks like {file} does not exist...')
 
-      with open('./SECRET_api-key.txt') as incoming:
-            key = incoming.read().replace('\n', '')
+      key = ''
+
+      if os.path.exists('./SECRET_api-key.txt'):
+            with open('./SECRET_api-key.txt') as incoming:
+                  key = incoming.read().replace('\n', '')
 
       with open('./api_call.json') as incoming:
             call = json.load(incoming)
@@ -48,12 +83,13 @@ def load_API():
       return key, call
 
 
-def format_call(API_KEY, YEAR, API_DATA, ROI):
+def format_call(API_KEY, YEAR, API_DATA, ROI, **PARENT):
       """
       API_KEY => Valid key from Census.gov
       YEAR => 2000, 2010, 2020
       API_DATA => Dictionary object
-      ROI => Region of interest, STATE or COUNTY
+      ROI => Region of interest, STATE, COUNTY, TRACT or BLOCK-GROUP
+      PARENT => Fills the named placeholders of sub-county templates (state=, county=)
 
       This function creates a complete API call
       """
@@ -61,42 +97,54 @@ def format_call(API_KEY, YEAR, API_DATA, ROI):
       base_url = API_DATA[YEAR]['url'][ROI]
       vars = ",".join(API_DATA[YEAR]['census-vars'])
       
-      return base_url.format(vars, API_KEY)
+      return base_url.format(vars, API_KEY, **PARENT)
 
 
-def scrape_census(API_KEY, YEAR, API_DATA, ROI):
+def to_frame(DATA, API_DATA, ROI):
+      """
+      DATA => Decoded JSON from the Census API (header row + records)
+      API_DATA => Dictionary object
+      ROI => State or County, level of interest
+
+      Pushes an API response to a DataFrame with clean column names
+      """
+
+      frame = pd.DataFrame(DATA[1:], columns=DATA[0])
+
+      # Reassign column names
+      clean_vars = API_DATA['master'][ROI]
+      frame.columns = clean_vars
+
+      return frame
+
+
+def scrape_census(API_KEY, YEAR, API_DATA, ROI, FETCHER=None):
       """
       API_KEY => Valid key from Census.gov
       YEAR => 2000, 2010, 2020
       API_DATA => Dictionary object
       ROI => State or County, level of interest
+      FETCHER => Optional CensusFetcher (defaults to a cached online fetcher)
       """
 
       # Structure API call
       call = format_call(API_KEY=API_KEY, YEAR=YEAR, API_DATA=API_DATA, ROI=ROI)
-      
-      # Pull data into variable
-      r = requests.get(call)
-
-      # Read JSON information from obtained data
-      data = r.json()
 
-      # Push data to DataFrame object
-      frame = pd.DataFrame(data[1:], columns=data[0])
+      # Pull data into variable
+      fetcher = FETCHER or CensusFetcher()
+      data = fetcher.fetch(call)
 
-      # Reassign column names
-      clean_vars = API_DATA['master'][ROI]
-      frame.columns = clean_vars
-      
-      return frame
+      return to_frame(data, API_DATA, ROI)
 
 
 def cleanup_county_data(DF):
       """
       DF => Pandas DataFrame object
 
-      This function performs the following
-            * Compiles FIPS code
+      This function performs the following in one columnar pass (no row-wise apply)
+            * Splits "County, State" into county_name and state_name
+            * Compiles FIPS code from state and county codes
+            * Casts year and population counts to integer dtypes
       """
 
       new_order = ["year", "county_state", "total_pop",
@@ -110,49 +158,188 @@ def cleanup_county_data(DF):
       except Exception as e:
             raise ValueError(f"\nack! {e}")
 
-      DF['county_name'] = DF['county_state'].apply(lambda x: x.split(',')[0])
-      DF['state_name'] = DF['county_state'].apply(lambda x: x.split(',')[1])
+      # E.g., "Autauga County, Alabama" => ["Autauga County", " Alabama"]
+      names = DF['county_state'].str.split(',', n=2, expand=True)
 
-      def get_fips(DF):
-            state = DF['state_code']
-            county = DF['county_code']
+      # FIPS codes stay strings so leading zeros survive (01 + 001 => 01001)
+      fips = DF['state_code'].astype(str).str.cat(DF['county_code'].astype(str))
 
-            return f"{state}{county}"
+      # Census returns every value as a string
+      counts = ['total_pop', 'white_pop', 'non_hispanic_pop', 'hispanic_pop']
+      year = pd.to_numeric(DF['year']).astype('Int64')
 
-      DF['fips'] = DF.apply(get_fips, axis=1)
-      to_drop = ['county_state', 'state_code', 'county_code', 'total_pop2']
-      DF = DF.drop(columns=to_drop)
+      clean = pd.concat([year.rename('year'),
+                         names[1].rename('state_name'),
+                         names[0].rename('county_name'),
+                         fips.rename('fips'),
+                         year.rename('year'),
+                         DF[counts].apply(pd.to_numeric).astype('Int64')], axis=1)
 
-      new_order = ['year', 'state_name', 'county_name', 'fips'] + list(DF.columns[:5])
-      return DF[new_order].sort_values(by='state_name').reset_index(drop=True)
+      # NOTE: year is repeated to keep the legacy column layout (R drops year.1)
+      return clean.sort_values(by='state_name').reset_index(drop=True)
+
+
+def compile_frames(FRAMES, ROI):
+      """
+      FRAMES => List of per-year DataFrames
+      ROI => State or County, level of interest
+
+      Stacks per-year frames and applies ROI-specific cleanup
+      """
+
+      if ROI == "state":
+            return pd.concat(FRAMES).sort_values(by='state')
+
+      elif ROI == "county":
+            master = pd.concat(FRAMES).sort_values(by='county_state')
+            return cleanup_county_data(master)
+
+      raise ValueError(f"\nack! unknown region of interest {ROI}")
+
+
+def parent_codes(FETCHER, API_KEY, YEAR, API_DATA, ROI):
+      """
+      FETCHER => CensusFetcher
+      API_KEY => Valid key from Census.gov
+      YEAR => 2000, 2010, 2020
+      API_DATA => Dictionary object
+      ROI => TRACT or BLOCK-GROUP
+
+      Reads the year's state (or county) listing - one cached call - and
+      returns sorted parent code tuples, e.g. [('01',), ...] or [('01', '001'), ...]
+      """
+
+      levels = SUBCOUNTY[ROI]
+      data = FETCHER.fetch(format_call(API_KEY, YEAR, API_DATA, levels[-1]))
+
+      columns = [data[0].index(level) for level in levels]
+
+      return sorted({tuple(row[c] for c in columns) for row in data[1:]})
+
+
+def cleanup_subcounty_data(DF, YEAR):
+      """
+      DF => Output of to_frame for one tract / block group response
+      YEAR => 2000, 2010, 2020
+
+      Same idea as cleanup_county_data, in one columnar pass
+            * Splits the NAME into county_name and state_name
+            * Builds the county FIPS and the full GEOID
+            * Casts year and population counts to integer dtypes
+      """
+
+      codes = [c for c in ['state_code', 'county_code', 'tract_code', 'block_group_code'] if c in DF.columns]
+
+      # "Census Tract 201, Autauga County, Alabama" (2020 separates with semicolons)
+      names = DF.iloc[:, 0].str.replace(';', ',').str.rsplit(',', n=2, expand=True)
+
+      clean = pd.DataFrame({'year': pd.Series(int(YEAR), index=DF.index, dtype='Int64'),
+                            'state_name': names[2].str.strip(),
+                            'county_name': names[1].str.strip(),
+                            'fips': DF['state_code'].str.cat(DF['county_code']),
+                            'geoid': DF['state_code'].str.cat(DF[codes[1:]])})
+
+      return pd.concat([clean, DF[COUNTS].apply(pd.to_numeric).astype('Int64')], axis=1)
+
+
+def scrape_subcounty(API_KEY, API_DATA, ROI, FETCHER, YEARS, OUTPUT, IN_FLIGHT=None):
+      """
+      API_KEY => Valid key from Census.gov
+      API_DATA => Dictionary object
+      ROI => TRACT or BLOCK-GROUP
+      FETCHER => CensusFetcher
+      YEARS => List of years
+      OUTPUT => Directory for the partitioned table
+      IN_FLIGHT => Max calls in flight (see CensusFetcher.fetch_iter)
+
+      Issues one call per (year, parent geography) and writes each response
+      to its own part as it lands, so memory holds a handful of responses at most
+
+      Returns the PartitionedSink
+      """
+
+      sink = PartitionedSink(OUTPUT, DTYPES=SUBCOUNTY_DTYPES)
+      calls = []
+
+      for year in YEARS:
+            for parent in parent_codes(FETCHER, API_KEY, year, API_DATA, ROI):
+
+                  # Completed on a previous run
+                  if not sink.done((year, *parent)):
+                        url = format_call(API_KEY, year, API_DATA, ROI, **dict(zip(SUBCOUNTY[ROI], parent)))
+                        calls.append(((year, *parent), url))
+
+      print(f'{ROI}: {len(sink.completed)} parts checkpointed, {len(calls)} to go')
+
+      for key, data in tqdm(FETCHER.fetch_iter(calls, IN_FLIGHT), total=len(calls)):
+
+            # Parents with no rows come back empty - still checkpointed
+            frame = cleanup_subcounty_data(to_frame(data, API_DATA, ROI), key[0]) if len(data) > 1 else pd.DataFrame()
+            sink.write(frame, key)
+
+      return sink
 
 
 def main():
-      try:
-            roi = sys.argv[1].lower()
-      except:
-            raise OSError("\nack! missing command line argument - call STATE or COUNTY")
+      args = [x.lower() for x in sys.argv[1:]]
+      rois = [x for x in args if not x.startswith('--')]
+
+      if len(rois) == 0:
+            raise OSError("\nack! missing command line argument - call STATE, COUNTY, TRACT or BLOCK-GROUP")
+
+      in_flight = next((int(x.split('=')[1]) for x in args if x.startswith('--in-flight=')), None)
+
+      mode = 'online'
+
+      if '--replay' in args:
+            mode = 'replay'
+      elif '--refresh' in args:
+            mode = 'refresh'
 
       # Instantiate API key and request parameters
-      key, call = load_API()
+      key, call = load_API(REQUIRE_KEY=(mode != 'replay'))
+      fetcher = CensusFetcher(MODE=mode)
+
+      # Every year x geography call is independent, so fetch them all at once
+      years = ['2000', '2010', '2020']
+      jobs = [(roi, year) for roi in rois if roi not in SUBCOUNTY for year in years]
+      urls = [format_call(API_KEY=key, YEAR=year, API_DATA=call, ROI=roi) for roi, year in jobs]
+
+      with span('fetch', calls=len(urls), mode=mode) as s:
+            responses = fetcher.fetch_many(urls)
+            s.add(rows_out=sum(len(r) - 1 for r in responses))
+
+      for roi in rois:
+            if roi in SUBCOUNTY:
+                  # One call per state / county, streamed straight to disk
+                  output = f'../../data/{roi}-demographics'
+
+                  with span('fanout', roi=roi, mode=mode) as s:
+                        sink = scrape_subcounty(key, call, roi, fetcher, years, output, IN_FLIGHT=in_flight)
+                        s.add(rows_out=sum(e['rows'] for e in sink.entries), bytes_written=table_bytes(output))
+
+                  continue
 
-      # Empty list to append into
-      frames = []
+            # Empty list to append into
+            frames = []
 
-      for year in tqdm(['2000', '2010', '2020']):
-            temp = scrape_census(key, year, call, roi)
-            temp['year'] = [year] * len(temp)
-            frames.append(temp)
+            with span('parse', roi=roi) as s:
+                  for (job_roi, year), data in tqdm(zip(jobs, responses), total=len(jobs)):
+                        if job_roi != roi:
+                              continue
 
-      # Stack dataframes into one object and save locally
-      if roi.lower() == "state":
-            master = pd.concat(frames).sort_values(by='state')
+                        temp = to_frame(data, call, roi)
+                        temp['year'] = [year] * len(temp)
+                        frames.append(temp)
 
-      elif roi.lower() == "county":
-            master = pd.concat(frames).sort_values(by='county_state')
-            master = cleanup_county_data(master)
+                  # Stack dataframes into one object
+                  master = compile_frames(frames, roi)
+                  s.add(rows_in=sum(len(f) for f in frames), rows_out=len(master))
 
-      master.to_csv(f'../../data/{roi.lower()}-demographics.csv', index=False)
+            # Save locally
+            with span('write', roi=roi, rows_out=len(master)) as s:
+                  write_table(master, f'../../data/{roi}-demographics')
+                  s.add(bytes_written=table_bytes(f'../../data/{roi}-demographics'))
 
 
 if __name__ == "__main__":
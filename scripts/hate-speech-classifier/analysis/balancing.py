@@ -0,0 +1,92 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Class balancing without materializing resampled copies
+
+The original train-model.py oversamples by resample() + pd.concat, which
+duplicates every drawn minority Tweet and then vectorizes each copy again.
+Here the same draw is expressed as index arrays and integer sample weights
+
+* weights      => oversample as counts - each distinct row appears once,
+                  weighted by how many times resample() would have drawn it
+* undersample  => subset of the majority class, no weights
+* stream       => balanced minibatches of row indices for partial_fit; only
+                  one batch of (sparse) features is ever copied at a time
+
+Ian Richard Ferguson | Stanford University
+"""
+
+
+# ---- Imports
+import numpy as np
+
+
+# ---- Helpers
+def class_rows(LABELS):
+      """
+      LABELS => Array of binary labels
+
+      Returns (majority row indices, minority row indices)
+      """
+
+      labels = np.asarray(LABELS, dtype=int)
+      rows = np.arange(len(labels))
+
+      counts = np.bincount(labels, minlength=2)
+      minority = int(np.argmin(counts))
+
+      return rows[labels != minority], rows[labels == minority]
+
+
+def balanced_indices(LABELS, STRATEGY='weights', SEED=101):
+      """
+      LABELS => Array of binary labels
+      STRATEGY => weights or undersample
+      SEED => Random seed
+
+      Returns (row indices, integer sample weights or None)
+      """
+
+      rng = np.random.default_rng(SEED)
+      majority, minority = class_rows(LABELS)
+
+      if STRATEGY == 'weights':
+            # Draw with replacement exactly as oversampling would, then keep only the counts
+            drawn = np.bincount(rng.integers(0, len(minority), size=len(majority)), minlength=len(minority))
+            kept = drawn > 0
+
+            rows = np.concatenate([minority[kept], majority])
+            weights = np.concatenate([drawn[kept], np.ones(len(majority), dtype=np.int64)])
+
+            order = np.argsort(rows, kind='stable')
+            return rows[order], weights[order]
+
+      if STRATEGY == 'undersample':
+            return np.sort(np.concatenate([minority, rng.choice(majority, size=len(minority), replace=False)])), None
+
+      raise ValueError(f'Unknown balancing strategy {STRATEGY}')
+
+
+def balanced_batches(LABELS, BATCH_SIZE=10_000, SEED=101):
+      """
+      LABELS => Array of binary labels
+      BATCH_SIZE => Rows per batch (half majority, half minority)
+      SEED => Random seed
+
+      One pass over the shuffled majority class; every batch is topped up
+      with an equal number of minority rows drawn with replacement
+
+      Yields row index arrays
+      """
+
+      rng = np.random.default_rng(SEED)
+      majority, minority = class_rows(LABELS)
+
+      majority = rng.permutation(majority)
+      half = max(BATCH_SIZE // 2, 1)
+
+      for start in range(0, len(majority), half):
+            chunk = majority[start:start + half]
+            yield np.concatenate([chunk, rng.choice(minority, size=len(chunk), replace=True)])
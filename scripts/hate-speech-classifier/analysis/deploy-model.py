@@ -6,13 +6,52 @@ About this Script
 We'll apply our trained hate speech classifier to our
 corpus of novel tweets
 
+Scored tweets are written to data/tweet-data/all-tweets-scored so the
+append-only scrape under all-tweets-scraped/ is never overwritten
+
+Each tweet also gets its mean AFINN polarity (polarity.py) from the same
+tokens the classifier sees, so there's no separate scoring pass
+
+      python3 deploy-model.py                       # whole corpus in memory
+      python3 deploy-model.py --chunksize 200000    # fixed memory budget, streamed output
+      python3 deploy-model.py --no-polarity         # hate speech predictions only
+      python3 deploy-model.py --jobs 8              # shard scoring across 8 processes
+
+With --jobs, every worker memory-maps the model directory itself (the OS
+shares the pages), so only tweet text crosses process boundaries. Shards
+come back in input order, so output is identical to a single-core run
+
 Ian Richard Ferguson | Stanford University
 """
 
 
 # ---- Imports
-import re, pickle
+import os, sys, time, argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
+from tqdm import tqdm
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../..'))
+from storage import read_table, write_table, iter_table, drop_table, PartitionedSink
+from instrument import span, table_bytes, peak_rss_mb
+from reference import ensure
+
+from text_normalize import clean_text_data
+from model_format import load_model
+from polarity import load_lexicon
+
+
+# ---- Globals
+SOURCE = '../../../data/tweet-data/all-tweets-scraped'
+OUTPUT = '../../../data/tweet-data/all-tweets-scored'
+MODEL = '../../../data/tweet-data/trained_hs_classifier'
+
+# Fewest tweets worth shipping to a worker
+MIN_SHARD = 20_000
+
+# Per-process model + lexicon, filled by init_worker
+WORKER = {}
 
 
 # ---- Helpers
@@ -29,48 +68,233 @@ def is_mention(x):
             return 0
 
 
-def clean_text_data(DF, VAR):
+def score_frame(TWEETS, CLASSIFIER, CALIBRATION=None, POLARITY=None):
+      """
+      TWEETS => DataFrame of scraped tweets (or one batch of them)
+      CLASSIFIER => LinearTextModel from model_format.load_model
+      CALIBRATION => Optional Platt parameters {'a', 'b'} from train-model.py --calibrate
+      POLARITY => Optional PolarityIndex from polarity.load_lexicon
+
+      Flags mentions, cleans Tweet text and appends predictions. Raw decision
+      scores (and calibrated probabilities, when available) are stored as float32
+      so thresholds can be changed later without rescoring - see thresholds.py
+      """
+
+      # Denotes if Tweet is in reference to another Twitter user
+      TWEETS['is_mention'] = TWEETS['Tweet'].apply(lambda x: is_mention(x))
+
+      # Clean Tweet text
+      with span('clean', rows_in=len(TWEETS)):
+            TWEETS = clean_text_data(TWEETS, 'Tweet')
+
+      # Tokens => TF-IDF features (missing tweets score as empty text)
+      with span('vectorize', rows_in=len(TWEETS)):
+            tokens = CLASSIFIER.tokenize(TWEETS['Tweet'].fillna(''))
+            features = CLASSIFIER.transform_tokens(tokens)
+
+      # Apply classifier to Tweet data
+      with span('predict', rows_in=len(TWEETS)):
+            scores = features @ np.asarray(CLASSIFIER.coef) + CLASSIFIER.intercept
+
+      # Same labels predict() would give, without vectorizing twice
+      TWEETS['predicted-hs'] = CLASSIFIER.classes_[(scores > 0).astype(int)]
+      TWEETS['hs-score'] = scores.astype(np.float32)
+
+      if CALIBRATION is not None:
+            TWEETS['hs-prob'] = platt_probability(scores, CALIBRATION).astype(np.float32)
+
+      # Mean AFINN value of the scored tokens, reusing the classifier's tokens
+      if POLARITY is not None:
+            with span('polarity', rows_in=len(TWEETS)):
+                  mean, matched = POLARITY.score_tokens(tokens)
+
+            TWEETS['polarity'] = mean.astype(np.float32)
+            TWEETS['polarity-tokens'] = matched.astype(np.int32)
+
+      return TWEETS
+
+
+def platt_probability(SCORES, CALIBRATION):
       """
-      DF => Pandas DataFrame object
-      VAR => Feature (column in DataFrame) containing text data
+      SCORES => Raw decision scores
+      CALIBRATION => Platt parameters {'a', 'b'}
+
+      Returns calibrated P(hate speech)
+      """
+
+      return 1 / (1 + np.exp(-(CALIBRATION['a'] * SCORES + CALIBRATION['b'])))
 
-      Strips extraneous text characters from Tweet text
 
-      Returns full DataFrame
+def load_classifier():
       """
+      Load trained Hate Speech classifier (+ calibration, if one was fit)
+      """
+
+      # Memory-mapped arrays + JSON manifest - nothing is unpickled
+      classifier = load_model(MODEL)
 
-      # Transposes all text to lowercase
-      DF[VAR] = DF[VAR].str.lower()
+      return classifier, classifier.calibration
 
-      # Remove extraneous characters from Tweet body
-      DF[VAR] = DF[VAR].apply(lambda x: re.sub(r"(@[A-Za-z0-9]+)|([^0-9A-Za-z \t])|(\w+:\/\/\S+)|^rt|http.+?", "", x))
 
-      # Remove all whitespace
-      DF[VAR] = DF[VAR].str.strip()
+def init_worker(MODEL_PATH, LEXICON_PATH):
+      """
+      MODEL_PATH => Model directory (model_format.py)
+      LEXICON_PATH => AFINN file, or None to skip polarity
+
+      Runs once in each pool process - arrays are memory-mapped, never pickled
+      """
+
+      classifier = load_model(MODEL_PATH)
+
+      WORKER['classifier'] = classifier
+      WORKER['polarity'] = load_lexicon(LEXICON_PATH) if LEXICON_PATH else None
+
+
+def score_shard(TEXTS):
+      """
+      TEXTS => List of raw Tweet text
+
+      Returns the scored columns for one shard (runs in a pool process)
+      """
 
-      return DF
+      classifier = WORKER['classifier']
+
+      return score_frame(pd.DataFrame({'Tweet': TEXTS}), classifier, classifier.calibration, WORKER['polarity'])
+
+
+class ShardedScorer:
+      """
+      MODEL_PATH => Model directory
+      LEXICON_PATH => AFINN file, or None to skip polarity
+      JOBS => Worker processes
+
+      Splits each frame into contiguous shards (a few per worker, so one slow
+      shard doesn't idle the rest) and reassembles them in input order
+      """
+
+      def __init__(self, MODEL_PATH, LEXICON_PATH, JOBS):
+            self.jobs = JOBS
+            self.pool = ProcessPoolExecutor(max_workers=JOBS, initializer=init_worker,
+                                            initargs=(MODEL_PATH, LEXICON_PATH))
+
+
+      def score(self, TWEETS):
+            """
+            TWEETS => DataFrame of scraped tweets
+
+            Same result as score_frame, computed across the pool
+            """
+
+            texts = TWEETS['Tweet'].tolist()
+            shards = max(1, min(self.jobs * 4, len(texts) // MIN_SHARD))
+            bounds = np.linspace(0, len(texts), shards + 1).astype(int)
+
+            # map() yields shards in submission order, whatever order they finish in
+            parts = self.pool.map(score_shard, [texts[a:b] for a, b in zip(bounds[:-1], bounds[1:])])
+            scored = pd.concat(parts, ignore_index=True).set_axis(TWEETS.index)
+
+            for column in scored.columns:
+                  TWEETS[column] = scored[column]
+
+            return TWEETS
+
+
+      def close(self):
+            self.pool.shutdown()
+
+
+def score_in_batches(CLASSIFIER, CHUNKSIZE, CALIBRATION=None, POLARITY=None, SCORER=None):
+      """
+      CLASSIFIER => Trained hate speech pipeline
+      CHUNKSIZE => Tweets per batch
+      CALIBRATION => Optional Platt parameters
+      POLARITY => Optional PolarityIndex
+      SCORER => Optional ShardedScorer (used instead of CLASSIFIER / POLARITY)
+
+      Streams the scrape through the classifier in fixed-size batches and writes
+      each scored batch as its own part, so memory is bounded by CHUNKSIZE
+
+      Returns number of rows scored
+      """
+
+      sink = PartitionedSink(OUTPUT)
+      rows = 0
+
+      for index, batch in enumerate(tqdm(iter_table(SOURCE, BATCH_SIZE=CHUNKSIZE))):
+            with span('batch', index=index, rows_in=len(batch)):
+                  if SCORER is not None:
+                        scored = SCORER.score(batch)
+                  else:
+                        scored = score_frame(batch, CLASSIFIER, CALIBRATION, POLARITY)
+
+                  with span('write', rows_out=len(scored)):
+                        sink.write(scored, (f'batch-{index:06d}',))
+
+            rows += len(batch)
+
+      # CSV copy for the R scripts, streamed one part at a time
+      with span('export_csv') as s:
+            sink.export_csv(f'{OUTPUT}.csv')
+            s.add(bytes_written=table_bytes(f'{OUTPUT}.csv'))
+
+      return rows
 
 
 def main():
-      
-      # Read in Tweets in DataFrame object
-      tweets = pd.read_csv('../../../data/tweet-data/all-tweets-scraped.csv').iloc[:, 1:]
+      parser = argparse.ArgumentParser(description='Apply the trained hate speech classifier to scraped tweets')
+      parser.add_argument('--chunksize', type=int, default=0,
+                          help='Score in fixed-size batches (0 loads the whole corpus at once)')
+      parser.add_argument('--no-polarity', action='store_true', help='Skip AFINN polarity scoring')
+      parser.add_argument('--jobs', type=int, default=1, help='Worker processes for sharded scoring')
+      args = parser.parse_args()
 
-      # Denotes if Tweet is in reference to another Twitter user
-      tweets['is_mention'] = tweets['Tweet'].apply(lambda x: is_mention(x))
+      start = time.perf_counter()
+      classifier, calibration, polarity, scorer = None, None, None, None
 
-      # Clean Tweet text
-      tweets = clean_text_data(tweets, 'Tweet')
+      if args.jobs > 1:
+            # Workers load the model themselves - the parent only resolves paths
+            with span('start_pool', jobs=args.jobs):
+                  scorer = ShardedScorer(MODEL, None if args.no_polarity else ensure('afinn'), args.jobs)
+
+      else:
+            with span('load_model'):
+                  classifier, calibration = load_classifier()
 
-      # Load trained Hate Speech classifier
-      with open('../../../data/tweet-data/trained_hs_classifier.sav', 'rb') as incoming:
-            classifier = pickle.load(incoming)
+            with span('load_lexicon', skipped=args.no_polarity):
+                  polarity = None if args.no_polarity else load_lexicon()
 
-      # Apply classifier to Tweet data
-      tweets['predicted-hs'] = classifier.predict(tweets['Tweet'])
+      # Never leave a stale copy of the other layout behind
+      drop_table(OUTPUT)
+
+      if args.chunksize > 0:
+            rows = score_in_batches(classifier, args.chunksize, calibration, polarity, scorer)
+
+      else:
+            # Read in Tweets in DataFrame object
+            with span('read', bytes_read=table_bytes(SOURCE)) as s:
+                  tweets = read_table(SOURCE)
+                  s.add(rows_out=len(tweets))
+
+            with span('score', rows_in=len(tweets), jobs=args.jobs):
+                  if scorer is not None:
+                        tweets = scorer.score(tweets)
+                  else:
+                        tweets = score_frame(tweets, classifier, calibration, polarity)
+
+            rows = len(tweets)
+
+            # Save next to the raw scrape (Parquet + CSV for the R scripts)
+            with span('write', rows_out=rows) as s:
+                  write_table(tweets, OUTPUT)
+                  s.add(bytes_written=table_bytes(OUTPUT))
+
+      if scorer is not None:
+            scorer.close()
+
+      seconds = time.perf_counter() - start
+      peak_mb = peak_rss_mb()
 
-      # Save locally
-      tweets.to_csv('../../../data/tweet-data/all-tweets-scraped.csv')
+      print(f'\nScored {rows:,} tweets in {seconds:.1f}s ({rows / seconds:,.0f} rows/sec, peak RSS {peak_mb:,.0f} MB)')
 
 
 # ---- Run script
@@ -0,0 +1,337 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Versioned, pickle-free artifact format for the hate speech classifier
+
+A model is a directory
+
+      manifest.json   => format version, vectorizer / TF-IDF settings, classes,
+                         intercept and (optional) Platt calibration
+      vocab.npy       => sorted vocabulary, fixed-width UTF-8 (vocabulary models)
+      columns.npy     => feature column for each sorted term
+      idf.npy         => IDF weights (when the pipeline has a TF-IDF step)
+      coef.npy        => linear model coefficients
+
+Arrays are memory-mapped on load and nothing is ever unpickled, so loading is
+fast and safe for untrusted files. Existing .sav pickles (trusted, your own)
+can be migrated with
+
+      python3 model_format.py convert ../../../data/tweet-data/trained_hs_classifier.sav \
+                                      ../../../data/tweet-data/trained_hs_classifier
+
+Ian Richard Ferguson | Stanford University
+"""
+
+
+# ---- Imports
+import os, sys, json, shutil
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.feature_extraction import FeatureHasher
+from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer, TfidfTransformer
+from sklearn.preprocessing import normalize
+
+
+# ---- Globals
+FORMAT = 'hs-linear-text'
+VERSION = 1
+
+# Vectorizer settings that change how text becomes tokens / features
+ANALYZER_PARAMS = ['lowercase', 'strip_accents', 'token_pattern', 'ngram_range', 'analyzer', 'stop_words']
+HASHING_PARAMS = ['n_features', 'alternate_sign', 'norm', 'binary']
+TFIDF_PARAMS = ['norm', 'use_idf', 'smooth_idf', 'sublinear_tf']
+
+
+# ---- Helpers
+def jsonable(VALUE):
+      """
+      Tuples => lists, sets => sorted lists, so settings survive a JSON round trip
+      """
+
+      if isinstance(VALUE, (tuple, list)):
+            return [jsonable(v) for v in VALUE]
+
+      if isinstance(VALUE, (set, frozenset)):
+            return sorted(VALUE)
+
+      return VALUE
+
+
+def split_pipeline(MODEL):
+      """
+      MODEL => Fitted sklearn Pipeline (vectorizer [=> TF-IDF] => linear classifier)
+
+      Returns (vectorizer, tfidf or None, classifier)
+      """
+
+      steps = [step for _, step in MODEL.steps]
+      tfidf = next((s for s in steps if isinstance(s, TfidfTransformer)), None)
+
+      if not isinstance(steps[0], (CountVectorizer, HashingVectorizer)) or not hasattr(steps[-1], 'coef_'):
+            raise ValueError('Expected vectorizer [=> TfidfTransformer] => linear classifier')
+
+      if steps[-1].coef_.shape[0] != 1:
+            raise ValueError('Only binary linear classifiers are supported')
+
+      return steps[0], tfidf, steps[-1]
+
+
+def tokens_to_csr(TOKENS, LOOKUP, N_COLS):
+      """
+      TOKENS => One token list per text
+      LOOKUP => Callable mapping a list of distinct tokens to their columns (-1 = unknown)
+      N_COLS => Matrix width
+
+      Returns the sparse text x column count matrix, unknown tokens dropped
+      """
+
+      lengths = np.fromiter((len(t) for t in TOKENS), dtype=np.int64, count=len(TOKENS))
+      flat = [t for tokens in TOKENS for t in tokens]
+
+      rows = np.repeat(np.arange(len(TOKENS)), lengths)
+      cols = np.empty(0, dtype=np.int64)
+
+      if flat:
+            # Hash-based factorize - sorting an object array with np.unique dominated predict
+            inverse, unique = pd.factorize(np.array(flat, dtype=object))
+            cols = LOOKUP(unique.tolist())[inverse]
+
+      known = cols >= 0
+      X = sp.csr_matrix((np.ones(known.sum()), (rows[known], cols[known])), shape=(len(TOKENS), N_COLS))
+      X.sum_duplicates()
+
+      return X
+
+
+# ---- Save / load
+def save_model(MODEL, PATH, CALIBRATION=None):
+      """
+      MODEL => Fitted sklearn Pipeline
+      PATH => Output directory
+      CALIBRATION => Optional Platt parameters {'a', 'b'}
+
+      Writes the manifest + raw NumPy arrays
+      """
+
+      vectorizer, tfidf, classifier = split_pipeline(MODEL)
+
+      # Built in a sibling directory and swapped in whole (see swap_in)
+      PATH = os.path.normpath(PATH)
+      staging = f'{PATH}.tmp'
+
+      shutil.rmtree(staging, ignore_errors=True)
+      os.makedirs(staging)
+
+      params = vectorizer.get_params()
+      manifest = {'format': FORMAT, 'version': VERSION,
+                  'kind': 'hashing' if isinstance(vectorizer, HashingVectorizer) else 'vocabulary',
+                  'analyzer': {k: jsonable(params[k]) for k in ANALYZER_PARAMS},
+                  'classes': classifier.classes_.tolist(),
+                  'intercept': float(classifier.intercept_[0]),
+                  'n_features': int(classifier.coef_.shape[1]),
+                  'calibration': CALIBRATION}
+
+      if manifest['kind'] == 'hashing':
+            manifest['hashing'] = {k: params[k] for k in HASHING_PARAMS}
+
+      else:
+            # Sorted byte strings => binary search on a memory-mapped array
+            terms = np.array([t.encode('utf-8') for t in vectorizer.vocabulary_.keys()])
+            columns = np.fromiter(vectorizer.vocabulary_.values(), dtype=np.int64, count=len(terms))
+            order = np.argsort(terms, kind='stable')
+
+            np.save(os.path.join(staging, 'vocab.npy'), terms[order])
+            np.save(os.path.join(staging, 'columns.npy'), columns[order])
+
+            manifest['binary'] = bool(params['binary'])
+
+      if tfidf is not None:
+            manifest['tfidf'] = {k: tfidf.get_params()[k] for k in TFIDF_PARAMS}
+
+            if tfidf.use_idf:
+                  np.save(os.path.join(staging, 'idf.npy'), tfidf.idf_)
+
+      np.save(os.path.join(staging, 'coef.npy'), np.ascontiguousarray(classifier.coef_[0]))
+
+      with open(os.path.join(staging, 'manifest.json'), 'w') as outgoing:
+            json.dump(manifest, outgoing, indent=4)
+
+      swap_in(staging, PATH)
+
+
+def swap_in(STAGING, PATH):
+      """
+      STAGING => Complete model directory (manifest written last)
+      PATH => Model directory to replace
+
+      np.save over a memory-mapped .npy bus-errors whoever has it mapped, so a
+      model is never rewritten in place. The old directory is renamed aside and
+      unlinked - processes that already loaded it keep reading the old inodes
+      """
+
+      if not os.path.isdir(PATH):
+            os.replace(STAGING, PATH)
+            return
+
+      retired = f'{PATH}.old'
+      shutil.rmtree(retired, ignore_errors=True)
+
+      os.replace(PATH, retired)
+      os.replace(STAGING, PATH)
+      shutil.rmtree(retired)
+
+
+def load_model(PATH, MMAP=True):
+      """
+      PATH => Model directory written by save_model
+      MMAP => Memory-map arrays instead of reading them into memory
+
+      Returns a LinearTextModel
+      """
+
+      with open(os.path.join(PATH, 'manifest.json')) as incoming:
+            manifest = json.load(incoming)
+
+      if manifest.get('format') != FORMAT or manifest.get('version', 0) > VERSION:
+            raise ValueError(f"Unsupported model format {manifest.get('format')} v{manifest.get('version')}")
+
+      mode = 'r' if MMAP else None
+
+      def array(name):
+            path = os.path.join(PATH, f'{name}.npy')
+            return np.load(path, mmap_mode=mode, allow_pickle=False) if os.path.exists(path) else None
+
+      return LinearTextModel(manifest, array('vocab'), array('columns'), array('idf'), array('coef'))
+
+
+class LinearTextModel:
+      """
+      Scores text with the saved vectorizer settings, IDF and coefficients.
+      Mirrors the fitted Pipeline's predict / decision_function / classes_
+      """
+
+      def __init__(self, manifest, vocab, columns, idf, coef):
+            self.manifest = manifest
+            self.vocab = vocab
+            self.columns = columns
+            self.idf = idf
+            self.coef = coef
+            self.intercept = manifest['intercept']
+            self.classes_ = np.array(manifest['classes'])
+            self.calibration = manifest.get('calibration')
+
+            analyzer = dict(manifest['analyzer'])
+            analyzer['ngram_range'] = tuple(analyzer['ngram_range'])
+
+            if manifest['kind'] == 'hashing':
+                  self.analyze = HashingVectorizer(**analyzer, **manifest['hashing']).build_analyzer()
+                  self.hasher = FeatureHasher(n_features=manifest['n_features'], input_type='string',
+                                              alternate_sign=manifest['hashing']['alternate_sign'])
+            else:
+                  # No vocabulary is passed, so this is cheap - it only builds the analyzer
+                  self.analyze = CountVectorizer(**analyzer).build_analyzer()
+
+
+      def tokenize(self, TEXTS):
+            """
+            TEXTS => Iterable of (already cleaned) Tweet text
+
+            Returns one token list per text, using the training-time analyzer
+            """
+
+            return [self.analyze(text) for text in TEXTS]
+
+
+      def _lookup(self, TOKENS):
+            # Binary-search each distinct token in the memory-mapped vocabulary
+            width = self.vocab.dtype.itemsize
+            encoded = [t.encode('utf-8') for t in TOKENS]
+
+            query = np.array(encoded, dtype=self.vocab.dtype)
+            pos = np.minimum(np.searchsorted(self.vocab, query), len(self.vocab) - 1)
+
+            # Longer-than-any-term tokens would be truncated by the fixed width
+            fits = np.fromiter((len(t) <= width for t in encoded), dtype=bool, count=len(encoded))
+            found = fits & (self.vocab[pos] == query)
+
+            return np.where(found, self.columns[pos], -1)
+
+
+      def transform_tokens(self, TOKENS):
+            """
+            TOKENS => Output of tokenize()
+
+            Returns the sparse feature matrix the training pipeline would produce
+            """
+
+            if self.manifest['kind'] == 'hashing':
+                  X = self.hasher.transform(TOKENS).tocsr()
+                  settings = self.manifest['hashing']
+
+                  if settings['binary']:
+                        X.data.fill(1)
+
+                  return normalize(X, norm=settings['norm']) if settings['norm'] else X
+
+            X = tokens_to_csr(TOKENS, self._lookup, self.manifest['n_features'])
+
+            if self.manifest.get('binary'):
+                  X.data.fill(1)
+
+            tfidf = self.manifest.get('tfidf')
+
+            if tfidf is not None:
+                  if tfidf['sublinear_tf']:
+                        X.data = np.log(X.data) + 1
+
+                  if tfidf['use_idf']:
+                        X = X @ sp.diags(np.asarray(self.idf))
+
+                  if tfidf['norm']:
+                        X = normalize(X, norm=tfidf['norm'])
+
+            return X.tocsr()
+
+
+      def decision_from_tokens(self, TOKENS):
+            return self.transform_tokens(TOKENS) @ np.asarray(self.coef) + self.intercept
+
+
+      def decision_function(self, TEXTS):
+            return self.decision_from_tokens(self.tokenize(TEXTS))
+
+
+      def predict(self, TEXTS):
+            return self.classes_[(self.decision_function(TEXTS) > 0).astype(int)]
+
+
+def convert(SOURCE, PATH):
+      """
+      SOURCE => Legacy pickled pipeline (.sav) - only convert files you created
+      PATH => Output model directory
+      """
+
+      import pickle
+
+      with open(SOURCE, 'rb') as incoming:
+            model = pickle.load(incoming)
+
+      calibration = None
+      legacy = SOURCE.replace('.sav', '.calibration.json')
+
+      if os.path.exists(legacy):
+            with open(legacy) as incoming:
+                  calibration = json.load(incoming)
+
+      save_model(model, PATH, calibration)
+      print(f'\nSaved {PATH}')
+
+
+if __name__ == "__main__":
+      if len(sys.argv) == 4 and sys.argv[1] == 'convert':
+            convert(sys.argv[2], sys.argv[3])
+      else:
+            raise OSError("\nack! usage: python3 model_format.py convert MODEL.sav MODEL_DIR")
@@ -0,0 +1,171 @@
+#!/bin/python3
+
+"""
+About this Script
+
+AFINN polarity scoring for deploy-model.py - the Python counterpart of the
+token / stop word / stem / join / group-by steps in semantics.R
+
+semantics.R builds one row per token (roughly ten times the corpus) before
+grouping back by tweet. Here the tokens the classifier already produced are
+mapped through a precomputed lexicon index into a sparse tweet x term count
+matrix, and every tweet's mean polarity comes out of one sparse mat-vec
+
+      index = load_lexicon()
+      tokens = classifier.tokenize(tweets)
+      mean, matched = index.score_tokens(tokens)
+
+* Tokens are looked up exactly first, then by Snowball stem (if nltk is
+  installed) against a stemmed copy of the lexicon
+* Stop words and bare numbers never score, as in semantics.R
+* Tweets without a single scored token get NaN (semantics.R drops them)
+
+Ian Richard Ferguson | Stanford University
+"""
+
+
+# ---- Imports
+import os, sys
+import numpy as np
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../..'))
+from reference import ensure
+
+from model_format import tokens_to_csr
+
+try:
+      from nltk.stem.snowball import SnowballStemmer
+except ImportError:
+      SnowballStemmer = None
+
+
+# ---- Helpers
+def read_afinn(PATH):
+      """
+      PATH => AFINN file (word<TAB>score per line)
+
+      Returns {word: score}. Multi-word entries are skipped - the tokenizer
+      only ever yields single words
+      """
+
+      lexicon = {}
+
+      with open(PATH, encoding='utf-8') as incoming:
+            for line in incoming:
+                  word, _, score = line.rstrip('\n').rpartition('\t')
+
+                  if word and ' ' not in word:
+                        lexicon[word] = int(score)
+
+      return lexicon
+
+
+# ---- Index
+class PolarityIndex:
+      """
+      LEXICON => {word: score}
+      STEM => Also match tokens by stem (needs nltk; exact matches only without it)
+      STOP_WORDS => Words that never score
+
+      Each distinct lexicon entry (word or stem) is one column of the term
+      matrix; self.values holds its score
+      """
+
+      def __init__(self, LEXICON, STEM=True, STOP_WORDS=ENGLISH_STOP_WORDS):
+            self.stop_words = frozenset(STOP_WORDS)
+            self.stemmer = SnowballStemmer('english') if STEM and SnowballStemmer is not None else None
+
+            words = sorted(LEXICON)
+            self.columns = {word: i for i, word in enumerate(words)}
+            values = [LEXICON[w] for w in words]
+
+            # Stems get their own columns, scored as the mean of the words sharing them
+            self.stems = {}
+
+            if self.stemmer is not None:
+                  grouped = {}
+
+                  for word in words:
+                        grouped.setdefault(self.stemmer.stem(word), []).append(LEXICON[word])
+
+                  for stem, scores in sorted(grouped.items()):
+                        self.stems[stem] = len(values)
+                        values.append(float(np.mean(scores)))
+
+            self.values = np.asarray(values, dtype=np.float64)
+
+            # Token => column, filled as new tokens turn up (-1 => no score)
+            self.cache = {}
+
+
+      def column(self, TOKEN):
+            """
+            Returns the lexicon column a token scores against, or -1
+            """
+
+            if TOKEN in self.stop_words or TOKEN.isdigit():
+                  return -1
+
+            if TOKEN in self.columns:
+                  return self.columns[TOKEN]
+
+            if self.stemmer is not None:
+                  return self.stems.get(self.stemmer.stem(TOKEN), -1)
+
+            return -1
+
+
+      def lookup(self, TOKENS):
+            """
+            TOKENS => Distinct tokens
+
+            Returns column per token, resolving each token only the first time it's seen
+            """
+
+            cache = self.cache
+
+            for token in TOKENS:
+                  if token not in cache:
+                        cache[token] = self.column(token)
+
+            return np.fromiter((cache[t] for t in TOKENS), dtype=np.int64, count=len(TOKENS))
+
+
+      def matrix(self, TOKENS):
+            """
+            TOKENS => One token list per tweet (LinearTextModel.tokenize)
+
+            Returns sparse tweet x lexicon-term count matrix
+            """
+
+            return tokens_to_csr(TOKENS, self.lookup, len(self.values))
+
+
+      def score_tokens(self, TOKENS):
+            """
+            TOKENS => One token list per tweet
+
+            Returns (mean polarity per tweet, NaN when nothing scored; scored tokens per tweet)
+            """
+
+            X = self.matrix(TOKENS)
+
+            total = X @ self.values
+            matched = np.asarray(X.sum(axis=1)).ravel()
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                  mean = np.where(matched > 0, total / matched, np.nan)
+
+            return mean, matched.astype(np.int64)
+
+
+def load_lexicon(PATH=None, STEM=True):
+      """
+      PATH => AFINN file (defaults to the checksummed copy in reference.py)
+      STEM => See PolarityIndex
+
+      Returns PolarityIndex
+      """
+
+      return PolarityIndex(read_afinn(PATH or ensure('afinn')), STEM=STEM)
@@ -0,0 +1,201 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Hyperparameter + cross-validation search for the hate speech pipeline
+
+* Vectorizer n-gram ranges x SGD loss / penalty / alpha x resampling strategy
+* Stratified k-fold CV, with (fold, n-gram range) tasks fanned out over a process pool
+* Each task fits CountVectorizer + TF-IDF once and reuses the fold's matrices
+  for every classifier setting
+* Writes a leaderboard with fit and predict latency next to F1
+
+      python3 search-model.py                   # full grid, 5 folds
+      python3 search-model.py --quick --jobs 4
+
+Ian Richard Ferguson | Stanford University
+"""
+
+
+# ---- Imports
+import os, sys, time, argparse, itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import f1_score
+from sklearn.model_selection import StratifiedKFold
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../..'))
+from storage import read_table, write_table
+
+from text_normalize import clean_text_data
+from balancing import balanced_indices
+
+
+# ---- Globals
+TRAIN = '../../../data/tweet-data/hate-speech/train'
+LEADERBOARD = '../../../data/tweet-data/model-search-leaderboard'
+
+GRID = {'ngram_range': [(1, 1), (1, 2), (1, 3)],
+        'loss': ['hinge', 'log_loss', 'modified_huber'],
+        'penalty': ['l2', 'l1', 'elasticnet'],
+        'alpha': [1e-5, 1e-4, 1e-3],
+        'resampling': ['none', 'oversample', 'undersample', 'class_weight']}
+
+QUICK_GRID = {'ngram_range': [(1, 1), (1, 2)],
+              'loss': ['hinge', 'log_loss'],
+              'penalty': ['l2'],
+              'alpha': [1e-5, 1e-4],
+              'resampling': ['none', 'oversample']}
+
+# Set in each worker by init_worker, so tasks only ship fold indices
+TEXTS, LABELS = None, None
+
+
+# ---- Helpers
+def init_worker(texts, labels):
+      global TEXTS, LABELS
+      TEXTS, LABELS = texts, labels
+
+
+def resample_rows(y, STRATEGY, SEED=101):
+      """
+      y => Training labels for one fold
+      STRATEGY => none, oversample, undersample or class_weight
+
+      Returns (row indices, sample weights or None) for the training matrix
+      """
+
+      if STRATEGY == 'oversample':
+            # Oversampling as integer weights - no duplicated rows in the fold matrix
+            return balanced_indices(y, 'weights', SEED)
+
+      if STRATEGY == 'undersample':
+            return balanced_indices(y, 'undersample', SEED)
+
+      if STRATEGY == 'class_weight':
+            counts = np.bincount(y, minlength=2)
+            return np.arange(len(y)), (len(y) / (2 * counts))[y]
+
+      return np.arange(len(y)), None
+
+
+def run_task(TASK):
+      """
+      TASK => (fold number, train indices, test indices, n-gram range, classifier settings)
+
+      Featurizes the fold once, then fits / scores every classifier setting on it
+
+      Returns list of result dictionaries
+      """
+
+      fold, train_idx, test_idx, ngram_range, settings = TASK
+
+      start = time.perf_counter()
+      vectorizer = CountVectorizer(ngram_range=ngram_range)
+      tfidf = TfidfTransformer()
+
+      X_train = tfidf.fit_transform(vectorizer.fit_transform(TEXTS[train_idx]))
+      featurize_s = time.perf_counter() - start
+
+      start = time.perf_counter()
+      X_test = tfidf.transform(vectorizer.transform(TEXTS[test_idx]))
+      transform_s = time.perf_counter() - start
+
+      y_train, y_test = LABELS[train_idx], LABELS[test_idx]
+      results = []
+
+      for loss, penalty, alpha, resampling in settings:
+            rows, weights = resample_rows(y_train, resampling)
+            classifier = SGDClassifier(loss=loss, penalty=penalty, alpha=alpha, random_state=101)
+
+            start = time.perf_counter()
+            classifier.fit(X_train[rows], y_train[rows], sample_weight=weights)
+            fit_s = time.perf_counter() - start
+
+            start = time.perf_counter()
+            y_predict = classifier.predict(X_test)
+            predict_s = time.perf_counter() - start + transform_s
+
+            results.append({'ngram_range': str(ngram_range), 'loss': loss, 'penalty': penalty,
+                            'alpha': alpha, 'resampling': resampling, 'fold': fold,
+                            'f1': f1_score(y_test, y_predict),
+                            'featurize_s': featurize_s, 'fit_s': fit_s,
+                            'predict_ms_per_1k': 1000 * predict_s / len(test_idx) * 1000,
+                            'n_features': X_train.shape[1]})
+
+      return results
+
+
+def leaderboard(RESULTS):
+      """
+      RESULTS => Per-fold result dictionaries
+
+      Returns configurations ranked by mean F1 across folds
+      """
+
+      frame = pd.DataFrame(RESULTS)
+      keys = ['ngram_range', 'loss', 'penalty', 'alpha', 'resampling']
+
+      board = frame.groupby(keys).agg(f1_mean=('f1', 'mean'), f1_std=('f1', 'std'),
+                                      fit_s=('fit_s', 'mean'), featurize_s=('featurize_s', 'mean'),
+                                      predict_ms_per_1k=('predict_ms_per_1k', 'mean'),
+                                      n_features=('n_features', 'mean'))
+
+      return board.sort_values(by='f1_mean', ascending=False).reset_index()
+
+
+def search(TEXTS, LABELS, GRID, FOLDS=5, N_JOBS=1):
+      """
+      TEXTS => Array of cleaned tweets
+      LABELS => Array of binary labels
+      GRID => Dictionary of settings to search (see GRID)
+      FOLDS => Stratified folds
+      N_JOBS => Worker processes
+
+      Returns leaderboard DataFrame
+      """
+
+      texts, labels = np.asarray(TEXTS, dtype=object), np.asarray(LABELS, dtype=int)
+      splitter = StratifiedKFold(n_splits=FOLDS, shuffle=True, random_state=101)
+
+      settings = list(itertools.product(GRID['loss'], GRID['penalty'], GRID['alpha'], GRID['resampling']))
+
+      tasks = [(fold, train_idx, test_idx, ngram_range, settings)
+               for fold, (train_idx, test_idx) in enumerate(splitter.split(texts, labels))
+               for ngram_range in GRID['ngram_range']]
+
+      print(f'\n{len(tasks)} featurizer tasks x {len(settings)} classifier settings, {N_JOBS} worker(s)')
+
+      with ProcessPoolExecutor(max_workers=N_JOBS, initializer=init_worker, initargs=(texts, labels)) as pool:
+            results = [row for rows in pool.map(run_task, tasks) for row in rows]
+
+      return leaderboard(results)
+
+
+def main():
+      parser = argparse.ArgumentParser(description='Cross-validated search over the hate speech pipeline')
+      parser.add_argument('--folds', type=int, default=5)
+      parser.add_argument('--jobs', type=int, default=os.cpu_count())
+      parser.add_argument('--quick', action='store_true', help='Small grid for a fast sanity check')
+      args = parser.parse_args()
+
+      # Read in + clean train data
+      train_data = clean_text_data(read_table(TRAIN, COLUMNS=['tweet', 'label']), 'tweet')
+
+      board = search(train_data['tweet'].fillna(''), train_data['label'],
+                     QUICK_GRID if args.quick else GRID, FOLDS=args.folds, N_JOBS=args.jobs)
+
+      print(board.head(20).to_string(index=False, float_format=lambda x: f'{x:.4g}'))
+
+      write_table(board, LEADERBOARD)
+      print(f'\nLeaderboard saved to {LEADERBOARD}.csv')
+
+
+# ---- Run script
+if __name__ == "__main__":
+      main()
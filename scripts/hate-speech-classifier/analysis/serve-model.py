@@ -0,0 +1,406 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Resident scoring service for the hate speech classifier. The model (and
+AFINN lexicon) are loaded once and stay warm; concurrent requests are
+queued and scored together in micro-batches, so one vectorize + mat-vec
+covers many tweets
+
+      python3 serve-model.py                            # http://127.0.0.1:8765
+      python3 serve-model.py --max-batch 128 --max-wait-ms 10
+
+      curl -s localhost:8765/score -d '{"tweet": "some tweet text"}'
+      curl -s localhost:8765/score -d '{"tweets": ["first", "second"]}'
+      curl -s localhost:8765/metrics
+
+* A batch is flushed when it reaches --max-batch tweets or --max-wait-ms
+  after its first request arrived, whichever comes first
+* /metrics reports p50 / p99 request latency, throughput and batch sizes
+* Scores match deploy-model.py (same cleaning, tokens, float32 outputs)
+
+Ian Richard Ferguson | Stanford University
+"""
+
+
+# ---- Imports
+import os, sys, json, time, queue, argparse, threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../..'))
+from instrument import span
+
+from text_normalize import normalize_chunk
+from model_format import load_model
+from polarity import load_lexicon
+
+
+# ---- Globals
+MODEL = '../../../data/tweet-data/trained_hs_classifier'
+
+HOST, PORT = '127.0.0.1', 8765
+MAX_BATCH = 64
+MAX_WAIT = 0.005
+
+# Largest request body accepted (bytes)
+MAX_BODY = 1_048_576
+
+
+# ---- Scoring
+def score_texts(TEXTS, CLASSIFIER, POLARITY=None):
+      """
+      TEXTS => List of raw Tweet text
+      CLASSIFIER => LinearTextModel from model_format.load_model
+      POLARITY => Optional PolarityIndex
+
+      Returns one result dictionary per tweet, with the columns deploy-model.py writes
+      """
+
+      cleaned = [x if isinstance(x, str) else '' for x in normalize_chunk(TEXTS)]
+
+      tokens = CLASSIFIER.tokenize(cleaned)
+      scores = CLASSIFIER.decision_from_tokens(tokens)
+      labels = CLASSIFIER.classes_[(scores > 0).astype(int)]
+
+      results = [{'is_mention': int(str(text)[:1] == '@'), 'predicted-hs': label.item(), 'hs-score': float(score)}
+                 for text, label, score in zip(TEXTS, labels, scores.astype(np.float32))]
+
+      if CLASSIFIER.calibration is not None:
+            # Same Platt mapping as deploy-model.py's platt_probability
+            c = CLASSIFIER.calibration
+            probs = (1 / (1 + np.exp(-(c['a'] * scores + c['b'])))).astype(np.float32)
+
+            for result, prob in zip(results, probs):
+                  result['hs-prob'] = float(prob)
+
+      if POLARITY is not None:
+            mean, matched = POLARITY.score_tokens(tokens)
+
+            for result, m, n in zip(results, mean.astype(np.float32), matched):
+                  result['polarity'] = None if np.isnan(m) else float(m)
+                  result['polarity-tokens'] = int(n)
+
+      return results
+
+
+# ---- Metrics
+class ServiceStats:
+      """
+      WINDOW => Most recent requests kept for latency percentiles
+
+      Thread-safe counters plus a rolling window of (finished, latency, tweets)
+      """
+
+      def __init__(self, WINDOW=10_000):
+            self.lock = threading.Lock()
+            self.recent = deque(maxlen=WINDOW)
+            self.started = time.perf_counter()
+            self.requests = self.tweets = self.batches = self.errors = 0
+            self.largest_batch = 0
+
+
+      def request(self, LATENCY, TWEETS):
+            with self.lock:
+                  self.requests += 1
+                  self.tweets += TWEETS
+                  self.recent.append((time.perf_counter(), LATENCY, TWEETS))
+
+
+      def batch(self, SIZE):
+            with self.lock:
+                  self.batches += 1
+                  self.largest_batch = max(self.largest_batch, SIZE)
+
+
+      def error(self):
+            with self.lock:
+                  self.errors += 1
+
+
+      def snapshot(self, RECENT_SECONDS=10.0):
+            """
+            Returns a JSON-ready dictionary of counters, latency percentiles and throughput
+            """
+
+            with self.lock:
+                  now = time.perf_counter()
+                  recent = list(self.recent)
+                  counters = {'requests': self.requests, 'tweets': self.tweets, 'batches': self.batches,
+                              'errors': self.errors, 'largest_batch': self.largest_batch}
+
+            uptime = now - self.started
+            latencies = np.array([r[1] for r in recent]) * 1000
+            last = sum(r[2] for r in recent if now - r[0] <= RECENT_SECONDS)
+
+            return {**counters,
+                    'uptime_s': round(uptime, 3),
+                    'mean_batch': round(counters['tweets'] / counters['batches'], 2) if counters['batches'] else 0.0,
+                    'latency_p50_ms': round(float(np.percentile(latencies, 50)), 3) if len(latencies) else None,
+                    'latency_p99_ms': round(float(np.percentile(latencies, 99)), 3) if len(latencies) else None,
+                    'throughput_tweets_per_s': round(counters['tweets'] / uptime, 1) if uptime > 0 else 0.0,
+                    'recent_tweets_per_s': round(last / min(RECENT_SECONDS, uptime), 1) if uptime > 0 else 0.0}
+
+
+# ---- Micro-batching
+class Pending:
+      """
+      One queued request - the batcher fills in results (or error) and sets done
+      """
+
+      def __init__(self, TEXTS):
+            self.texts = TEXTS
+            self.results = None
+            self.error = None
+            self.done = threading.Event()
+
+
+class MicroBatcher:
+      """
+      SCORE => Callable taking a list of texts, returning one result per text
+      MAX_BATCH => A batch stops taking requests once it holds this many tweets
+      MAX_WAIT => Seconds a batch stays open after its first request
+      STATS => Optional ServiceStats
+
+      A single worker thread owns the model, so scoring never runs concurrently
+      with itself and request threads only wait on their own Pending
+      """
+
+      def __init__(self, SCORE, MAX_BATCH=MAX_BATCH, MAX_WAIT=MAX_WAIT, STATS=None):
+            self.score = SCORE
+            self.max_batch = MAX_BATCH
+            self.max_wait = MAX_WAIT
+            self.stats = STATS
+            self.queue = queue.Queue()
+
+            self.worker = threading.Thread(target=self._run, daemon=True)
+            self.worker.start()
+
+
+      def submit(self, TEXTS):
+            """
+            TEXTS => List of raw Tweet text
+
+            Blocks until the batch holding these tweets is scored, returns their results
+            """
+
+            pending = Pending(TEXTS)
+            self.queue.put(pending)
+            pending.done.wait()
+
+            if pending.error is not None:
+                  raise pending.error
+
+            return pending.results
+
+
+      def _collect(self, FIRST):
+            # Fill the batch until it's full or the first request has waited MAX_WAIT
+            batch, size = [FIRST], len(FIRST.texts)
+            deadline = time.perf_counter() + self.max_wait
+
+            while size < self.max_batch:
+                  remaining = deadline - time.perf_counter()
+
+                  if remaining <= 0:
+                        break
+
+                  try:
+                        pending = self.queue.get(timeout=remaining)
+                  except queue.Empty:
+                        break
+
+                  if pending is None:
+                        self.queue.put(None)
+                        break
+
+                  batch.append(pending)
+                  size += len(pending.texts)
+
+            return batch, size
+
+
+      def _run(self):
+            while True:
+                  first = self.queue.get()
+
+                  if first is None:
+                        return
+
+                  batch, size = self._collect(first)
+
+                  try:
+                        results = self.score([text for pending in batch for text in pending.texts])
+                  except Exception as e:
+                        for pending in batch:
+                              pending.error = e
+                              pending.done.set()
+                        continue
+
+                  if self.stats is not None:
+                        self.stats.batch(size)
+
+                  # Hand each request back its own slice, in order
+                  start = 0
+
+                  for pending in batch:
+                        pending.results = results[start:start + len(pending.texts)]
+                        start += len(pending.texts)
+                        pending.done.set()
+
+
+      def close(self):
+            self.queue.put(None)
+            self.worker.join()
+
+
+# ---- HTTP
+class ScoringServer(ThreadingHTTPServer):
+      # One thread per connection; the default listen backlog (5) resets bursts of clients
+      daemon_threads = True
+      request_queue_size = 128
+
+
+def make_handler(BATCHER, STATS, INFO):
+      """
+      Builds a request handler bound to one batcher
+      """
+
+      class Handler(BaseHTTPRequestHandler):
+
+            # Keep-alive, so load generators can reuse connections
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                  pass
+
+            def _send(self, status, body):
+                  payload = json.dumps(body).encode('utf-8')
+
+                  self.send_response(status)
+                  self.send_header('Content-Type', 'application/json')
+                  self.send_header('Content-Length', str(len(payload)))
+                  self.end_headers()
+                  self.wfile.write(payload)
+
+            def _length(self):
+                  # None unless 0 <= Content-Length <= MAX_BODY - read(-1) would block until
+                  # a keep-alive client hangs up
+                  try:
+                        length = int(self.headers.get('Content-Length', 0))
+                  except ValueError:
+                        return None
+
+                  return length if 0 <= length <= MAX_BODY else None
+
+            def do_GET(self):
+                  if self.path == '/metrics':
+                        self._send(200, STATS.snapshot())
+                  elif self.path == '/health':
+                        self._send(200, {'status': 'ok', **INFO})
+                  else:
+                        self._send(404, {'error': 'not found'})
+
+            def do_POST(self):
+                  start = time.perf_counter()
+
+                  if self.path != '/score':
+                        self._send(404, {'error': 'not found'})
+                        return
+
+                  try:
+                        length = self._length()
+
+                        # The unread body can't be taken for the next request, so the connection closes
+                        if length is None:
+                              self.close_connection = True
+                              STATS.error()
+                              self._send(400, {'error': f'Content-Length must be 0 - {MAX_BODY} bytes'})
+                              return
+
+                        body = json.loads(self.rfile.read(length) or b'{}')
+                        texts = [body['tweet']] if 'tweet' in body else body['tweets']
+
+                        if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+                              raise ValueError
+                  except (ValueError, KeyError, TypeError):
+                        STATS.error()
+                        self._send(400, {'error': 'expected {"tweet": str} or {"tweets": [str, ...]}'})
+                        return
+
+                  try:
+                        results = BATCHER.submit(texts) if texts else []
+                  except Exception as e:
+                        STATS.error()
+                        self._send(500, {'error': str(e)})
+                        return
+
+                  STATS.request(time.perf_counter() - start, len(texts))
+                  self._send(200, {'results': results})
+
+      return Handler
+
+
+def serve(CLASSIFIER, POLARITY=None, HOST=HOST, PORT=PORT, MAX_BATCH=MAX_BATCH, MAX_WAIT=MAX_WAIT):
+      """
+      CLASSIFIER => LinearTextModel
+      POLARITY => Optional PolarityIndex
+      HOST, PORT => Address to bind (PORT 0 picks a free one)
+      MAX_BATCH, MAX_WAIT => See MicroBatcher
+
+      Starts the service on a daemon thread, returns (server, base_url, batcher, stats)
+      """
+
+      stats = ServiceStats()
+      batcher = MicroBatcher(lambda texts: score_texts(texts, CLASSIFIER, POLARITY), MAX_BATCH, MAX_WAIT, stats)
+
+      info = {'format': CLASSIFIER.manifest.get('format'), 'version': CLASSIFIER.manifest.get('version'),
+              'calibrated': CLASSIFIER.calibration is not None, 'polarity': POLARITY is not None,
+              'max_batch': MAX_BATCH, 'max_wait_ms': MAX_WAIT * 1000}
+
+      server = ScoringServer((HOST, PORT), make_handler(batcher, stats, info))
+
+      threading.Thread(target=server.serve_forever, daemon=True).start()
+
+      return server, f'http://{HOST}:{server.server_address[1]}', batcher, stats
+
+
+def parse_args():
+      parser = argparse.ArgumentParser(description='Serve the hate speech classifier over HTTP with micro-batching')
+      parser.add_argument('--host', default=HOST)
+      parser.add_argument('--port', type=int, default=PORT)
+      parser.add_argument('--model', default=MODEL, help='Model directory (model_format.py)')
+      parser.add_argument('--max-batch', type=int, default=MAX_BATCH, help='Most tweets scored together')
+      parser.add_argument('--max-wait-ms', type=float, default=MAX_WAIT * 1000,
+                          help='How long a batch waits for company after its first request')
+      parser.add_argument('--no-polarity', action='store_true', help='Skip AFINN polarity scoring')
+
+      return parser.parse_args()
+
+
+# ---- Run script
+def main():
+      args = parse_args()
+
+      with span('load_model'):
+            classifier = load_model(args.model)
+
+      with span('load_lexicon', skipped=args.no_polarity):
+            polarity = None if args.no_polarity else load_lexicon()
+
+      server, base_url, batcher, _ = serve(classifier, polarity, args.host, args.port,
+                                           args.max_batch, args.max_wait_ms / 1000)
+
+      print(f'\nScoring service listening on {base_url} (POST /score, GET /metrics) - Ctrl+C to stop')
+
+      try:
+            threading.Event().wait()
+      except KeyboardInterrupt:
+            server.shutdown()
+            batcher.close()
+
+
+if __name__ == "__main__":
+      main()
@@ -0,0 +1,94 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Shared Tweet text normalizer for train-model.py and deploy-model.py
+
+* The cleaning patterns are compiled once at import
+* Lowercase, strip extraneous characters and trim whitespace in one pass per tweet
+* Large corpora can optionally fan out across a process pool in chunks
+
+Ian Richard Ferguson | Stanford University
+"""
+
+
+# ---- Imports
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+
+# ---- Globals
+# Mentions | non-alphanumeric characters | URLs | leading "rt" | http fragments,
+# matched against already-lowercased text. The URL branch can only match when
+# "://" is present, so most tweets skip it entirely
+URL_PATTERN = re.compile(r"@[a-z0-9]+|[^0-9a-z \t]|\w+://\S+|^rt|http.")
+FAST_PATTERN = re.compile(r"@[a-z0-9]+|[^0-9a-z \t]|^rt|http.")
+
+CHUNKSIZE = 250_000
+
+
+# ---- Helpers
+def normalize_text(x):
+      """
+      x => Raw Tweet text
+
+      Lowercase => remove extraneous characters => strip whitespace
+      """
+
+      x = x.lower()
+      pattern = URL_PATTERN if '://' in x else FAST_PATTERN
+
+      return pattern.sub('', x).strip()
+
+
+def normalize_chunk(VALUES):
+      """
+      VALUES => List of Tweet text values
+
+      Non-string values (e.g., missing tweets) pass through untouched
+      """
+
+      return [normalize_text(x) if isinstance(x, str) else x for x in VALUES]
+
+
+def normalize_series(SERIES, N_JOBS=1, CHUNKSIZE=CHUNKSIZE):
+      """
+      SERIES => Pandas Series of Tweet text
+      N_JOBS => Worker processes (1 keeps everything in-process)
+      CHUNKSIZE => Tweets per chunk handed to each worker
+
+      Returns a cleaned Series with the same index and name
+      """
+
+      values = SERIES.tolist()
+
+      if N_JOBS == 1 or len(values) <= CHUNKSIZE:
+            cleaned = normalize_chunk(values)
+
+      else:
+            chunks = [values[i:i + CHUNKSIZE] for i in range(0, len(values), CHUNKSIZE)]
+
+            # map() preserves chunk order, so output lines up with the input
+            with ProcessPoolExecutor(max_workers=N_JOBS) as pool:
+                  cleaned = [x for chunk in pool.map(normalize_chunk, chunks) for x in chunk]
+
+      return pd.Series(cleaned, index=SERIES.index, name=SERIES.name, dtype=object)
+
+
+def clean_text_data(DF, VAR, N_JOBS=1):
+      """
+      DF => Pandas DataFrame object
+      VAR => Feature (column in DataFrame) containing text data
+      N_JOBS => Worker processes for very large corpora
+
+      Strips extraneous text characters from Tweet text
+
+      Returns full DataFrame
+      """
+
+      DF[VAR] = normalize_series(DF[VAR], N_JOBS=N_JOBS)
+
+      return DF
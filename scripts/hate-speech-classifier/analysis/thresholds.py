@@ -0,0 +1,121 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Threshold sweeps over stored hate speech scores
+
+deploy-model.py persists raw decision scores (hs-score) and, for calibrated
+models, probabilities (hs-prob) as float32 columns. Everything here works
+from those columns alone - no model load, no TF-IDF - so re-thresholding
+the whole corpus takes milliseconds
+
+      python3 thresholds.py                         # hs-score at -0.5, 0, 0.5, 1
+      python3 thresholds.py --column hs-prob 0.3 0.5 0.7
+
+Ian Richard Ferguson | Stanford University
+"""
+
+
+# ---- Imports
+import os, sys, argparse
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../..'))
+from storage import read_table
+
+
+# ---- Globals
+SCORED = '../../../data/tweet-data/all-tweets-scored'
+
+
+# ---- Helpers
+def label_at(SCORES, THRESHOLD):
+      """
+      SCORES => Array of stored scores
+      THRESHOLD => Decision threshold (0 on hs-score matches predict())
+
+      Returns binary hate speech labels
+      """
+
+      return (np.asarray(SCORES) > THRESHOLD).astype(int)
+
+
+def flagged_rate(SCORES, THRESHOLDS):
+      """
+      SCORES => Array of stored scores
+      THRESHOLDS => Array of thresholds
+
+      Sorts once, then every threshold is a binary search
+
+      Returns share of tweets flagged at each threshold
+      """
+
+      ordered = np.sort(np.asarray(SCORES, dtype=np.float64))
+      above = len(ordered) - np.searchsorted(ordered, THRESHOLDS, side='right')
+
+      return above / max(len(ordered), 1)
+
+
+def precision_recall(SCORES, LABELS):
+      """
+      SCORES => Array of stored scores
+      LABELS => Array of true binary labels
+
+      Vectorized precision / recall at every distinct score (each row flags
+      scores >= threshold, the same convention as sklearn's precision_recall_curve)
+
+      Returns DataFrame with threshold, precision and recall columns
+      """
+
+      scores = np.asarray(SCORES, dtype=np.float64)
+      labels = np.asarray(LABELS, dtype=int)
+
+      # Descending scores => flagging the top-k rows for every k at once
+      order = np.argsort(-scores, kind='stable')
+      scores, labels = scores[order], labels[order]
+
+      # Last index of each run of tied scores
+      cut = np.flatnonzero(np.diff(scores, append=-np.inf))
+
+      true_pos = np.cumsum(labels)[cut]
+      flagged = cut + 1
+
+      return pd.DataFrame({'threshold': scores[cut],
+                           'precision': true_pos / flagged,
+                           'recall': true_pos / max(labels.sum(), 1)})
+
+
+def rates_by_bin(DF, THRESHOLDS, SCORE='hs-score', BIN='hispanic-pop-change'):
+      """
+      DF => Frame with stored scores and a demographic bin column
+      THRESHOLDS => List of thresholds
+      SCORE => Score column
+      BIN => Grouping column
+
+      Returns bins x thresholds table of hate speech rates
+      """
+
+      thresholds = np.asarray(THRESHOLDS, dtype=np.float64)
+
+      rates = {b: flagged_rate(group[SCORE].to_numpy(), thresholds) for b, group in DF.groupby(BIN)}
+
+      return pd.DataFrame(rates, index=pd.Index(thresholds, name='threshold')).T
+
+
+def main():
+      parser = argparse.ArgumentParser(description='Hate speech rates per bin at several thresholds')
+      parser.add_argument('thresholds', nargs='*', type=float, default=[-0.5, 0.0, 0.5, 1.0])
+      parser.add_argument('--column', default='hs-score', help='hs-score or hs-prob')
+      args = parser.parse_args()
+
+      # Two columns only - never touches the Tweet text
+      scored = read_table(SCORED, COLUMNS=[args.column, 'hispanic-pop-change'])
+
+      print(rates_by_bin(scored, args.thresholds, SCORE=args.column).round(4))
+
+
+# ---- Run script
+if __name__ == "__main__":
+      main()
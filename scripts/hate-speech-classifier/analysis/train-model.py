@@ -6,58 +6,70 @@ classifying hate speech! This script is based largely on
 an article authored by AK, find it below:
 
 https://thecleverprogrammer.com/2020/08/19/hate-speech-detection-model/
+
+      python3 train-model.py                    # in-memory CountVectorizer / TF-IDF pipeline
+      python3 train-model.py --mode hashing     # out-of-core HashingVectorizer + partial_fit
+      python3 train-model.py --balance weights  # oversample as sample weights, no duplicated rows
 """
 
 
 # ---- Imports
-import re, pickle
+import os, sys, argparse
+import numpy as np
 import pandas as pd
 from sklearn.utils import resample
-from sklearn.feature_extraction.text import TfidfTransformer, TfidfVectorizer, CountVectorizer
+from sklearn.feature_extraction.text import TfidfTransformer, TfidfVectorizer, CountVectorizer, HashingVectorizer
 from sklearn.pipeline import Pipeline
-from sklearn.linear_model import SGDClassifier
+from sklearn.linear_model import SGDClassifier, LogisticRegression
 from sklearn.metrics import f1_score
 from sklearn.model_selection import train_test_split
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../..'))
+from storage import read_table, iter_table
+from instrument import span, table_bytes
+
+from text_normalize import clean_text_data
+from model_format import save_model
+from balancing import balanced_indices, balanced_batches
+
+
+# ---- Globals
+TRAIN = '../../../data/tweet-data/hate-speech/train'
+MODEL = '../../../data/tweet-data/trained_hs_classifier'
+
 
 # ---- Helpers
-def clean_text_data(DF, VAR):
+def train_pipeline(TRAIN_DATA, BALANCE='concat', EPOCHS=5, CALIBRATE=False):
       """
-      DF => Pandas DataFrame object
-      VAR => Feature column to clean
+      TRAIN_DATA => Cleaned DataFrame with tweet and label columns
+      BALANCE => concat (original resample + concat), weights, undersample or stream
+      EPOCHS => Passes over the balanced minibatches (stream only)
+      CALIBRATE => concat only - hold out a stratified slice of the raw rows before
+                   oversampling and return its scores for fit_calibration
 
-      Removes extraneous letters from Tweet body
+      Balances classes, fits the CountVectorizer => TF-IDF => SGD pipeline
 
-      Returns full DataFrame
+      Returns fitted model, held-out F1 score and held-out (labels, decision scores)
       """
 
-      # Transpose all text to lowercase 
-      DF[VAR] = DF[VAR].str.lower()
-      
-      # Remove extraneous characters
-      DF[VAR] = DF[VAR].apply(lambda x: re.sub(r"(@[A-Za-z0-9]+)|([^0-9A-Za-z \t])|(\w+:\/\/\S+)|^rt|http.+?", "", x))
-
-      # Remove all whitespace
-      DF[VAR] = DF[VAR].str.strip()
-                            
-      return DF
+      if BALANCE != 'concat':
+            return train_balanced(TRAIN_DATA, BALANCE, EPOCHS)
 
+      # The concat split below sees resampled copies on both sides, and a 50/50
+      # balance - Platt scaling needs distinct rows at the real prevalence
+      calibration_rows = None
 
-def main():
-
-      # Read in train data
-      train_data = pd.read_csv('../../../data/tweet-data/hate-speech/train.csv')
-      
-      # Clean Tweet text
-      train_data = clean_text_data(train_data, 'tweet')
+      if CALIBRATE:
+            TRAIN_DATA, calibration_rows = train_test_split(TRAIN_DATA, stratify=TRAIN_DATA['label'],
+                                                            random_state=101)
 
       # ---- Balance dataset
       
       # Not labeled as Hate Speech
-      t_maj = train_data[train_data['label'] == 0]
+      t_maj = TRAIN_DATA[TRAIN_DATA['label'] == 0]
       
       # Labeled as Hate Speech
-      t_min = train_data[train_data['label'] == 1]
+      t_min = TRAIN_DATA[TRAIN_DATA['label'] == 1]
 
       # Resample data to balance observation types
       t_unsampled = resample(t_min, replace=True, n_samples=len(t_maj), random_state=101)
@@ -76,15 +88,197 @@ def main():
                                                           train_unsampled['label'],
                                                           random_state=101)
 
-      # Fit pipeline to training data
-      model = pipeline_sgd.fit(X_train, y_train)
+      # Fit pipeline to training data (vectorizer + TF-IDF + SGD in one call)
+      with span('fit', rows_in=len(X_train), balance='concat'):
+            model = pipeline_sgd.fit(X_train, y_train)
       
       # Predict y values
-      y_predict = model.predict(X_test)
+      with span('predict', rows_in=len(X_test)):
+            y_predict = model.predict(X_test)
+
+      if calibration_rows is not None:
+            holdout = (calibration_rows['label'].to_numpy(dtype=int), model.decision_function(calibration_rows['tweet']))
+      else:
+            holdout = (y_test.to_numpy(), model.decision_function(X_test))
+
+      return model, f1_score(y_predict, y_test), holdout
+
+
+def train_balanced(TRAIN_DATA, BALANCE, EPOCHS=5):
+      """
+      TRAIN_DATA => Cleaned DataFrame with tweet and label columns
+      BALANCE => weights, undersample or stream (see balancing.py)
+      EPOCHS => Passes over the balanced minibatches (stream only)
+
+      Splits before balancing, so the held-out rows are never duplicates of
+      training rows (the concat path leaks resampled copies across its split)
+      and the held-out F1 is measured at the real class balance
+
+      Returns fitted model, held-out F1 score and held-out (labels, decision scores)
+      """
+
+      X_train, X_test, y_train, y_test = train_test_split(TRAIN_DATA['tweet'].to_numpy(),
+                                                          TRAIN_DATA['label'].to_numpy(dtype=int),
+                                                          stratify=TRAIN_DATA['label'],
+                                                          random_state=101)
+
+      vectorizer, tfidf, classifier = CountVectorizer(), TfidfTransformer(), SGDClassifier(random_state=101)
+
+      if BALANCE == 'stream':
+            # Vocabulary + IDF from the distinct training rows, then balanced partial_fit batches
+            with span('vectorize', rows_in=len(X_train)):
+                  features = tfidf.fit_transform(vectorizer.fit_transform(X_train))
+
+            with span('fit', balance=BALANCE, epochs=EPOCHS):
+                  for epoch in range(EPOCHS):
+                        for rows in balanced_batches(y_train, SEED=101 + epoch):
+                              classifier.partial_fit(features[rows], y_train[rows], classes=np.array([0, 1]))
+
+      else:
+            rows, weights = balanced_indices(y_train, BALANCE)
+
+            # Each distinct Tweet is vectorized once, whatever its weight
+            with span('vectorize', rows_in=len(rows)):
+                  features = tfidf.fit_transform(vectorizer.fit_transform(X_train[rows]))
+
+            with span('fit', rows_in=len(rows), balance=BALANCE):
+                  classifier.fit(features, y_train[rows], sample_weight=weights)
+
+      model = Pipeline([('vect', vectorizer), ('tfidf', tfidf), ('nb', classifier)])
+
+      with span('predict', rows_in=len(X_test)):
+            scores = model.decision_function(X_test)
+      y_predict = model.classes_[(scores > 0).astype(int)]
+
+      return model, f1_score(y_predict, y_test), (y_test, scores)
+
+
+def train_hashing(PATH, BATCH_SIZE=50_000, N_FEATURES=2 ** 20, EPOCHS=5, HOLDOUT=4):
+      """
+      PATH => Training table path without extension
+      BATCH_SIZE => Rows per minibatch
+      N_FEATURES => Width of the hashed feature space (fixes the model size)
+      EPOCHS => Passes over the stream
+      HOLDOUT => Every HOLDOUT-th row is held out for scoring (4 => 25%, like train_test_split)
+
+      Out-of-core training - streams the table in minibatches through a stateless
+      HashingVectorizer into SGDClassifier.partial_fit. Nothing vocabulary-sized is
+      ever held in memory, and the saved model size depends only on N_FEATURES
+
+      Returns fitted model, held-out F1 score and held-out (labels, decision scores)
+      """
+
+      vectorizer = HashingVectorizer(n_features=N_FEATURES, alternate_sign=False, norm='l2')
+      classifier = SGDClassifier(random_state=101)
+      classes = np.array([0, 1])
+
+      def held_out(OFFSET, N):
+            # Deterministic split by global row number
+            return (np.arange(OFFSET, OFFSET + N) % HOLDOUT) == 0
+
+      def minibatches():
+            # Yields (features, labels, held-out mask)
+            offset = 0
+
+            for batch in iter_table(PATH, BATCH_SIZE=BATCH_SIZE, COLUMNS=['tweet', 'label']):
+                  batch = clean_text_data(batch, 'tweet')
+                  held = held_out(offset, len(batch))
+                  offset += len(batch)
+
+                  yield vectorizer.transform(batch['tweet'].fillna('')), batch['label'].to_numpy(dtype=int), held
+
+      # Cheap first pass over the label column only => balanced class weights for the rows trained on
+      counts, offset = np.zeros(2), 0
+
+      for batch in iter_table(PATH, BATCH_SIZE=BATCH_SIZE, COLUMNS=['label']):
+            y = batch['label'].to_numpy(dtype=int)
+            counts += np.bincount(y[~held_out(offset, len(y))], minlength=2)
+            offset += len(y)
+
+      if not counts.all():
+            raise ValueError(f'Training rows need both classes, got {int(counts[0]):,} label 0 '
+                             f'and {int(counts[1]):,} label 1')
+
+      weights = counts.sum() / (2 * counts)
+
+      for epoch in range(EPOCHS):
+            for X, y, held in minibatches():
+                  classifier.partial_fit(X[~held], y[~held], classes=classes, sample_weight=weights[y[~held]])
+
+      # Score the held-out rows with the final model
+      y_true, scores = [], []
+
+      for X, y, held in minibatches():
+            y_true.append(y[held])
+            scores.append(classifier.decision_function(X[held]))
+
+      model = Pipeline([('vect', vectorizer), ('nb', classifier)])
+      y_true, scores = np.concatenate(y_true), np.concatenate(scores)
+
+      return model, f1_score((scores > 0).astype(int), y_true), (y_true, scores)
+
+
+def fit_calibration(HOLDOUT):
+      """
+      HOLDOUT => (labels, decision scores) for rows the model never trained on, at
+                 the real class balance (train_pipeline with CALIBRATE=True for
+                 concat, train_balanced, or train_hashing's every-nth rows)
+
+      Platt scaling - fits P(hate) = 1 / (1 + exp(-(a * score + b))) on held-out
+      scores. Probabilities reflect the class balance of the held-out rows
+
+      Returns {'a': slope, 'b': intercept}
+      """
+
+      y_true, scores = HOLDOUT
+      platt = LogisticRegression(C=1e6).fit(scores.reshape(-1, 1), y_true)
+
+      return {'a': float(platt.coef_[0, 0]), 'b': float(platt.intercept_[0])}
+
+
+def main():
+      parser = argparse.ArgumentParser(description='Train the hate speech classifier')
+      parser.add_argument('--mode', choices=['pipeline', 'hashing'], default='pipeline',
+                          help='pipeline = in-memory CountVectorizer/TF-IDF, hashing = out-of-core partial_fit')
+      parser.add_argument('--batch-size', type=int, default=50_000)
+      parser.add_argument('--n-features', type=int, default=2 ** 20)
+      parser.add_argument('--epochs', type=int, default=5)
+      parser.add_argument('--balance', choices=['concat', 'weights', 'undersample', 'stream'], default='concat',
+                          help='pipeline mode class balancing - concat duplicates resampled rows, '
+                               'the others use index arrays / sample weights (balancing.py)')
+      parser.add_argument('--calibrate', action='store_true',
+                          help='Fit Platt scaling on held-out scores so deploy-model can store probabilities')
+      args = parser.parse_args()
+
+      if args.mode == 'hashing':
+            with span('train', mode='hashing', bytes_read=table_bytes(TRAIN)):
+                  model, f1, holdout = train_hashing(TRAIN, BATCH_SIZE=args.batch_size, N_FEATURES=args.n_features,
+                                          EPOCHS=args.epochs)
+
+      else:
+            # Read in train data
+            with span('read', bytes_read=table_bytes(TRAIN)) as s:
+                  train_data = read_table(TRAIN, COLUMNS=['tweet', 'label'])
+                  s.add(rows_out=len(train_data))
+
+            # Clean Tweet text
+            with span('clean', rows_in=len(train_data)):
+                  train_data = clean_text_data(train_data, 'tweet')
+
+            with span('train', mode='pipeline', rows_in=len(train_data)):
+                  model, f1, holdout = train_pipeline(train_data, BALANCE=args.balance, EPOCHS=args.epochs,
+                                                      CALIBRATE=args.calibrate)
 
       # Print accuracy score
-      print(f'\nModel F1 score:\t\t{f1_score(y_predict, y_test)}')
+      print(f'\nModel F1 score:\t\t{f1}')
       
       # Save classifier locally
-      with open('../../../data/tweet-data/trained_hs_classifier.sav', 'wb') as outgoing:
-            pickle.dump(model, outgoing)
\ No newline at end of file
+      # Manifest + raw arrays - see model_format.py (no pickle)
+      with span('save') as s:
+            save_model(model, MODEL, CALIBRATION=fit_calibration(holdout) if args.calibrate else None)
+            s.add(bytes_written=table_bytes(MODEL))
+
+
+# ---- Run script
+if __name__ == "__main__":
+      main()
@@ -0,0 +1,216 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Population change and binning engine - the Python replacement for the
+data half of bin_by_demo_change.R (the R script is still there for its maps)
+
+* Reads the cleaned county table from scrape_census.py (cleanup_county_data)
+* Pivots county x year once, then computes every race / ethnicity share and
+  its percentage-point and relative change for each pair of years
+  (2000 => 2010, 2010 => 2020, 2000 => 2020) in a single NumPy pass
+* Bins a change column into equal-count (quantile) or custom-edge groups,
+  labeled low / mid / high, so generate_random_fips.py reads labels directly
+* Keeps the R output's columns (hispanic_population_change, nhw_change_bin, ...)
+
+      python3 bin_by_demo_change.py                         # tertiles, like cut_number(x, 3)
+      python3 bin_by_demo_change.py --measure pp            # bin percentage-point changes
+      python3 bin_by_demo_change.py --edges -100 0 50 1000  # custom edges
+
+Ian Richard Ferguson | Stanford University
+"""
+
+
+# ---- Imports
+import os, sys, argparse, itertools
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from storage import read_table, write_table
+from instrument import span, table_bytes
+
+
+# ---- Globals
+INPUT = '../../data/county-demographics'
+OUTPUT = '../../data/demographic-data/tidy-population-changes'
+
+YEARS = [2000, 2010, 2020]
+
+# Count column => group name used in the output columns
+GROUPS = {'white_pop': 'white', 'non_hispanic_pop': 'non_hispanic',
+          'hispanic_pop': 'hispanic', 'non_hispanic_white_pop': 'non_hispanic_white'}
+
+LABELS = ['low', 'mid', 'high']
+
+# Legacy R column => group it was computed from. The R script's "nhw" share
+# was non_hispanic_pop / total_pop, kept as-is so the bins don't move
+LEGACY = {'hispanic': 'hispanic', 'nhw': 'non_hispanic'}
+
+
+# ---- Helpers
+def bin_labels(N):
+    return LABELS if N == len(LABELS) else [f'q{i + 1}' for i in range(N)]
+
+
+def bin_values(VALUES, BINS=3, EDGES=None, LABELS=None):
+    """
+    VALUES => Numeric Series
+    BINS => Number of equal-count groups (ignored when EDGES is given)
+    EDGES => Optional custom bin edges, lowest to highest
+    LABELS => Group labels (default low / mid / high for three groups)
+
+    Equal-count bins use the same type 7 quantiles and closed-right intervals
+    as ggplot2::cut_number. Returns an ordered Categorical (NaN stays NaN)
+    """
+
+    if EDGES is not None:
+        labels = LABELS or bin_labels(len(EDGES) - 1)
+        return pd.cut(VALUES, EDGES, labels=labels, include_lowest=True)
+
+    return pd.qcut(VALUES, BINS, labels=LABELS or bin_labels(BINS))
+
+
+def zscore(x):
+    # Same as R's scale() => sample standard deviation
+    return (x - x.mean()) / x.std(ddof=1)
+
+
+# ---- Change engine
+def pivot_counts(DF, YEARS=YEARS):
+    """
+    DF => Long county table (one row per county x year)
+    YEARS => Years to keep, in order
+
+    Returns (labels frame, counts array of shape counties x columns x years, column names)
+    """
+
+    counts = ['total_pop'] + [c for c in GROUPS if c in DF.columns]
+
+    DF = DF[DF['year'].isin(YEARS)].drop_duplicates(['fips', 'year'], keep='last')
+    wide = DF.pivot(index='fips', columns='year', values=counts).sort_index()
+
+    labels = DF.drop_duplicates('fips', keep='last').set_index('fips').loc[wide.index, ['state_name', 'county_name']]
+
+    # Years missing from the table entirely come back as all-NaN slices
+    wide = wide.reindex(columns=pd.MultiIndex.from_product([counts, YEARS]))
+    array = wide.to_numpy(dtype=np.float64, na_value=np.nan).reshape(len(wide), len(counts), len(YEARS))
+
+    return labels.reset_index()[['state_name', 'county_name', 'fips']], array, counts
+
+
+def population_changes(DF, YEARS=YEARS):
+    """
+    DF => Long county table (output of cleanup_county_data)
+    YEARS => Years to compare
+
+    One row per county with, for every group and pair of years a < b
+        * {group}_pct_{year}             => share of total population (%)
+        * {group}_pp_change_{a}_{b}      => percentage-point change in share
+        * {group}_rel_change_{a}_{b}     => relative change in share (%)
+    plus total_pop_{year} and total_population_change_{a}_{b}
+    """
+
+    labels, array, counts = pivot_counts(DF, YEARS)
+    groups = [GROUPS[c] for c in counts[1:]]
+
+    total = array[:, 0, :]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # counties x groups x years
+        shares = array[:, 1:, :] / total[:, None, :] * 100
+
+        pairs = list(itertools.combinations(range(len(YEARS)), 2))
+        a, b = np.array([p[0] for p in pairs]), np.array([p[1] for p in pairs])
+
+        # counties x groups x pairs, every pair at once
+        pp = shares[:, :, b] - shares[:, :, a]
+        rel = pp / shares[:, :, a] * 100
+        total_change = (total[:, b] - total[:, a]) / total[:, a] * 100
+
+    columns = {}
+
+    for j, year in enumerate(YEARS):
+        columns[f'total_pop_{year}'] = total[:, j]
+
+    for k, (i, j) in enumerate(pairs):
+        columns[f'total_population_change_{YEARS[i]}_{YEARS[j]}'] = total_change[:, k]
+
+    for g, group in enumerate(groups):
+        for j, year in enumerate(YEARS):
+            columns[f'{group}_pct_{year}'] = shares[:, g, j]
+
+        for k, (i, j) in enumerate(pairs):
+            columns[f'{group}_pp_change_{YEARS[i]}_{YEARS[j]}'] = pp[:, g, k]
+            columns[f'{group}_rel_change_{YEARS[i]}_{YEARS[j]}'] = rel[:, g, k]
+
+    out = pd.concat([labels, pd.DataFrame(columns)], axis=1)
+
+    # Infinite changes (a group absent in the base year) can't be binned
+    return out.replace([np.inf, -np.inf], np.nan)
+
+
+def add_legacy_columns(DF, FIRST=YEARS[0], LAST=YEARS[-1], MEASURE='rel', BINS=3, EDGES=None):
+    """
+    DF => Output of population_changes
+    FIRST, LAST => Years the bins compare (the R script used 2000 => 2020)
+    MEASURE => rel (relative change, like the R script) or pp (percentage points)
+    BINS, EDGES => See bin_values
+
+    Adds the columns bin_by_demo_change.R wrote, binned with labels
+    """
+
+    DF['total_population_change'] = DF[f'total_population_change_{FIRST}_{LAST}']
+    DF['total_pop_scaled'] = zscore(DF['total_population_change'])
+
+    for legacy, group in LEGACY.items():
+        if f'{group}_pct_{FIRST}' not in DF.columns:
+            continue
+
+        change = DF[f'{group}_{MEASURE}_change_{FIRST}_{LAST}']
+
+        DF[f'{legacy}_population_change'] = change
+        DF[f'{legacy}_pop_scaled'] = zscore(change)
+        DF[f'{legacy}_change_bin'] = bin_values(change, BINS, EDGES)
+
+    return DF
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='County population changes and high / mid / low bins')
+    parser.add_argument('--input', default=INPUT, help='Cleaned county table (storage.py path)')
+    parser.add_argument('--measure', choices=['rel', 'pp'], default='rel', help='Change to bin on')
+    parser.add_argument('--bins', type=int, default=3, help='Equal-count groups')
+    parser.add_argument('--edges', nargs='+', type=float, default=None, help='Custom bin edges (overrides --bins)')
+
+    return parser.parse_args()
+
+
+# ---- Run script
+def main():
+    args = parse_args()
+
+    with span('read') as s:
+        columns = ['year', 'state_name', 'county_name', 'fips', 'total_pop'] + list(GROUPS)
+        data = read_table(args.input)
+        data = data[[c for c in columns if c in data.columns]]
+        s.add(rows_out=len(data), bytes_read=table_bytes(args.input))
+
+    with span('changes', rows_in=len(data)) as s:
+        data['year'] = pd.to_numeric(data['year'])
+        changes = add_legacy_columns(population_changes(data), MEASURE=args.measure,
+                                     BINS=args.bins, EDGES=args.edges)
+        s.add(rows_out=len(changes))
+
+    print(changes['hispanic_change_bin'].value_counts(sort=False).to_string())
+
+    with span('write', rows_out=len(changes)) as s:
+        write_table(changes, OUTPUT)
+        s.add(bytes_written=table_bytes(OUTPUT))
+
+    print(f'\n{len(changes)} counties saved to {OUTPUT}')
+
+
+if __name__ == "__main__":
+    main()
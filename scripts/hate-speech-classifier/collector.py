@@ -0,0 +1,328 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Asyncio collection engine for Twitter search + reverse geocoding
+
+* Clients are pluggable - anything with async search() / reverse_geocode()
+  methods returning (payload, headers) works. HTTPClient talks to the real
+  v1.1 API (or fake_twitter.py on localhost)
+* A token bucket per endpoint keeps each quota saturated across many places
+  at once, and is re-synced from x-rate-limit-* response headers
+* A 429 only parks the endpoint that hit it, never the whole process
+
+Ian Richard Ferguson | Stanford University
+"""
+
+
+# ---- Imports
+import asyncio, time
+import pandas as pd
+import requests
+
+
+# ---- Globals
+BASE_URL = 'https://api.twitter.com/1.1'
+
+# Requests per 15-minute window (user auth)
+LIMITS = {'search': (180, 900), 'reverse_geocode': (75, 900)}
+
+PAGE_SIZE = 100
+
+
+# ---- Rate limiting
+class RateLimited(Exception):
+    """
+    Raised by clients on HTTP 429; carries the response headers
+    """
+
+    def __init__(self, headers):
+        super().__init__('Rate limit exceeded')
+        self.headers = headers
+
+
+class TokenBucket:
+    """
+    capacity => Max requests per window
+    window => Window length in seconds
+
+    Refills continuously at capacity / window tokens per second
+    """
+
+    def __init__(self, capacity, window):
+        self.capacity = capacity
+        self.rate = capacity / window
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """
+        Waits until one request may be sent, then spends a token
+        """
+
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+
+                # Server told us the window is spent
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+
+                self._refill()
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def sync(self, headers):
+        """
+        headers => Response headers from the API
+
+        The server is authoritative - never hold more tokens than it reports
+        """
+
+        remaining = headers.get('x-rate-limit-remaining')
+        reset = headers.get('x-rate-limit-reset')
+
+        if remaining is None:
+            return
+
+        self._refill()
+        self.tokens = min(self.tokens, float(remaining))
+
+        if int(remaining) <= 0 and reset is not None:
+            # Reset is wall-clock epoch seconds, the bucket runs on monotonic time
+            wait = max(0.0, float(reset) - time.time())
+            self.blocked_until = time.monotonic() + wait
+
+
+class RateLimitScheduler:
+    """
+    LIMITS => Dictionary of endpoint => (requests, window seconds)
+
+    One TokenBucket per endpoint
+    """
+
+    def __init__(self, LIMITS=LIMITS):
+        self.buckets = {name: TokenBucket(*limit) for name, limit in LIMITS.items()}
+
+    async def acquire(self, ENDPOINT):
+        await self.buckets[ENDPOINT].acquire()
+
+    def observe(self, ENDPOINT, HEADERS):
+        self.buckets[ENDPOINT].sync(HEADERS)
+
+    async def call(self, ENDPOINT, FUNC, *args, **kwargs):
+        """
+        ENDPOINT => Key into LIMITS
+        FUNC => Client coroutine returning (payload, headers)
+
+        Waits for a token, calls the client, and retries after a 429
+        """
+
+        while True:
+            await self.acquire(ENDPOINT)
+
+            try:
+                payload, headers = await FUNC(*args, **kwargs)
+            except RateLimited as e:
+                self.observe(ENDPOINT, e.headers)
+                continue
+
+            self.observe(ENDPOINT, headers)
+            return payload
+
+
+# ---- Clients
+class HTTPClient:
+    """
+    BASE_URL => API root (real API, or http://127.0.0.1:<port>/1.1 for the fake server)
+    AUTH => Optional requests auth object (e.g., tweepy's auth.apply_auth())
+
+    Blocking requests calls run in worker threads so the event loop never stalls
+    """
+
+    def __init__(self, BASE_URL=BASE_URL, AUTH=None, TIMEOUT=30):
+        self.base_url = BASE_URL.rstrip('/')
+        self.session = requests.Session()
+        self.session.auth = AUTH
+        self.timeout = TIMEOUT
+
+    def _get(self, PATH, PARAMS):
+        r = self.session.get(f'{self.base_url}/{PATH}', params=PARAMS, timeout=self.timeout)
+        headers = {k.lower(): v for k, v in r.headers.items()}
+
+        if r.status_code == 429:
+            raise RateLimited(headers)
+
+        r.raise_for_status()
+
+        return r.json(), headers
+
+    async def search(self, QUERY, COUNT, MAX_ID=None):
+        params = {'q': QUERY, 'lang': 'en', 'tweet_mode': 'extended',
+                  'result_type': 'recent', 'count': COUNT}
+
+        if MAX_ID is not None:
+            params['max_id'] = MAX_ID
+
+        payload, headers = await asyncio.to_thread(self._get, 'search/tweets.json', params)
+
+        return payload['statuses'], headers
+
+    async def reverse_geocode(self, LAT, LONG):
+        params = {'lat': LAT, 'long': LONG}
+        payload, headers = await asyncio.to_thread(self._get, 'geo/reverse_geocode.json', params)
+
+        return payload['result']['places'], headers
+
+
+# ---- Collection
+def place_query(PLACE_ID):
+    """
+    Original context is best for our purposes
+    """
+
+    return f"place:{PLACE_ID} -filter:retweets -filter:links"
+
+
+def status_point(STATUS):
+    """
+    STATUS => Tweet JSON dictionary
+
+    Exact coordinates when the Tweet is geotagged, otherwise the centre of
+    its place bounding box
+
+    Returns (longitude, latitude, source) with source point, place or None
+    """
+
+    point = STATUS.get('coordinates') or {}
+
+    if point.get('coordinates'):
+        lon, lat = point['coordinates'][:2]
+        return float(lon), float(lat), 'point'
+
+    box = ((STATUS.get('place') or {}).get('bounding_box') or {}).get('coordinates')
+
+    if box:
+        corners = box[0]
+        return (sum(c[0] for c in corners) / len(corners),
+                sum(c[1] for c in corners) / len(corners), 'place')
+
+    return float('nan'), float('nan'), None
+
+
+def statuses_to_frame(STATUSES, FIPS, PLACE_ID, DEMOGRAPHIC_STATUS):
+    """
+    STATUSES => List of tweet JSON dictionaries
+    FIPS => Five-digit FIPS code
+    PLACE_ID => Twitter Place ID
+    DEMOGRAPHIC_STATUS => [high, mid, low]
+
+    Returns the same frame layout the tweepy scraper produces
+    """
+
+    points = [status_point(s) for s in STATUSES]
+    # utc=True keeps an empty page tz-aware too, so dropping the zone never fails
+    created = pd.to_datetime([s['created_at'] for s in STATUSES], format='%a %b %d %H:%M:%S %z %Y', utc=True)
+
+    tweet_data = pd.DataFrame({'DateTime': created.tz_localize(None),
+                               'UserName': [s['user']['name'] for s in STATUSES],
+                               'ScreenName': [s['user']['screen_name'] for s in STATUSES],
+                               'Location': [s['user']['location'] for s in STATUSES],
+                               'Tweet': [s.get('full_text', s.get('text')) for s in STATUSES],
+                               'Likes': [s['favorite_count'] for s in STATUSES],
+                               'Retweets': [s['retweet_count'] for s in STATUSES]})
+
+    tweet_data['fips'] = [FIPS] * len(tweet_data)
+    tweet_data['hispanic-pop-change'] = [DEMOGRAPHIC_STATUS] * len(tweet_data)
+    tweet_data['place_id'] = [PLACE_ID] * len(tweet_data)
+
+    tweet_data['lon'] = [p[0] for p in points]
+    tweet_data['lat'] = [p[1] for p in points]
+    tweet_data['geo_source'] = [p[2] for p in points]
+
+    return tweet_data
+
+
+async def collect_place(CLIENT, SCHEDULER, PLACE_ID, COUNT):
+    """
+    CLIENT => Any client with an async search() method
+    SCHEDULER => RateLimitScheduler
+    PLACE_ID => Twitter Place ID
+    COUNT => Max tweets to pull
+
+    Pages backwards through search results (max_id) until COUNT or exhaustion
+    """
+
+    statuses, max_id = [], None
+
+    while len(statuses) < COUNT:
+        page = await SCHEDULER.call('search', CLIENT.search, place_query(PLACE_ID),
+                                    min(PAGE_SIZE, COUNT - len(statuses)), max_id)
+
+        if len(page) == 0:
+            break
+
+        statuses.extend(page)
+        max_id = min(s['id'] for s in page) - 1
+
+    return statuses[:COUNT]
+
+
+async def collect_places(CLIENT, JOBS, COUNT, ON_RESULT, CONCURRENCY=16, SCHEDULER=None):
+    """
+    CLIENT => Any client with an async search() method
+    JOBS => List of tuples with the Place ID second, e.g. scrape_twitter.plan_jobs
+    COUNT => Max tweets per place
+    ON_RESULT => Callback(job, statuses), e.g. a sink write - runs on the event loop
+    CONCURRENCY => Max places in flight
+
+    Scrapes every place concurrently; the scheduler keeps the search quota saturated
+    """
+
+    scheduler = SCHEDULER or RateLimitScheduler()
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def worker(job):
+        async with semaphore:
+            statuses = await collect_place(CLIENT, scheduler, job[1], COUNT)
+
+        ON_RESULT(job, statuses)
+
+    await asyncio.gather(*[worker(job) for job in JOBS])
+
+
+async def geocode_all(CLIENT, COORDS, CONCURRENCY=16, SCHEDULER=None, ON_RESULT=None):
+    """
+    CLIENT => Any client with an async reverse_geocode() method
+    COORDS => List of (lat, long) pairs
+    ON_RESULT => Optional callback(index, places) as each lookup lands, e.g. a cache write
+
+    Returns a list of place lists, in input order
+    """
+
+    scheduler = SCHEDULER or RateLimitScheduler()
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def worker(index, lat, long):
+        async with semaphore:
+            places = await scheduler.call('reverse_geocode', CLIENT.reverse_geocode, lat, long)
+
+        if ON_RESULT is not None:
+            ON_RESULT(index, places)
+
+        return places
+
+    return await asyncio.gather(*[worker(i, lat, long) for i, (lat, long) in enumerate(COORDS)])
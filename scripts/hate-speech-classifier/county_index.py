@@ -0,0 +1,252 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Point-in-county resolution for Tweet coordinates
+
+County polygons are read once from GeoJSON (feature id = five-digit FIPS,
+as in plotly's geojson-counties-fips.json or the Census cartographic
+boundary files) and flattened into NumPy edge arrays. A uniform lon/lat
+grid maps every cell to the counties whose bounding boxes overlap it, so
+each point is only ray-cast against a handful of candidate polygons, and
+all points sharing a candidate are tested in one vectorized pass
+
+      index = load_counties()
+      index.assign_fips(lon, lat)     # => array of FIPS (None outside every county)
+
+Ian Richard Ferguson | Stanford University
+"""
+
+
+# ---- Imports
+import json, os, sys
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from reference import ensure
+
+
+# ---- Globals
+# Grid cell size in degrees (~55 km) - a few candidate counties per cell
+CELL = 0.5
+
+# Max points x edges per ray-casting block
+BLOCK = 4_000_000
+
+
+# ---- Helpers
+def feature_fips(FEATURE):
+    """
+    FEATURE => GeoJSON feature
+
+    Returns the five-digit FIPS code (id, GEOID, or STATE + COUNTY properties)
+    """
+
+    props = FEATURE.get('properties') or {}
+    fips = FEATURE.get('id') or props.get('GEOID') or f"{props.get('STATE', '')}{props.get('COUNTY', '')}"
+
+    return str(fips).zfill(5)
+
+
+def feature_rings(GEOMETRY):
+    """
+    GEOMETRY => GeoJSON Polygon or MultiPolygon
+
+    Returns list of (n, 2) ring arrays - holes included, even-odd ray casting handles them
+    """
+
+    if GEOMETRY['type'] == 'Polygon':
+        polygons = [GEOMETRY['coordinates']]
+    elif GEOMETRY['type'] == 'MultiPolygon':
+        polygons = GEOMETRY['coordinates']
+    else:
+        return []
+
+    return [np.asarray(ring, dtype=np.float64)[:, :2] for polygon in polygons for ring in polygon]
+
+
+def ring_edges(RING):
+    """
+    RING => (n, 2) coordinates, closed or not
+
+    Returns (n, 4) array of x0, y0, x1, y1 segments
+    """
+
+    if not np.array_equal(RING[0], RING[-1]):
+        RING = np.vstack([RING, RING[:1]])
+
+    return np.hstack([RING[:-1], RING[1:]])
+
+
+# ---- Index
+class CountyIndex:
+    """
+    fips => FIPS code per county
+    rings => List (per county) of ring arrays
+    cell => Grid cell size in degrees
+    """
+
+    def __init__(self, fips, rings, cell=CELL):
+        self.fips = np.asarray(fips, dtype=object)
+        self.cell = cell
+
+        edges = [np.vstack([ring_edges(r) for r in county]) if county else np.empty((0, 4)) for county in rings]
+        counts = np.array([len(e) for e in edges], dtype=np.int64)
+
+        # Edges stored contiguously per county
+        self.edges = np.vstack(edges)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+        bbox = np.full((len(edges), 4), np.nan)
+
+        for i, e in enumerate(edges):
+            if len(e):
+                bbox[i] = e[:, 0].min(), e[:, 1].min(), e[:, 0].max(), e[:, 1].max()
+
+        self.bbox = bbox
+        self._build_grid()
+
+
+    def _build_grid(self):
+        # Cell => candidate counties, stored as CSR (cell_offsets, cell_counties)
+        valid = ~np.isnan(self.bbox[:, 0])
+        self.origin = np.nanmin(self.bbox[:, 0]), np.nanmin(self.bbox[:, 1])
+
+        self.nx = int(np.ceil((np.nanmax(self.bbox[:, 2]) - self.origin[0]) / self.cell)) + 1
+        self.ny = int(np.ceil((np.nanmax(self.bbox[:, 3]) - self.origin[1]) / self.cell)) + 1
+
+        cells, owners = [], []
+
+        for i in np.flatnonzero(valid):
+            x0, y0, x1, y1 = self._cell_xy(self.bbox[i, [0, 2]], self.bbox[i, [1, 3]])
+            ix, iy = np.meshgrid(np.arange(x0, x1 + 1), np.arange(y0, y1 + 1))
+
+            cells.append((iy * self.nx + ix).ravel())
+            owners.append(np.full(ix.size, i, dtype=np.int64))
+
+        cells, owners = np.concatenate(cells), np.concatenate(owners)
+        order = np.argsort(cells, kind='stable')
+
+        self.cell_counties = owners[order]
+        self.cell_offsets = np.concatenate([[0], np.cumsum(np.bincount(cells, minlength=self.nx * self.ny))])
+
+
+    def _cell_xy(self, LON, LAT):
+        ix = np.floor((np.asarray(LON) - self.origin[0]) / self.cell).astype(np.int64)
+        iy = np.floor((np.asarray(LAT) - self.origin[1]) / self.cell).astype(np.int64)
+
+        return ix[0], iy[0], ix[-1], iy[-1]
+
+
+    def contains(self, COUNTY, LON, LAT):
+        """
+        COUNTY => County position in the index
+        LON, LAT => Point arrays
+
+        Even-odd ray casting against every edge of the county at once
+
+        Returns boolean array
+        """
+
+        edges = self.edges[self.offsets[COUNTY]:self.offsets[COUNTY + 1]]
+        x0, y0, x1, y1 = edges.T
+
+        inside = np.zeros(len(LON), dtype=bool)
+        step = max(BLOCK // max(len(edges), 1), 1)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for s in range(0, len(LON), step):
+                px, py = LON[s:s + step, None], LAT[s:s + step, None]
+
+                straddle = (y0 > py) != (y1 > py)
+                crossing = px < x0 + (py - y0) * (x1 - x0) / (y1 - y0)
+
+                inside[s:s + step] = np.count_nonzero(straddle & crossing, axis=1) % 2 == 1
+
+        return inside
+
+
+    def locate(self, LON, LAT):
+        """
+        LON, LAT => Coordinate arrays (NaN allowed)
+
+        Returns county positions (-1 outside every county)
+        """
+
+        lon = np.asarray(LON, dtype=np.float64)
+        lat = np.asarray(LAT, dtype=np.float64)
+        result = np.full(len(lon), -1, dtype=np.int64)
+
+        ix = np.floor((lon - self.origin[0]) / self.cell)
+        iy = np.floor((lat - self.origin[1]) / self.cell)
+        ok = (ix >= 0) & (ix < self.nx) & (iy >= 0) & (iy < self.ny)
+
+        points = np.flatnonzero(ok)
+        cells = (iy[ok] * self.nx + ix[ok]).astype(np.int64)
+
+        # Expand every point into (point, candidate county) pairs
+        start = self.cell_offsets[cells]
+        counts = self.cell_offsets[cells + 1] - start
+
+        pair_point = np.repeat(points, counts)
+        first = np.repeat(start - np.concatenate([[0], np.cumsum(counts)[:-1]]), counts)
+        pair_county = self.cell_counties[first + np.arange(counts.sum())]
+
+        # Bounding box prefilter
+        box = self.bbox[pair_county]
+        px, py = lon[pair_point], lat[pair_point]
+        hit = (px >= box[:, 0]) & (px <= box[:, 2]) & (py >= box[:, 1]) & (py <= box[:, 3])
+
+        pair_point, pair_county = pair_point[hit], pair_county[hit]
+
+        # One vectorized ray cast per candidate county
+        order = np.argsort(pair_county, kind='stable')
+        pair_point, pair_county = pair_point[order], pair_county[order]
+        bounds = np.flatnonzero(np.diff(pair_county, prepend=-1, append=-1))
+
+        for a, b in zip(bounds[:-1], bounds[1:]):
+            pts = pair_point[a:b]
+            pts = pts[self.contains(pair_county[a], lon[pts], lat[pts])]
+
+            # Points on a shared border go to the first county that claims them
+            pts = pts[result[pts] < 0]
+            result[pts] = pair_county[a]
+
+        return result
+
+
+    def assign_fips(self, LON, LAT):
+        """
+        LON, LAT => Coordinate arrays (NaN allowed)
+
+        Returns array of FIPS codes (None outside every county)
+        """
+
+        found = self.locate(LON, LAT)
+
+        return np.where(found >= 0, self.fips[np.maximum(found, 0)], None)
+
+
+def read_geojson(PATH):
+    """
+    PATH => County GeoJSON FeatureCollection
+
+    Returns CountyIndex
+    """
+
+    with open(PATH) as incoming:
+        features = json.load(incoming)['features']
+
+    return CountyIndex([feature_fips(f) for f in features],
+                       [feature_rings(f['geometry']) if f.get('geometry') else [] for f in features])
+
+
+def load_counties(PATH=None):
+    """
+    PATH => County GeoJSON (defaults to the checksummed county-polygons file in reference.py)
+
+    Returns CountyIndex
+    """
+
+    return read_geojson(PATH or ensure('county-polygons'))
@@ -0,0 +1,194 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Local stand-in for the Twitter v1.1 search + reverse geocode endpoints.
+Serves deterministic fake tweets and enforces fixed-window rate limits
+with real x-rate-limit-* headers (and 429s), so the collection engine
+can be exercised and benchmarked without network access
+
+Usage
+
+      python3 fake_twitter.py --port 8900 --limit 180 --window 15 --latency 0.05
+
+Then point a scraper at http://127.0.0.1:8900/1.1
+
+Ian Richard Ferguson | Stanford University
+"""
+
+
+# ---- Imports
+import argparse, json, threading, time, hashlib
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+
+# ---- Helpers
+class FixedWindow:
+    """
+    limit => Requests allowed per window
+    window => Window length in seconds
+
+    Mirrors Twitter's 15-minute fixed windows (scaled down for testing)
+    """
+
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+        self.lock = threading.Lock()
+        self.reset = time.time() + window
+        self.used = 0
+
+    def hit(self):
+        """
+        Returns (allowed, limit, remaining, reset epoch)
+        """
+
+        with self.lock:
+            now = time.time()
+
+            if now >= self.reset:
+                self.reset = now + self.window
+                self.used = 0
+
+            allowed = self.used < self.limit
+            self.used += allowed
+
+            return allowed, self.limit, self.limit - self.used, int(self.reset + 0.999)
+
+
+def fake_status(place_id, tweet_id):
+    """
+    Deterministic tweet JSON for a place + id
+    """
+
+    seed = int(hashlib.md5(f'{place_id}{tweet_id}'.encode()).hexdigest()[:8], 16)
+    created = datetime(2021, 6, 1, tzinfo=timezone.utc) + timedelta(seconds=tweet_id % 2_592_000)
+
+    return {'id': tweet_id,
+            'created_at': created.strftime('%a %b %d %H:%M:%S %z %Y'),
+            'full_text': f'fake tweet {seed % 997} from {place_id}',
+            'favorite_count': seed % 50,
+            'retweet_count': seed % 7,
+            'user': {'name': f'User {seed % 5000}', 'screen_name': f'user_{seed % 5000}',
+                     'location': ''}}
+
+
+def make_handler(windows, tweets_per_place, latency):
+    """
+    Builds a request handler bound to the server's rate-limit state
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body, window):
+            allowed, limit, remaining, reset = window
+            payload = json.dumps(body).encode('utf-8')
+
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.send_header('x-rate-limit-limit', str(limit))
+            self.send_header('x-rate-limit-remaining', str(remaining))
+            self.send_header('x-rate-limit-reset', str(reset))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+            if url.path.endswith('/search/tweets.json'):
+                endpoint = 'search'
+            elif url.path.endswith('/geo/reverse_geocode.json'):
+                endpoint = 'reverse_geocode'
+            else:
+                self.send_error(404)
+                return
+
+            window = windows[endpoint].hit()
+
+            if not window[0]:
+                self._send(429, {'errors': [{'code': 88, 'message': 'Rate limit exceeded'}]}, window)
+                return
+
+            # Simulated network + server time
+            time.sleep(latency)
+
+            if endpoint == 'search':
+                place = query['q'].split()[0].replace('place:', '')
+                count = int(query.get('count', 15))
+                top = int(query.get('max_id', tweets_per_place))
+                ids = range(min(top, tweets_per_place), max(min(top, tweets_per_place) - count, 0), -1)
+
+                # Roughly one place in ten has no recent tweets at all
+                if int(hashlib.md5(place.encode()).hexdigest()[:8], 16) % 10 == 0:
+                    ids = []
+
+                self._send(200, {'statuses': [fake_status(place, i) for i in ids]}, window)
+
+            else:
+                key = f"{float(query['lat']):.1f},{float(query['long']):.1f}"
+                digest = hashlib.md5(key.encode()).hexdigest()
+
+                # Admin areas span ~5 degree cells, so neighbouring counties share one (like a state)
+                admin = hashlib.md5(f"{float(query['lat']) // 5},{float(query['long']) // 5}".encode()).hexdigest()
+
+                places = [{'id': digest[:16], 'name': f'City {digest[:4]}', 'place_type': 'city'},
+                          {'id': digest[16:], 'name': f'County {digest[4:8]}', 'place_type': 'admin'},
+                          {'id': admin[:16], 'name': f'Admin {admin[:4]}', 'place_type': 'admin'},
+                          {'id': '96683cc9126741d1', 'name': 'United States', 'place_type': 'country'}]
+
+                self._send(200, {'result': {'places': places}}, window)
+
+    return Handler
+
+
+def serve(PORT=0, LIMIT=180, WINDOW=15.0, GEO_LIMIT=75, TWEETS_PER_PLACE=500, LATENCY=0.05):
+    """
+    PORT => Port to bind on localhost (0 picks a free one)
+    LIMIT / GEO_LIMIT => Search / reverse geocode requests per window
+    WINDOW => Window length in seconds
+    TWEETS_PER_PLACE => Tweets available for every place
+    LATENCY => Seconds of simulated latency per request
+
+    Starts the server on a daemon thread, returns (server, base_url)
+    """
+
+    windows = {'search': FixedWindow(LIMIT, WINDOW), 'reverse_geocode': FixedWindow(GEO_LIMIT, WINDOW)}
+    server = ThreadingHTTPServer(('127.0.0.1', PORT), make_handler(windows, TWEETS_PER_PLACE, LATENCY))
+    server.daemon_threads = True
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server, f'http://127.0.0.1:{server.server_address[1]}/1.1'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake Twitter v1.1 API for local testing')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--limit', type=int, default=180)
+    parser.add_argument('--geo-limit', type=int, default=75)
+    parser.add_argument('--window', type=float, default=15.0)
+    parser.add_argument('--tweets-per-place', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.05)
+    args = parser.parse_args()
+
+    server, base_url = serve(args.port, args.limit, args.window, args.geo_limit,
+                             args.tweets_per_place, args.latency)
+
+    print(f'\nFake Twitter API listening on {base_url} (Ctrl+C to stop)')
+
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
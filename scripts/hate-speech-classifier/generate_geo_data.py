@@ -10,7 +10,11 @@ Ian Richard Ferguson | Stanford University
 
 # ---- Imports
 import pandas as pd
-import json
+import json, os, sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from storage import write_table
+from reference import load_reference
 
 
 # ---- Run script
@@ -19,47 +23,28 @@ with open('../../data/tweet-data/fips-codes-to-scrape.json') as incoming:
     # Read in FIPS codes as a dictionary object
     data = json.load(incoming)
     
-# Read in County Centers CSV (with long/lat coordinates)
-county_centers = pd.read_csv('https://raw.githubusercontent.com/btskinner/spatial/master/data/county_centers.csv')
-
-
-def valid_FIPS(x):
-    """
-    Some of our FIPS values don't have a leading 0
-    This function fixes that issue
-    """
+# County Centers (long/lat coordinates) from the local reference store, keyed by padded FIPS
+# Downloaded once - refresh with python3 ../reference.py refresh county-centers
+county_centers = load_reference('county-centers', COLUMNS=['clon10', 'clat10'])
 
-    temp = str(x)
-    
-    # E.g., 12345
-    if len(temp) == 5:
-        return temp
-    
-    # 1234 => 01234
-    else:
-        return f"0{temp}"
-
-# Pad incomplete FIPS values
-county_centers['fips'] = county_centers['fips'].apply(lambda x: valid_FIPS(x))
-
-# Isolate longitude and latitude coordinates
-county_centers = county_centers.loc[:, ['fips', 'clon10', 'clat10']]
-
-# Instantiate new DataFrame to store our geodata
-output = pd.DataFrame(columns=['fips', 'hispanic-pop-change'])
+# Container for each high/mid/low demographic change frame
+frames = []
 
 # Loop through high/mid/low demographic change values
 for key in list(data.keys()):
     temp = pd.DataFrame(data[key], columns=['fips'])
     temp['hispanic-pop-change'] = [key.split('-')[0]] * len(temp)
     
-    # Append new data to aggregate DataFrame
-    output = output.append(temp, ignore_index=True)
+    # Add new data to container
+    frames.append(temp)
+
+# Stack into aggregate DataFrame
+output = pd.concat(frames, ignore_index=True)
 
 
 # Merge with geo coordinates per FIPS code
-output = output.merge(county_centers, on='fips')
+output = output.join(county_centers, on='fips', how='inner')
 
-# Save to local CSV
-output.to_csv('../../data/tweet-data/geodata.csv')
+# Save to local Parquet + CSV
+write_table(output, '../../data/tweet-data/geodata')
 print('\nGeodata saved in tweet-data subfolder')
\ No newline at end of file
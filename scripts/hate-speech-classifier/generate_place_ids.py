@@ -8,15 +8,28 @@ Since we have the long-lat coordinates for our high/mid/low dem change
 areas we can plug these into the api.reverse_geocde function to get a
 list of place IDs for each long/lat area
 
+Lookups run concurrently through collector.py by default (--serial
+for the legacy tweepy loop, --base-url to target fake_twitter.py)
+
+Every lookup goes through a persistent cache (geocode_cache.py) keyed by
+FIPS and rounded coordinates - only distinct, never-seen keys hit the API,
+so reruns and resamples are nearly free (--refresh-cache to re-query)
+
 Ian Richard Ferguson | Stanford University
 """
 
 
 # ---- Imports
-import os, random, json, tweepy
+import os, random, json, sys, argparse, asyncio, tweepy
 from tqdm import tqdm
 import pandas as pd
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from storage import read_table, write_table
+
+from collector import BASE_URL, HTTPClient, geocode_all
+from geocode_cache import GeocodeCache, CACHE_PATH, place_record
+
 
 # ---- Helpers
 def connect_to_API():
@@ -48,55 +61,124 @@ def connect_to_API():
       return api
 
 
-def get_place_ids(DF, API):
+def get_place_ids(DF, API, CACHE=None, REFRESH=False):
       """
       DF => DataFrame object
-      API =>
+      API => Validated tweepy.API object
+      CACHE => Optional GeocodeCache
+      REFRESH => Re-query every key, overwriting the cache
 
       This function runs through DataFrame and generates
       a maximum five (5) place IDs that we'll use to scrape
       geo-specific tweets
       """
 
-      # Assign empty values to new column
-      DF['places'] = [None] * len(DF)
+      def lookup(coords, on_result):
+            for index, (lat, long) in enumerate(tqdm(coords)):
+
+                  # Generate list of places associated with our long/lat coordinates
+                  on_result(index, [place_record(p) for p in API.reverse_geocode(lat, long)])
+
+      resolve_places(DF, lookup, CACHE, REFRESH)
+
+
+def keep_places(PLACES):
+      """
+      PLACES => Place JSON dictionaries from reverse_geocode
+
+      Returns up to six Place IDs, skipping the (too coarse) United States
+      """
+
+      return [place['id'] for place in PLACES[:6] if place['name'] != 'United States']
+
+
+def resolve_places(DF, LOOKUP, CACHE=None, REFRESH=False):
+      """
+      DF => DataFrame with fips, clat10 and clon10
+      LOOKUP => Callable(coords, on_result) - looks up each (lat, long) and calls
+                on_result(index, places) as soon as that lookup succeeds
+      CACHE => Optional GeocodeCache
+      REFRESH => Ignore cached lookups (results are still written back)
+
+      Geocodes each distinct (fips, rounded lat, rounded long) once, only when
+      it isn't cached, and fans the places back out to every row. Every lookup
+      is cached the moment it lands, so a run that dies partway still warms the cache
+      """
+
+      rows = [(fips, lat, long) for fips, lat, long in zip(DF['fips'], DF['clat10'], DF['clon10'])]
+
+      if CACHE is None:
+            keys = list(dict.fromkeys(rows))
+            known = {}
+      else:
+            keys = list(dict.fromkeys(CACHE.key(*row) for row in rows))
+            known = {} if REFRESH else CACHE.get_many(keys)
+
+      missing = [key for key in keys if key not in known]
+      print(f'{len(rows)} rows => {len(keys)} distinct lookups, {len(keys) - len(missing)} cached, {len(missing)} to fetch')
+
+      def store(index, places):
+            known[missing[index]] = places
+
+            if CACHE is not None:
+                  CACHE.put(*missing[index], places)
 
-      for index, val in tqdm(enumerate(DF['fips'])):
+      if missing:
+            LOOKUP([(lat, long) for _, lat, long in missing], store)
 
-            # This list will hold our accumulated Place IDs per FIPS code
-            container = []
+      key = (lambda row: row) if CACHE is None else (lambda row: CACHE.key(*row))
+      DF['places'] = [keep_places(known[key(row)]) for row in rows]
 
-            # Isolate longitude and latitude values
-            long, lat = DF['clon10'][index], DF['clat10'][index]
 
-            # Generate list of places associated with our long/lat coordinates
-            places = API.reverse_geocode(lat, long)
+def get_place_ids_async(DF, CLIENT, CONCURRENCY=16, CACHE=None, REFRESH=False):
+      """
+      DF => DataFrame object
+      CLIENT => collector client with an async reverse_geocode() method
+      CONCURRENCY => Max lookups in flight
+      CACHE, REFRESH => See resolve_places
 
-            for place in places[:6]:
+      Same output as get_place_ids, with every uncached lookup scheduled concurrently
+      """
 
-                  # US is too coarse
-                  if place.name != 'United States':
-                        container.append(place.id)
-                  else:
-                        continue
+      def lookup(coords, on_result):
+            asyncio.run(geocode_all(CLIENT, coords, CONCURRENCY=CONCURRENCY, ON_RESULT=on_result))
 
-            # Assign list of Place IDs to DataFrame
-            DF['places'][index] = container
+      resolve_places(DF, lookup, CACHE, REFRESH)
 
 
 # ---- Run script
 def main():
-      # Connect to Twitter API + instantiate connection object
-      api = connect_to_API()
+      parser = argparse.ArgumentParser(description='Find Twitter Place IDs for every sampled county')
+      parser.add_argument('--concurrency', type=int, default=16)
+      parser.add_argument('--base-url', default=None, help='API root, e.g. a local fake_twitter.py server')
+      parser.add_argument('--serial', action='store_true', help='Legacy one-county-at-a-time tweepy loop')
+      parser.add_argument('--cache', default=CACHE_PATH, help='Reverse geocode cache (SQLite)')
+      parser.add_argument('--refresh-cache', action='store_true', help='Re-query every county, overwriting cached places')
+      args = parser.parse_args()
+
+      # Read in local geodata
+      target_data = read_table('../../data/tweet-data/geodata')
+      cache = GeocodeCache(args.cache)
+
+      if args.serial:
+            # Connect to Twitter API + instantiate connection object
+            api = connect_to_API()
+
+            # Apply helper function to isolate Place IDs
+            get_place_ids(target_data, api, CACHE=cache, REFRESH=args.refresh_cache)
+
+      else:
+            # Local fake servers don't need credentials
+            auth = None if args.base_url else connect_to_API().auth.apply_auth()
+            client = HTTPClient(BASE_URL=args.base_url or BASE_URL, AUTH=auth)
 
-      # Read in local geodata CSV
-      target_data = pd.read_csv('../../data/tweet-data/geodata.csv')
+            get_place_ids_async(target_data, client, CONCURRENCY=args.concurrency,
+                                CACHE=cache, REFRESH=args.refresh_cache)
 
-      # Apply helper function to isolate Place IDs
-      get_place_ids(target_data, api)
+      cache.close()
 
-      # Write DataFrame to local CSV
-      target_data.to_csv('../../data/tweet-data/geodata.csv')
+      # Write DataFrame to local Parquet + CSV
+      write_table(target_data, '../../data/tweet-data/geodata')
       print('\n ** Place IDs Saved **\n')
 
 
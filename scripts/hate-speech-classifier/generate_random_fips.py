@@ -7,81 +7,112 @@ This is a simple, non-modular script to randomly pick
 FIPS codes out of each racial change bin. We'll use these
 later to generate Place IDs from Twitter's API
 
+Counties are drawn without replacement from a seeded generator
+(see sampling.py), so rerunning with the same seed gives the same codes
+
+      python3 generate_random_fips.py                         # 100 per Hispanic change bin
+      python3 generate_random_fips.py --allocation neyman --total 300
+      python3 generate_random_fips.py --strata hispanic_change_bin nhw_change_bin
+
 Ian Richard Ferguson | Stanford University
 """
 
 
 # ---- Imports
-import random, json
+import json, os, sys, argparse, itertools
 import pandas as pd
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from storage import read_table
+from sampling import stratified_sample, allocation_table, METHODS
 
-# ---- Run script
-data = pd.read_csv('../../data/demographic-data/tidy-population-changes.csv').iloc[:, 1:]
+
+# ---- Globals
+LEVELS = {1: 'low', 2: 'mid', 3: 'high'}
+
+# Bin column => suffix used in the output keys (high-hispanic-change, ...)
+KEY_NAMES = {'hispanic_change_bin': 'hispanic-change', 'nhw_change_bin': 'nhw-change'}
 
 
+# ---- Helpers
 def factor_levels(x):
     """
     Reformats group levels into menaingful factors
+
+    x => Column of bin numbers [1,2,3] (R output) or labels (bin_by_demo_change.py);
+         anything else becomes MISSING
     """
-    
-    # If factor level isn't [1,2,3] return a missing value
-    try:
-        int(x)
-    except:
-        return 'MISSING'
-    
-    if int(x) == 1:
-        return 'low'
-    elif int(x) == 2:
-        return 'mid'
-    elif int(x) == 3:
-        return 'high'
-    else:
-        return 'MISSING'
-    
-    
-def valid_FIPS(x):
-    """
-    Pads FIPS level with a leading 0 if it's missing
 
-    E.g., 1234 => 01234
+    x = pd.Series(x, dtype=object)
+    labels = x.where(x.isin(LEVELS.values()))
+
+    return pd.to_numeric(x, errors='coerce').map(LEVELS).fillna(labels).fillna('MISSING')
+
+
+def sample_key(levels, strata):
+    """
+    E.g., ('high',) => high-hispanic-change
     """
-    
-    if len(str(x)) == 5:
-        return str(x)
-    else:
-        return f"0{x}"
-    
-
-for var in ['hispanic_change_bin', 'nhw_change_bin']:
-   
-    # Convert [1,2,3] to ['low','mid','high']
-    data[var] = data[var].apply(lambda x: factor_levels(x))
-
-# Pad FIPS codes with leading 0    
-data['fips'] = data['fips'].apply(lambda x: valid_FIPS(x))
-
-# Container for each factor level    
-fips_codes_to_scrape = {'high-hispanic-change': [],
-                       'mid-hispanic-change': [],
-                       'low-hispanic-change':[]}
-
-for rank in ['high','mid','low']:
-
-    # Isolate rows for each change bin   
-    temp = data[data['hispanic_change_bin'] == rank].reset_index(drop=True)
-    
-    # Randomly select 100 FIPS codes
-    fips_codes = random.choices(temp['fips'], k=300)
-    
-    # Add list to container
-    fips_codes_to_scrape[f'{rank}-hispanic-change'].extend(fips_codes)
-    
-
-# Push container to local JSON file    
-with open('../../data/tweet-data/fips-codes-to-scrape.json', 'w') as outgoing:
-    json.dump(fips_codes_to_scrape, outgoing, indent=4)
-
-# Notify end user
-print('\nJSON file saved - happy scraping!')
\ No newline at end of file
+
+    return '-'.join(f'{level}-{KEY_NAMES.get(var, var)}' for level, var in zip(levels, strata))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Stratified random sample of FIPS codes')
+    parser.add_argument('--strata', nargs='+', default=['hispanic_change_bin'], help='Bin columns to stratify on')
+    parser.add_argument('--per-bin', type=int, default=100, help='Counties per stratum (equal allocation)')
+    parser.add_argument('--total', type=int, default=None, help='Total counties (defaults to per-bin x strata)')
+    parser.add_argument('--allocation', choices=METHODS, default='equal')
+    parser.add_argument('--neyman-var', default='hispanic_population_change')
+    parser.add_argument('--seed', type=int, default=101)
+
+    return parser.parse_args()
+
+
+# ---- Run script
+def main():
+    args = parse_args()
+
+    data = read_table('../../data/demographic-data/tidy-population-changes')
+
+    for var in set(args.strata) | {'hispanic_change_bin', 'nhw_change_bin'}:
+
+        # Convert [1,2,3] to ['low','mid','high'] (labels pass through)
+        if var in data.columns:
+            data[var] = factor_levels(data[var])
+
+    # Only counties with a real bin on every stratifying variable
+    data = data[data[args.strata].isin(LEVELS.values()).all(axis=1)]
+
+    # Stable input order => the seed alone decides the draw
+    data = data.sort_values('fips', kind='stable').reset_index(drop=True)
+
+    n_strata = data.groupby(args.strata).ngroups
+    total = args.total or args.per_bin * n_strata
+
+    print(allocation_table(data, args.strata, total, args.allocation, args.neyman_var))
+
+    sample = stratified_sample(data, args.strata, total, METHOD=args.allocation,
+                               SEED=args.seed, VARIABLE=args.neyman_var)
+
+    # Container for each factor level (high => low, like the original)
+    fips_codes_to_scrape = {}
+
+    for levels in itertools.product(['high', 'mid', 'low'], repeat=len(args.strata)):
+        rows = (sample[args.strata] == list(levels)).all(axis=1)
+
+        if rows.any():
+            fips_codes_to_scrape[sample_key(levels, args.strata)] = sample.loc[rows, 'fips'].tolist()
+
+    # Push container to local JSON file
+    os.makedirs('../../data/tweet-data', exist_ok=True)
+
+    with open('../../data/tweet-data/fips-codes-to-scrape.json', 'w') as outgoing:
+        json.dump(fips_codes_to_scrape, outgoing, indent=4)
+
+    # Notify end user
+    print('\nJSON file saved - happy scraping!')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Persistent reverse-geocode cache for generate_place_ids.py
+
+Lookups are keyed by FIPS and coordinates rounded to PRECISION decimal
+places (~110 m at 3), stored in one SQLite file under data/tweet-data/.
+A county that was resolved on any earlier run - or appears twice in the
+same plan - costs no API call
+
+      cache = GeocodeCache()
+      places = cache.get('51003', 38.02, -78.55)      # None on a miss
+      cache.put('51003', 38.02, -78.55, places)
+
+Ian Richard Ferguson | Stanford University
+"""
+
+
+# ---- Imports
+import os, json, sqlite3
+from datetime import datetime, timezone
+
+
+# ---- Globals
+CACHE_PATH = '../../data/tweet-data/place-cache.sqlite'
+PRECISION = 3
+
+
+# ---- Helpers
+def cache_key(FIPS, LAT, LONG, PRECISION=PRECISION):
+    """
+    Returns (fips, rounded lat, rounded long)
+    """
+
+    return str(FIPS), round(float(LAT), PRECISION), round(float(LONG), PRECISION)
+
+
+def place_record(PLACE):
+    """
+    PLACE => Place JSON dictionary, or a tweepy Place object
+
+    Returns the fields worth keeping ({id, name, place_type})
+    """
+
+    if not isinstance(PLACE, dict):
+        PLACE = {'id': PLACE.id, 'name': PLACE.name, 'place_type': getattr(PLACE, 'place_type', None)}
+
+    return {'id': PLACE['id'], 'name': PLACE['name'], 'place_type': PLACE.get('place_type')}
+
+
+# ---- Cache
+class GeocodeCache:
+    """
+    PATH => SQLite file (created on first use)
+    PRECISION => Decimal places coordinates are rounded to
+    """
+
+    def __init__(self, PATH=CACHE_PATH, PRECISION=PRECISION):
+        os.makedirs(os.path.dirname(PATH) or '.', exist_ok=True)
+
+        self.precision = PRECISION
+        self.db = sqlite3.connect(PATH)
+
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('''CREATE TABLE IF NOT EXISTS geocode (
+                               fips TEXT, lat REAL, long REAL, places TEXT, fetched TEXT,
+                               PRIMARY KEY (fips, lat, long))''')
+        self.db.commit()
+
+
+    def key(self, FIPS, LAT, LONG):
+        return cache_key(FIPS, LAT, LONG, self.precision)
+
+
+    def get(self, FIPS, LAT, LONG):
+        """
+        Returns the cached place list, or None on a miss
+        """
+
+        row = self.db.execute('SELECT places FROM geocode WHERE fips = ? AND lat = ? AND long = ?',
+                              self.key(FIPS, LAT, LONG)).fetchone()
+
+        return None if row is None else json.loads(row[0])
+
+
+    def get_many(self, KEYS):
+        """
+        KEYS => Iterable of (fips, lat, long)
+
+        Returns {rounded key: place list} for every key already cached
+        """
+
+        found = {}
+
+        for key in {self.key(*k) for k in KEYS}:
+            row = self.db.execute('SELECT places FROM geocode WHERE fips = ? AND lat = ? AND long = ?', key).fetchone()
+
+            if row is not None:
+                found[key] = json.loads(row[0])
+
+        return found
+
+
+    def put_many(self, ITEMS):
+        """
+        ITEMS => Iterable of ((fips, lat, long), place list)
+
+        Stores every lookup in one transaction
+        """
+
+        fetched = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        rows = [(*self.key(*k), json.dumps([place_record(p) for p in places]), fetched) for k, places in ITEMS]
+
+        with self.db:
+            self.db.executemany('INSERT OR REPLACE INTO geocode VALUES (?, ?, ?, ?, ?)', rows)
+
+
+    def put(self, FIPS, LAT, LONG, PLACES):
+        self.put_many([((FIPS, LAT, LONG), PLACES)])
+
+
+    def __len__(self):
+        return self.db.execute('SELECT COUNT(*) FROM geocode').fetchone()[0]
+
+
+    def close(self):
+        self.db.close()
@@ -6,16 +6,52 @@ About this Script
 Using our geodata.csv file, we'll loop through each
 identified Place ID and scrape n tweets from it
 
+Each (fips, place_id) batch is written to its own part under
+data/tweet-data/all-tweets-scraped/ as soon as it arrives. Rerunning
+after a crash skips every place listed in the part manifest
+
+Neighbouring counties often resolve to the same places (a shared city
+or state), so the plan is deduplicated by Place ID: each place is
+scraped once and its Tweets are written out for every (fips, bin) that
+listed it
+
+Every Tweet keeps its coordinates (exact when geotagged, else the centre
+of its place bounding box) and gets the county that contains them in
+county_fips - see county_index.py
+
+By default places are scraped concurrently by the asyncio engine in
+collector.py (per-endpoint token buckets instead of wait_on_rate_limit)
+
+      python3 scrape_twitter.py                                   # async engine
+      python3 scrape_twitter.py --base-url http://127.0.0.1:8900/1.1   # against fake_twitter.py
+      python3 scrape_twitter.py --serial                          # legacy tweepy loop
+
 Ian Richard Ferguson | Stanford University
 """
 
 
 # ---- Imports
-import tweepy, json, os
+import tweepy, json, os, sys, argparse, asyncio
 import pandas as pd
 from tqdm import tqdm
 from sklearn.utils import shuffle
 
+from collector import BASE_URL, HTTPClient, collect_places, statuses_to_frame, status_point
+from county_index import load_counties
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from storage import read_table, PartitionedSink
+from instrument import span, table_bytes
+
+
+# ---- Globals
+OUTPUT = '../../data/tweet-data/all-tweets-scraped'
+
+TWEET_DTYPES = {'UserName': 'string', 'ScreenName': 'string', 'Location': 'string',
+                'Tweet': 'string', 'Likes': 'int64', 'Retweets': 'int64', 'fips': 'string',
+                'hispanic-pop-change': 'string', 'place_id': 'string',
+                'lon': 'float64', 'lat': 'float64', 'geo_source': 'string', 'county_fips': 'string'}
+
 
 # ---- Helpers
 def connect_to_API():
@@ -61,7 +97,7 @@ def scraper(api, count, fips, place_id, demographic_status):
     place = f"place:{place_id}"
 
     # Empty lists to push scraped Twitter data into
-    created, name, screen_name, location, text, likes, rts = [], [], [], [], [], [], []
+    created, name, screen_name, location, text, likes, rts, points = [], [], [], [], [], [], [], []
 
     # Original context is best for our purposes
     query_target = place + " -filter:retweets -filter:links"
@@ -80,6 +116,7 @@ def scraper(api, count, fips, place_id, demographic_status):
         text.append(tweet.full_text)
         likes.append(tweet.favorite_count)
         rts.append(tweet.retweet_count)
+        points.append(status_point(tweet._json))
 
     # Organize tweet data into a Pandas DataFrame
     tweet_data = pd.DataFrame({'DateTime': created,
@@ -94,41 +131,154 @@ def scraper(api, count, fips, place_id, demographic_status):
     tweet_data['hispanic-pop-change'] = [demographic_status] * len(tweet_data)
     tweet_data['place_id'] = [place_id] * len(tweet_data)
 
+    tweet_data['lon'] = [p[0] for p in points]
+    tweet_data['lat'] = [p[1] for p in points]
+    tweet_data['geo_source'] = [p[2] for p in points]
+
     return tweet_data
 
 
-def main():
+def locate(tweet_data, counties):
+    """
+    tweet_data => Scraped frame with lon / lat columns
+    counties => CountyIndex, or None to skip
+
+    Adds the county that actually contains each Tweet (county_fips)
+    """
+
+    if counties is None:
+        tweet_data['county_fips'] = pd.Series([None] * len(tweet_data), dtype='string')
+    else:
+        tweet_data['county_fips'] = counties.assign_fips(tweet_data['lon'], tweet_data['lat'])
+
+    return tweet_data
+
+
+def parse_places(x):
+    """
+    x => Place IDs from geodata (list from Parquet, or "['a', 'b']" from a legacy CSV)
+
+    Returns a clean list of Place ID strings
+    """
+
+    if isinstance(x, str):
+        x = x.split(',')
+
+    places = [str(p).replace('[', '').replace(']', '').replace('\'', '').strip() for p in x]
+
+    return [p for p in places if p]
 
-    # Validate credentials and instantiate API object
-    api = connect_to_API()
 
-    # Read in CSV with identified place IDs
-    geo_data = pd.read_csv('../../data/tweet-data/geodata.csv').iloc[:, 2:]
+def plan_jobs(geo_data, sink):
+    """
+    geo_data => Geodata frame with fips, hispanic-pop-change and places
+    sink => PartitionedSink with completed partitions
 
-    geo_data = shuffle(geo_data).reset_index()
+    Returns (targets, place_id) jobs not yet checkpointed - one per distinct
+    place, where targets lists every (fips, demographic_status) that wants it
+    """
 
-    # Parent DataFrame to append into
-    output = pd.DataFrame()
-    print('Tweets scraping...')
+    targets = {}
 
-    for index, places in tqdm(enumerate(geo_data['places'])):
+    for fips, dem_status, places in zip(geo_data['fips'], geo_data['hispanic-pop-change'], geo_data['places']):
 
         # Clean up individual place value, cast to list
-        places = [x.replace('[', '').replace(']', '').replace('\'', '').strip() for x in places.split(',')]
+        for place in parse_places(places):
+
+            # Completed on a previous run
+            if sink.done((fips, place)):
+                continue
+
+            wanted = targets.setdefault(place, {})
+            wanted.setdefault(fips, dem_status)
+
+    return [(list(wanted.items()), place) for place, wanted in targets.items()]
+
+
+def fan_out(tweet_data, targets, place, sink):
+    """
+    tweet_data => One place's located Tweets
+    targets => [(fips, demographic_status), ...] that listed the place
+    place => Twitter Place ID
+    sink => PartitionedSink
+
+    Writes the batch once per (fips, place_id) key, relabeled for that county
+    """
+
+    for fips, dem_status in targets:
+        sink.write(tweet_data.assign(**{'fips': fips, 'hispanic-pop-change': dem_status}), (fips, place))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Scrape tweets for every identified Place ID')
+    parser.add_argument('--count', type=int, default=500, help='Tweets per place')
+    parser.add_argument('--concurrency', type=int, default=16, help='Places in flight (async engine)')
+    parser.add_argument('--base-url', default=None, help='API root, e.g. a local fake_twitter.py server')
+    parser.add_argument('--serial', action='store_true', help='Legacy one-place-at-a-time tweepy scraper')
+    parser.add_argument('--no-counties', action='store_true', help='Skip point-in-county resolution')
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    with span('plan') as s:
+        # Read in identified place IDs
+        geo_data = read_table('../../data/tweet-data/geodata')
+
+        geo_data = shuffle(geo_data).reset_index()
+
+        # Append-only store - every (fips, place) batch is flushed as it arrives
+        sink = PartitionedSink(OUTPUT, DTYPES=TWEET_DTYPES)
+        jobs = plan_jobs(geo_data, sink)
+        pairs = sum(len(targets) for targets, _ in jobs)
+        s.add(rows_in=len(geo_data), rows_out=len(jobs), pairs=pairs)
+
+    print(f'Tweets scraping... ({len(sink.completed)} places checkpointed, '
+          f'{pairs} to go => {len(jobs)} unique places)')
+
+    # County polygons, loaded once for the whole run
+    with span('load_counties', skipped=args.no_counties):
+        counties = None if args.no_counties else load_counties()
+
+    with span('scrape', places=len(jobs), engine='serial' if args.serial else 'async') as s:
+        if args.serial:
+            # Validate credentials and instantiate API object
+            api = connect_to_API()
+
+            for targets, place in tqdm(jobs):
+                fips, dem_status = targets[0]
+
+                # Scrape each place once, then flush a copy per county that listed it
+                temp = scraper(api=api, count=args.count, fips=fips, place_id=place, demographic_status=dem_status)
+                fan_out(locate(temp, counties), targets, place, sink)
+                s.add(rows_out=len(temp) * len(targets))
+
+        else:
+            # Local fake servers don't need credentials
+            auth = None if args.base_url else connect_to_API().auth.apply_auth()
+            client = HTTPClient(BASE_URL=args.base_url or BASE_URL, AUTH=auth)
+            progress = tqdm(total=len(jobs))
 
-        # Isolate FIPS code and dem status for each row in CSV
-        fips, dem_status = geo_data['fips'][index], geo_data['hispanic-pop-change'][index]
+            def flush(job, statuses):
+                targets, place = job
+                fips, dem_status = targets[0]
 
-        for place in places:
+                # Counties are resolved once per place, not once per copy
+                temp = locate(statuses_to_frame(statuses, fips, place, dem_status), counties)
+                fan_out(temp, targets, place, sink)
+                s.add(rows_out=len(statuses) * len(targets))
+                progress.update()
 
-            # Scrape tweets and store as temporary DataFrame
-            temp = scraper(api=api, count=500, fips=fips, place_id=place, demographic_status=dem_status)
+            asyncio.run(collect_places(client, jobs, args.count, flush, CONCURRENCY=args.concurrency))
+            progress.close()
 
-            # Append to parent DataFrame
-            output = output.append(temp, ignore_index=True)
+    # CSV copy for the R scripts, streamed one partition at a time
+    with span('export_csv') as s:
+        sink.export_csv(f'{OUTPUT}.csv')
+        s.add(bytes_written=table_bytes(f'{OUTPUT}.csv'))
 
-    # Push to local CSV
-    output.to_csv('../../data/tweet-data/all-tweets-scraped.csv')
     print('\nTweets have been scraped and saved locally')
 
 
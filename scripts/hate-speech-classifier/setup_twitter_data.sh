@@ -4,18 +4,13 @@
 # This shell script wraps various R and Python
 # scripts developed to support this research program
 #
+# Stages, their inputs / outputs and skip logic live in ../run_pipeline.py;
+# anything already up to date is skipped. Extra arguments are passed through
+# (e.g., --force random-fips, --dry-run)
+#
 # Ian Richard Ferguson | Stanford University
 
-base_dir="../.."
-data_output="${base_dir}/data/tweet-data"
-working_directory="${base_dir}/scripts/hate-speech-classifier"
-
-mkdir -p $data_output
-cd $working_directory
-
-pwd
+cd "$(dirname "$0")/.."
 
-Rscript bin_by_demo_change.R                                # Creates aggregate demographic change CSV
-python3 generate_random_fips.py                             # Isolate random FIPS codes / bin
-python3 generate_geo_data.py                                # Combine FIPS, dem status, longitude and latitude
-python3 generate_place_ids.py                               # Find Twitter place IDs to scrape at geo level
\ No newline at end of file
+# Binned demographic change => random FIPS / bin => long/lat => Twitter place IDs
+python3 run_pipeline.py place-ids "$@"
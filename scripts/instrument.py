@@ -0,0 +1,290 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Lightweight instrumentation shared by the pipeline scripts
+
+Wrap a stage in a span and it is appended to a JSON-lines trace when it
+finishes - duration, rows in / out, bytes read / written, peak RSS and
+whether it raised
+
+      from instrument import span, table_bytes
+
+      with span('clean', rows_in=len(df)) as s:
+            df = clean_text_data(df, 'Tweet')
+            s.add(rows_out=len(df))
+
+Spans nest; each line carries its parent so a run can be rebuilt as a tree
+
+Environment
+
+      PIPELINE_TRACE    => Trace file (default data/logs/pipeline-trace.jsonl), or off
+      PIPELINE_PROFILE  => cprofile (one .prof per top-level span) or py-spy
+                           (sampling flamegraph, if py-spy is installed)
+      PIPELINE_RUN_ID   => Groups spans from several processes (set by run_pipeline.py)
+
+Summarize a trace with
+
+      python3 instrument.py                        # latest run
+      python3 instrument.py --all
+
+Ian Richard Ferguson | Stanford University
+"""
+
+# ---- Imports
+import os, sys, json, time, uuid, shutil, signal, argparse, subprocess, contextvars, resource
+from contextlib import contextmanager
+
+
+# ---- Globals
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+TRACE = os.environ.get('PIPELINE_TRACE', os.path.join(ROOT, 'data', 'logs', 'pipeline-trace.jsonl'))
+PROFILE = os.environ.get('PIPELINE_PROFILE', '').lower()
+PROFILES = os.path.join(ROOT, 'data', 'logs', 'profiles')
+
+RUN_ID = os.environ.get('PIPELINE_RUN_ID') or uuid.uuid4().hex[:12]
+SCRIPT = os.path.basename(sys.argv[0]) or 'python'
+
+CURRENT = contextvars.ContextVar('span', default=None)
+
+
+# ---- Memory
+def read_status(FIELD):
+      """
+      Returns a /proc/self/status value in MB (None off Linux)
+      """
+
+      try:
+            with open('/proc/self/status') as incoming:
+                  for line in incoming:
+                        if line.startswith(f'{FIELD}:'):
+                              return int(line.split()[1]) / 1024
+      except OSError:
+            return None
+
+
+def reset_peak():
+      """
+      Resets the kernel's peak RSS counter (Linux 4.0+) so the next reading
+      covers only what follows. Returns False where that isn't possible
+      """
+
+      try:
+            with open('/proc/self/clear_refs', 'w') as outgoing:
+                  outgoing.write('5')
+            return True
+      except OSError:
+            return False
+
+
+def maxrss_mb(USAGE):
+      """
+      USAGE => resource.struct_rusage (getrusage / wait4)
+
+      ru_maxrss is KB on Linux but bytes on macOS
+      """
+
+      return USAGE.ru_maxrss / (1024 ** 2 if sys.platform == 'darwin' else 1024)
+
+
+def peak_rss_mb():
+      peak = read_status('VmHWM')
+      return peak if peak is not None else maxrss_mb(resource.getrusage(resource.RUSAGE_SELF))
+
+
+def table_bytes(PATH):
+      """
+      PATH => File, directory, or table path without extension (storage.py layout)
+
+      Returns bytes on disk (0 if nothing exists)
+      """
+
+      total = 0
+
+      for candidate in {PATH, f'{PATH}.parquet', f'{PATH}.csv'}:
+            if os.path.isfile(candidate):
+                  total += os.path.getsize(candidate)
+
+            elif os.path.isdir(candidate):
+                  total += sum(os.path.getsize(os.path.join(base, f))
+                               for base, _, files in os.walk(candidate) for f in files)
+
+      return total
+
+
+# ---- Profiling
+class Profiler:
+      """
+      MODE => cprofile or py-spy
+      NAME => Output file stem
+      """
+
+      def __init__(self, MODE, NAME):
+            self.mode = MODE
+            self.path = os.path.join(PROFILES, NAME)
+            self.handle = None
+
+      def start(self):
+            os.makedirs(PROFILES, exist_ok=True)
+
+            if self.mode == 'cprofile':
+                  import cProfile
+                  self.handle = cProfile.Profile()
+                  self.handle.enable()
+
+            elif self.mode == 'py-spy' and shutil.which('py-spy'):
+                  self.path += '.speedscope.json'
+                  self.handle = subprocess.Popen(['py-spy', 'record', '--pid', str(os.getpid()),
+                                                  '--format', 'speedscope', '--output', self.path],
+                                                 stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+      def stop(self):
+            if self.handle is None:
+                  return None
+
+            if self.mode == 'cprofile':
+                  self.handle.disable()
+                  self.path += '.prof'
+                  self.handle.dump_stats(self.path)
+            else:
+                  # py-spy writes its output on SIGINT
+                  self.handle.send_signal(signal.SIGINT)
+                  self.handle.wait()
+
+            return self.path
+
+
+# ---- Spans
+class Span:
+      """
+      One timed stage. Counters are summed with add()
+      """
+
+      def __init__(self, name, parent, fields):
+            self.name = name
+            self.parent = parent
+            self.id = uuid.uuid4().hex[:12]
+            self.fields = dict(fields)
+            self.counts = {'rows_in': 0, 'rows_out': 0, 'bytes_read': 0, 'bytes_written': 0}
+            self.child_peak = 0.0
+
+      def add(self, **COUNTS):
+            """
+            E.g., s.add(rows_out=len(df), bytes_written=table_bytes(path))
+            """
+
+            for key, value in COUNTS.items():
+                  self.counts[key] = self.counts.get(key, 0) + int(value)
+
+      def set(self, **FIELDS):
+            self.fields.update(FIELDS)
+
+
+def write_record(RECORD):
+      if TRACE.lower() in ('off', '0', 'false', ''):
+            return
+
+      os.makedirs(os.path.dirname(TRACE) or '.', exist_ok=True)
+
+      # One short append per span - lines from concurrent processes don't interleave
+      with open(TRACE, 'a') as outgoing:
+            outgoing.write(json.dumps(RECORD, default=str) + '\n')
+
+
+@contextmanager
+def span(NAME, **FIELDS):
+      """
+      NAME => Stage name (e.g., fetch, clean, vectorize, predict, write)
+      FIELDS => Extra fields for the record, plus optional rows_in / rows_out /
+                bytes_read / bytes_written starting counts
+
+      Yields a Span; the record is written when the block exits
+      """
+
+      parent = CURRENT.get()
+      current = Span(NAME, parent, {k: v for k, v in FIELDS.items() if not k.startswith(('rows_', 'bytes_'))})
+      current.add(**{k: v for k, v in FIELDS.items() if k.startswith(('rows_', 'bytes_'))})
+
+      # Fold the parent's peak so far into it before resetting the counter
+      if parent is not None:
+            parent.child_peak = max(parent.child_peak, peak_rss_mb())
+
+      resettable = reset_peak()
+      token = CURRENT.set(current)
+
+      profiler = None
+
+      if PROFILE and parent is None:
+            profiler = Profiler(PROFILE, f'{SCRIPT}.{NAME}.{os.getpid()}')
+            profiler.start()
+
+      status, start, cpu = 'ok', time.perf_counter(), time.process_time()
+
+      try:
+            yield current
+
+      except BaseException as e:
+            status = f'error: {type(e).__name__}'
+            raise
+
+      finally:
+            seconds, cpu_s = time.perf_counter() - start, time.process_time() - cpu
+            profile = profiler.stop() if profiler is not None else None
+
+            CURRENT.reset(token)
+
+            peak = max(current.child_peak, peak_rss_mb())
+
+            if parent is not None:
+                  parent.child_peak = max(parent.child_peak, peak)
+
+            write_record({'run': RUN_ID, 'script': SCRIPT, 'pid': os.getpid(),
+                          'span': NAME, 'id': current.id, 'parent': parent.id if parent else None,
+                          'start': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(time.time() - seconds)),
+                          'seconds': round(seconds, 4), 'cpu_seconds': round(cpu_s, 4),
+                          **current.counts,
+                          'peak_rss_mb': round(peak, 1), 'peak_scope': 'span' if resettable else 'process',
+                          'status': status, 'profile': profile, **current.fields})
+
+
+# ---- Summary
+def summarize(RECORDS):
+      """
+      RECORDS => Trace records
+
+      Returns one row per (script, span) with totals, slowest first
+      """
+
+      import pandas as pd
+
+      frame = pd.DataFrame(RECORDS)
+      table = frame.groupby(['script', 'span'], sort=False).agg(calls=('seconds', 'size'),
+                                                                 seconds=('seconds', 'sum'),
+                                                                 rows_in=('rows_in', 'sum'),
+                                                                 rows_out=('rows_out', 'sum'),
+                                                                 mb_read=('bytes_read', lambda x: x.sum() / 1e6),
+                                                                 mb_written=('bytes_written', lambda x: x.sum() / 1e6),
+                                                                 peak_rss_mb=('peak_rss_mb', 'max'))
+
+      return table.sort_values('seconds', ascending=False)
+
+
+def main():
+      parser = argparse.ArgumentParser(description='Summarize the pipeline trace')
+      parser.add_argument('trace', nargs='?', default=TRACE)
+      parser.add_argument('--all', action='store_true', help='Every run, not just the latest')
+      args = parser.parse_args()
+
+      with open(args.trace) as incoming:
+            records = [json.loads(line) for line in incoming if line.strip()]
+
+      if not args.all:
+            latest = records[-1]['run']
+            records = [r for r in records if r['run'] == latest]
+
+      print(summarize(records).round(2).to_string())
+
+
+if __name__ == "__main__":
+      main()
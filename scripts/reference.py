@@ -0,0 +1,227 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Local reference data for the pipeline (county centroids, county polygons,
+the AFINN sentiment lexicon)
+
+* Each dataset is downloaded once into data/reference/ and every later run
+  works offline
+* Tables are stored as typed Parquet keyed by five-character FIPS, so
+  padding happens once, at refresh time
+* data/reference/manifest.json records source URL, fetch time, row count
+  and a sha256 per file - a file that no longer matches fails loudly
+
+      python3 reference.py list
+      python3 reference.py verify
+      python3 reference.py refresh                  # every dataset
+      python3 reference.py refresh county-centers
+
+Import from any script with
+
+      sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+      from reference import load_reference
+
+Ian Richard Ferguson | Stanford University
+"""
+
+# ---- Imports
+import os, io, sys, json, hashlib
+from datetime import datetime, timezone
+import pandas as pd
+import requests
+
+from storage import normalize_fips, read_table, write_table
+
+
+# ---- Globals
+REFERENCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'reference')
+MANIFEST = 'manifest.json'
+
+# kind => table (typed Parquet indexed by key) or file (stored as downloaded)
+SOURCES = {'county-centers': {'kind': 'table',
+                              'url': 'https://raw.githubusercontent.com/btskinner/spatial/master/data/county_centers.csv',
+                              'key': 'fips'},
+           'county-polygons': {'kind': 'file',
+                               'url': 'https://raw.githubusercontent.com/plotly/datasets/master/geojson-counties-fips.json',
+                               'file': 'geojson-counties-fips.json'},
+           # AFINN-111 is the version tidytext's get_sentiments('afinn') ships
+           'afinn': {'kind': 'file',
+                     'url': 'https://raw.githubusercontent.com/fnielsen/afinn/master/afinn/data/AFINN-111.txt',
+                     'file': 'AFINN-111.txt'}}
+
+
+# ---- Helpers
+def file_digest(PATH):
+      """
+      Returns sha256 of a file, read in 1 MB blocks
+      """
+
+      digest = hashlib.sha256()
+
+      with open(PATH, 'rb') as incoming:
+            for block in iter(lambda: incoming.read(1 << 20), b''):
+                  digest.update(block)
+
+      return digest.hexdigest()
+
+
+def local_path(NAME, ROOT=REFERENCE_DIR):
+      """
+      Returns the on-disk file for a dataset
+      """
+
+      source = SOURCES[NAME]
+
+      if source['kind'] == 'table':
+            return os.path.join(ROOT, f'{NAME}.parquet')
+
+      return os.path.join(ROOT, source['file'])
+
+
+def read_manifest(ROOT=REFERENCE_DIR):
+      path = os.path.join(ROOT, MANIFEST)
+
+      if not os.path.exists(path):
+            return {}
+
+      with open(path) as incoming:
+            return json.load(incoming)
+
+
+def write_manifest(MANIFEST_DATA, ROOT=REFERENCE_DIR):
+      path = os.path.join(ROOT, MANIFEST)
+
+      with open(f'{path}.tmp', 'w') as outgoing:
+            json.dump(MANIFEST_DATA, outgoing, indent=4, sort_keys=True)
+
+      os.replace(f'{path}.tmp', path)
+
+
+def refresh(NAME, ROOT=REFERENCE_DIR, SESSION=None):
+      """
+      NAME => Key into SOURCES
+      ROOT => Reference directory
+
+      Downloads a dataset, stores it in its local form and records its checksum
+      """
+
+      source = SOURCES[NAME]
+      os.makedirs(ROOT, exist_ok=True)
+
+      r = (SESSION or requests).get(source['url'], timeout=120)
+      r.raise_for_status()
+
+      if source['kind'] == 'table':
+            table = pd.read_csv(io.BytesIO(r.content))
+            key = source['key']
+
+            # Pad once here (1234 => 01234), never again downstream
+            table[key] = normalize_fips(table[key])
+            table = table.sort_values(key).reset_index(drop=True)
+
+            write_table(table, os.path.join(ROOT, NAME), CSV_EXPORT=False)
+            rows = len(table)
+
+      else:
+            path = local_path(NAME, ROOT)
+
+            with open(f'{path}.tmp', 'wb') as outgoing:
+                  outgoing.write(r.content)
+
+            os.replace(f'{path}.tmp', path)
+            rows = None
+
+      manifest = read_manifest(ROOT)
+      manifest[NAME] = {'url': source['url'], 'sha256': file_digest(local_path(NAME, ROOT)), 'rows': rows,
+                        'fetched': datetime.now(timezone.utc).isoformat(timespec='seconds')}
+      write_manifest(manifest, ROOT)
+
+      return manifest[NAME]
+
+
+def verify(NAME, ROOT=REFERENCE_DIR):
+      """
+      NAME => Key into SOURCES
+
+      Raises OSError when a dataset is missing or its checksum doesn't match
+      """
+
+      entry = read_manifest(ROOT).get(NAME)
+      path = local_path(NAME, ROOT)
+
+      if entry is None or not os.path.exists(path):
+            raise OSError(f'\nack! {NAME} is not cached - run python3 reference.py refresh {NAME}')
+
+      if file_digest(path) != entry['sha256']:
+            raise OSError(f'\nack! {path} does not match its checksum - run python3 reference.py refresh {NAME}')
+
+
+def ensure(NAME, ROOT=REFERENCE_DIR):
+      """
+      NAME => Key into SOURCES
+
+      Fetches a dataset the first time it's needed, then only verifies it
+
+      Returns the local file path
+      """
+
+      if NAME not in read_manifest(ROOT) or not os.path.exists(local_path(NAME, ROOT)):
+            refresh(NAME, ROOT)
+
+      verify(NAME, ROOT)
+
+      return local_path(NAME, ROOT)
+
+
+def load_reference(NAME, COLUMNS=None, ROOT=REFERENCE_DIR):
+      """
+      NAME => Table dataset key into SOURCES
+      COLUMNS => Optional column projection
+
+      Returns DataFrame indexed by its key (hash index => O(1) .loc lookups)
+      """
+
+      source = SOURCES[NAME]
+
+      if source['kind'] != 'table':
+            raise ValueError(f'{NAME} is a file - use ensure() for its path')
+
+      ensure(NAME, ROOT)
+
+      columns = None if COLUMNS is None else [source['key']] + [c for c in COLUMNS if c != source['key']]
+      table = read_table(os.path.join(ROOT, NAME), COLUMNS=columns)
+
+      return table.set_index(source['key'], verify_integrity=True)
+
+
+# ---- Run script
+def main():
+      command = sys.argv[1] if len(sys.argv) > 1 else 'list'
+      names = sys.argv[2:] or list(SOURCES)
+
+      if command == 'refresh':
+            for name in names:
+                  entry = refresh(name)
+                  print(f"{name:<18} {entry['sha256'][:12]}  {entry['rows'] or '-'} rows  {entry['fetched']}")
+
+      elif command == 'verify':
+            for name in names:
+                  verify(name)
+                  print(f'{name:<18} ok')
+
+      elif command == 'list':
+            manifest = read_manifest()
+
+            for name in SOURCES:
+                  entry = manifest.get(name)
+                  status = f"{entry['sha256'][:12]}  {entry['fetched']}" if entry else 'not cached'
+                  print(f'{name:<18} {status}')
+
+      else:
+            raise OSError("\nack! usage: python3 reference.py [list | verify | refresh] [NAME ...]")
+
+
+if __name__ == "__main__":
+      main()
@@ -0,0 +1,387 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Incremental runner for the data pipeline
+
+Every stage declares the files it reads and writes under data/ (plus its
+own code). A stage is skipped when all of its outputs exist and none of
+its inputs have changed by content hash since its last successful run.
+Independent stages (e.g., state vs. county Census pulls) run in parallel,
+and each stage's wall time and peak memory (os.wait4) are recorded in
+data/.pipeline-state.json
+
+      python3 run_pipeline.py                       # everything that's out of date
+      python3 run_pipeline.py place-ids             # one stage + anything upstream of it
+      python3 run_pipeline.py --dry-run
+      python3 run_pipeline.py --force census-county --jobs 2
+
+Ian Richard Ferguson | Stanford University
+"""
+
+# ---- Imports
+import os, sys, glob, json, time, uuid, fnmatch, hashlib, argparse, subprocess
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from instrument import maxrss_mb
+
+
+# ---- Globals
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+STATE = 'data/.pipeline-state.json'
+
+PYTHON = sys.executable
+
+# Shared with every stage, so instrument.py spans from one invocation group together
+RUN_ID = uuid.uuid4().hex[:12]
+
+# Paths are relative to the repository root; inputs may be glob patterns
+STAGES = {
+      'reference-data': {'cwd': 'scripts',
+                         'cmd': [PYTHON, 'reference.py', 'refresh'],
+                         'inputs': ['scripts/reference.py'],
+                         'outputs': ['data/reference/county-centers.parquet',
+                                     'data/reference/geojson-counties-fips.json',
+                                     'data/reference/AFINN-111.txt']},
+
+      'census-state': {'cwd': 'scripts/census-acquisition',
+                       'cmd': [PYTHON, 'scrape_census.py', 'state'],
+                       'inputs': ['scripts/census-acquisition/scrape_census.py',
+                                  'scripts/census-acquisition/census_fetch.py',
+                                  'scripts/census-acquisition/api_call.json'],
+                       'outputs': ['data/state-demographics.parquet']},
+
+      'census-county': {'cwd': 'scripts/census-acquisition',
+                        'cmd': [PYTHON, 'scrape_census.py', 'county'],
+                        'inputs': ['scripts/census-acquisition/scrape_census.py',
+                                   'scripts/census-acquisition/census_fetch.py',
+                                   'scripts/census-acquisition/api_call.json'],
+                        'outputs': ['data/county-demographics.parquet']},
+
+      'state-ideology': {'cwd': 'scripts/census-acquisition',
+                         'cmd': [PYTHON, 'compile_frame.py'],
+                         'inputs': ['scripts/census-acquisition/compile_frame.py',
+                                    'scripts/census-acquisition/states.json',
+                                    'data/state-demographics.parquet',
+                                    'data/lawmaker-subset-106-117.*'],
+                         'outputs': ['data/state-ideo-data.parquet']},
+
+      'bin-demographics': {'cwd': 'scripts/hate-speech-classifier',
+                           'cmd': [PYTHON, 'bin_by_demo_change.py'],
+                           'inputs': ['scripts/hate-speech-classifier/bin_by_demo_change.py',
+                                      'data/county-demographics.parquet'],
+                           'outputs': ['data/demographic-data/tidy-population-changes.parquet']},
+
+      'random-fips': {'cwd': 'scripts/hate-speech-classifier',
+                      'cmd': [PYTHON, 'generate_random_fips.py'],
+                      'inputs': ['scripts/hate-speech-classifier/generate_random_fips.py',
+                                 'scripts/sampling.py',
+                                 'data/demographic-data/tidy-population-changes.*'],
+                      'outputs': ['data/tweet-data/fips-codes-to-scrape.json']},
+
+      'geo-data': {'cwd': 'scripts/hate-speech-classifier',
+                   'cmd': [PYTHON, 'generate_geo_data.py'],
+                   'inputs': ['scripts/hate-speech-classifier/generate_geo_data.py',
+                              'data/tweet-data/fips-codes-to-scrape.json',
+                              'data/reference/county-centers.parquet'],
+                   'outputs': ['data/tweet-data/geodata.parquet']},
+
+      # Adds place IDs to geodata in place
+      'place-ids': {'cwd': 'scripts/hate-speech-classifier',
+                    'cmd': [PYTHON, 'generate_place_ids.py'],
+                    'inputs': ['scripts/hate-speech-classifier/generate_place_ids.py',
+                               'scripts/hate-speech-classifier/geocode_cache.py',
+                               'data/tweet-data/geodata.parquet'],
+                    'outputs': ['data/tweet-data/geodata.parquet']},
+}
+
+
+# ---- Hashing
+class Hasher:
+      """
+      cache => {path: [size, mtime_ns, sha256]} from the previous run
+
+      Content hashes, but a file whose size and mtime haven't moved isn't re-read
+      """
+
+      def __init__(self, cache):
+            self.cache = cache
+
+      def file(self, PATH):
+            stat = os.stat(PATH)
+            known = self.cache.get(PATH)
+
+            if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+                  return known[2]
+
+            digest = hashlib.sha256()
+
+            with open(PATH, 'rb') as incoming:
+                  for block in iter(lambda: incoming.read(1 << 20), b''):
+                        digest.update(block)
+
+            self.cache[PATH] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+
+            return digest.hexdigest()
+
+      def path(self, PATH):
+            """
+            Returns sha256 of a file, or of every (relative path, hash) under a directory
+            """
+
+            if not os.path.isdir(PATH):
+                  return self.file(PATH)
+
+            digest = hashlib.sha256()
+
+            for base, dirs, files in sorted(os.walk(PATH)):
+                  dirs.sort()
+
+                  for name in sorted(files):
+                        full = os.path.join(base, name)
+                        digest.update(f'{os.path.relpath(full, PATH)}:{self.file(full)}\n'.encode())
+
+            return digest.hexdigest()
+
+
+# ---- Helpers
+def expand(PATTERN):
+      """
+      Returns repository-relative paths matching a declared input / output
+      """
+
+      return sorted(os.path.relpath(p, ROOT) for p in glob.glob(os.path.join(ROOT, PATTERN)))
+
+
+def upstream(STAGES):
+      """
+      Returns {stage: set of stages whose outputs it reads}
+      """
+
+      deps = {name: set() for name in STAGES}
+
+      for name, stage in STAGES.items():
+            for other, spec in STAGES.items():
+                  if other == name:
+                        continue
+
+                  if any(fnmatch.fnmatch(out, pattern) for out in spec['outputs'] for pattern in stage['inputs']):
+                        deps[name].add(other)
+
+      return deps
+
+
+def select(TARGETS, DEPS):
+      """
+      Returns the targets plus everything upstream of them
+      """
+
+      chosen, todo = set(), list(TARGETS)
+
+      while todo:
+            name = todo.pop()
+
+            if name not in chosen:
+                  chosen.add(name)
+                  todo.extend(DEPS[name])
+
+      return chosen
+
+
+def fingerprint(NAME, HASHER):
+      """
+      Returns {path: hash} over a stage's command and every file its inputs match
+      """
+
+      stage = STAGES[NAME]
+      prints = {'<command>': hashlib.sha256(' '.join(stage['cmd'][1:]).encode()).hexdigest()}
+
+      for pattern in stage['inputs']:
+            matches = expand(pattern)
+
+            if not matches:
+                  raise OSError(f'\nack! {NAME} needs {pattern}, which does not exist')
+
+            for path in matches:
+                  prints[path] = HASHER.path(os.path.join(ROOT, path))
+
+      return prints
+
+
+def up_to_date(NAME, RECORD, HASHER):
+      """
+      RECORD => Last successful run of this stage (or None)
+      """
+
+      # Always hashed first, so missing inputs surface even on a first run
+      current = fingerprint(NAME, HASHER)
+
+      if RECORD is None or not all(expand(out) for out in STAGES[NAME]['outputs']):
+            return False
+
+      return current == RECORD['inputs']
+
+
+def run_stage(NAME):
+      """
+      Runs one stage in its own process
+
+      Returns (exit code, wall seconds, peak RSS in MB)
+      """
+
+      stage = STAGES[NAME]
+      start = time.perf_counter()
+
+      # Scripts open their outputs directly, so the directories have to exist first
+      for out in stage['outputs']:
+            os.makedirs(os.path.dirname(os.path.join(ROOT, out)), exist_ok=True)
+
+      try:
+            process = subprocess.Popen(stage['cmd'], cwd=os.path.join(ROOT, stage['cwd']),
+                                       env={**os.environ, 'PIPELINE_RUN_ID': RUN_ID})
+      except FileNotFoundError:
+            print(f"\nack! {stage['cmd'][0]} is not installed")
+            return 127, 0.0, 0.0
+
+      # wait4 => the child's own resource usage, including its peak RSS
+      _, status, usage = os.wait4(process.pid, 0)
+      process.returncode = os.waitstatus_to_exitcode(status)
+
+      return process.returncode, time.perf_counter() - start, maxrss_mb(usage)
+
+
+def load_state():
+      path = os.path.join(ROOT, STATE)
+
+      if not os.path.exists(path):
+            return {'stages': {}, 'hashes': {}}
+
+      with open(path) as incoming:
+            return json.load(incoming)
+
+
+def save_state(STATE_DATA):
+      path = os.path.join(ROOT, STATE)
+      os.makedirs(os.path.dirname(path), exist_ok=True)
+
+      with open(f'{path}.tmp', 'w') as outgoing:
+            json.dump(STATE_DATA, outgoing, indent=4, sort_keys=True)
+
+      os.replace(f'{path}.tmp', path)
+
+
+# ---- Run script
+def main():
+      parser = argparse.ArgumentParser(description='Run out-of-date pipeline stages')
+      parser.add_argument('targets', nargs='*', help=f'Stages to bring up to date (default: all of {list(STAGES)})')
+      parser.add_argument('--jobs', type=int, default=2, help='Stages to run at once')
+      parser.add_argument('--force', nargs='*', default=[], help='Rerun these stages regardless of hashes')
+      parser.add_argument('--dry-run', action='store_true')
+      args = parser.parse_args()
+
+      # With no worker slots the scheduler would spin forever without submitting a stage
+      if args.jobs < 1:
+            parser.error(f'--jobs must be at least 1 (got {args.jobs})')
+
+      unknown = set(args.targets + args.force) - set(STAGES)
+
+      if unknown:
+            raise OSError(f'\nack! unknown stage(s) {sorted(unknown)} - choose from {list(STAGES)}')
+
+      deps = upstream(STAGES)
+      chosen = select(args.targets or list(STAGES), deps)
+
+      state = load_state()
+      hasher = Hasher(state['hashes'])
+
+      pending = [name for name in STAGES if name in chosen]
+      finished, failed, stale = set(), set(), set()
+
+      print(f"\n{'stage':<18}{'status':<12}{'wall (s)':>10}{'peak RSS (MB)':>15}")
+
+      with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+            running = {}
+
+            while pending or running:
+                  # Launch every stage whose upstream stages are done
+                  for name in list(pending):
+                        if deps[name] & failed:
+                              pending.remove(name)
+                              failed.add(name)
+                              print(f'{name:<18}{"blocked":<12}')
+                              continue
+
+                        if not (deps[name] & chosen) <= finished or len(running) >= args.jobs:
+                              continue
+
+                        pending.remove(name)
+
+                        # A dry run can't know what a stale upstream stage would write
+                        if args.dry_run and deps[name] & stale:
+                              finished.add(name)
+                              stale.add(name)
+                              print(f'{name:<18}{"would run":<12}')
+                              continue
+
+                        # Decided only now, after upstream stages may have changed its inputs
+                        try:
+                              current = name not in args.force and up_to_date(name, state['stages'].get(name), hasher)
+                        except OSError as e:
+                              # Can't be rebuilt here, but outputs produced elsewhere are fine to use
+                              if all(expand(out) for out in STAGES[name]['outputs']):
+                                    finished.add(name)
+                                    print(f'{name:<18}{"kept":<12}{str(e).strip()}')
+                              else:
+                                    failed.add(name)
+                                    print(f'{name:<18}{"missing":<12}{str(e).strip()}')
+                              continue
+
+                        if current:
+                              finished.add(name)
+                              print(f'{name:<18}{"up to date":<12}')
+                              continue
+
+                        if args.dry_run:
+                              finished.add(name)
+                              stale.add(name)
+                              print(f'{name:<18}{"would run":<12}')
+                              continue
+
+                        running[pool.submit(run_stage, name)] = name
+
+                  if not running:
+                        continue
+
+                  done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+                  for future in done:
+                        name = running.pop(future)
+                        code, seconds, peak = future.result()
+
+                        if code != 0:
+                              failed.add(name)
+                              print(f'{name:<18}{f"failed ({code})":<12}{seconds:>10.1f}{peak:>15.0f}')
+                              continue
+
+                        # Inputs are hashed after the run, so a stage that rewrites its own input stays clean
+                        state['stages'][name] = {'inputs': fingerprint(name, hasher),
+                                                 'outputs': {p: hasher.path(os.path.join(ROOT, p))
+                                                             for out in STAGES[name]['outputs'] for p in expand(out)},
+                                                 'wall_s': round(seconds, 3), 'peak_mb': round(peak, 1),
+                                                 'finished': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+                        finished.add(name)
+                        save_state(state)
+
+                        print(f'{name:<18}{"ran":<12}{seconds:>10.1f}{peak:>15.0f}')
+
+      if not args.dry_run:
+            save_state(state)
+
+      if failed:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+      main()
@@ -0,0 +1,145 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Seeded, vectorized stratified sampling without replacement
+
+* Strata are any combination of columns (e.g., hispanic_change_bin x nhw_change_bin)
+* Sample sizes per stratum come from equal, proportional or Neyman allocation
+* The whole frame is sampled in one grouped pass - every row gets a seeded
+  random key, rows are sorted by (stratum, key) and the first n_h rows of
+  each stratum are kept. Same frame + same seed => same sample
+
+      from sampling import stratified_sample
+      stratified_sample(DF, ['hispanic_change_bin'], N=300, METHOD='equal', SEED=101)
+
+Ian Richard Ferguson | Stanford University
+"""
+
+# ---- Imports
+import numpy as np
+
+
+# ---- Globals
+METHODS = ('equal', 'proportional', 'neyman')
+
+
+# ---- Helpers
+def round_allocation(TARGET, SIZES, N):
+      """
+      TARGET => Fractional sample size per stratum
+      SIZES => Rows available per stratum
+      N => Total sample size
+
+      Largest-remainder rounding, capped at each stratum's size. Capped
+      strata hand their shortfall to the rest in proportion to TARGET
+
+      Returns integer sample size per stratum
+      """
+
+      sizes = np.asarray(SIZES, dtype=np.int64)
+      target = np.asarray(TARGET, dtype=np.float64)
+      n = min(int(N), int(sizes.sum()))
+
+      capped = np.zeros(len(sizes), dtype=bool)
+
+      # Cap any stratum that can't fill its share, then re-split what's left among the rest
+      while True:
+            free = ~capped & (target > 0)
+            remaining = n - sizes[capped].sum()
+            share = np.where(free, target / max(target[free].sum(), 1e-300) * remaining, 0.0)
+
+            over = free & (share > sizes)
+
+            if not over.any():
+                  break
+
+            capped |= over
+
+      alloc = np.where(capped, sizes, np.floor(share)).astype(np.int64)
+      short = n - alloc.sum()
+
+      # Hand out leftover units by largest fractional part
+      remainder = np.where(free & (alloc < sizes), share - np.floor(share), -1.0)
+
+      for i in np.argsort(-remainder, kind='stable')[:max(short, 0)]:
+            if remainder[i] >= 0:
+                  alloc[i] += 1
+
+      return alloc
+
+
+def allocate(SIZES, N, METHOD='equal', STDS=None):
+      """
+      SIZES => Rows per stratum
+      N => Total sample size
+      METHOD => equal (N / strata each), proportional (n_h ~ N_h) or neyman (n_h ~ N_h * S_h)
+      STDS => Standard deviation per stratum (neyman only)
+
+      Returns integer sample size per stratum
+      """
+
+      sizes = np.asarray(SIZES, dtype=np.float64)
+
+      if METHOD == 'equal':
+            target = np.ones(len(sizes))
+      elif METHOD == 'proportional':
+            target = sizes
+      elif METHOD == 'neyman':
+            if STDS is None:
+                  raise ValueError('Neyman allocation needs a standard deviation per stratum')
+            target = sizes * np.nan_to_num(np.asarray(STDS, dtype=np.float64))
+      else:
+            raise ValueError(f'Unknown allocation {METHOD} - use one of {METHODS}')
+
+      return round_allocation(target, SIZES, N)
+
+
+def stratified_sample(DF, STRATA, N, METHOD='equal', SEED=101, VARIABLE=None):
+      """
+      DF => Pandas DataFrame object
+      STRATA => Column name(s) defining the strata
+      N => Total sample size across strata
+      METHOD => equal, proportional or neyman
+      SEED => Seed for the NumPy generator
+      VARIABLE => Column whose within-stratum spread drives Neyman allocation
+
+      Returns the sampled rows, grouped by stratum in sorted stratum order
+      """
+
+      strata = [STRATA] if isinstance(STRATA, str) else list(STRATA)
+
+      # Rows without a stratum can't be sampled
+      DF = DF.dropna(subset=strata)
+      grouped = DF.groupby(strata, sort=True, observed=True)
+
+      codes = grouped.ngroup().to_numpy()
+      sizes = np.bincount(codes, minlength=grouped.ngroups)
+
+      stds = grouped[VARIABLE].std(ddof=1).to_numpy() if METHOD == 'neyman' else None
+      alloc = allocate(sizes, N, METHOD, stds)
+
+      # One random key per row => a without-replacement shuffle of every stratum at once
+      keys = np.random.default_rng(SEED).random(len(DF))
+      order = np.lexsort((keys, codes))
+
+      starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+      rank = np.arange(len(DF)) - starts[codes[order]]
+
+      return DF.iloc[order[rank < alloc[codes[order]]]]
+
+
+def allocation_table(DF, STRATA, N, METHOD='equal', VARIABLE=None):
+      """
+      Returns stratum sizes and sample sizes side by side, for a quick check
+      """
+
+      strata = [STRATA] if isinstance(STRATA, str) else list(STRATA)
+      grouped = DF.groupby(strata, sort=True, observed=True)
+
+      table = grouped.size().rename('rows').to_frame()
+      stds = grouped[VARIABLE].std(ddof=1).to_numpy() if METHOD == 'neyman' else None
+      table['sampled'] = allocate(table['rows'].to_numpy(), N, METHOD, stds)
+
+      return table
@@ -0,0 +1,306 @@
+#!/bin/python3
+
+"""
+About this Script
+
+Shared storage layer for every pipeline artifact under data/
+
+* Tables are written as typed, zstd-compressed Parquet (PATH.parquet)
+* A CSV copy (PATH.csv) is kept alongside for the R scripts
+* Reads support column projection and predicate pushdown, e.g.
+
+      read_table('../../data/tweet-data/all-tweets-scraped',
+                 COLUMNS=['Tweet', 'fips'],
+                 FILTERS=[('hispanic-pop-change', '==', 'high')])
+
+* Legacy trees with only PATH.csv are still readable (FIPS are re-padded)
+
+Import from any script with
+
+      sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+      from storage import read_table, write_table
+
+Ian Richard Ferguson | Stanford University
+"""
+
+# ---- Imports
+import os, re, json, shutil, operator
+import pandas as pd
+import pyarrow.dataset as ds
+
+
+# ---- Globals
+COMPRESSION = 'zstd'
+
+OPERATORS = {'==': operator.eq, '=': operator.eq, '!=': operator.ne,
+             '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+             'in': lambda col, val: col.isin(val), 'not in': lambda col, val: ~col.isin(val)}
+
+
+# ---- Helpers
+def normalize_fips(SERIES):
+      """
+      SERIES => Column of FIPS codes (int, float, or str)
+
+      Returns five-character, zero-padded FIPS strings (1234 => 01234)
+      """
+
+      padded = SERIES.astype('string').str.replace(r'\.0$', '', regex=True).str.zfill(5)
+
+      return padded.astype(object).where(SERIES.notna(), None)
+
+
+def dedupe_columns(DF):
+      """
+      DF => Pandas DataFrame object
+
+      Parquet needs unique column names, so repeats are suffixed
+      the same way read_csv would name them (year, year.1, ...)
+      """
+
+      seen, names = {}, []
+
+      for col in DF.columns:
+            if col in seen:
+                  seen[col] += 1
+                  names.append(f'{col}.{seen[col]}')
+            else:
+                  seen[col] = 0
+                  names.append(col)
+
+      return DF.set_axis(names, axis=1)
+
+
+def apply_filters(DF, FILTERS):
+      """
+      DF => Pandas DataFrame object
+      FILTERS => List of (column, op, value) tuples, ANDed together
+
+      In-memory fallback for predicate pushdown on CSV-only tables
+      """
+
+      mask = pd.Series(True, index=DF.index)
+
+      for col, op, val in FILTERS:
+            mask &= OPERATORS[op](DF[col], val)
+
+      return DF[mask].reset_index(drop=True)
+
+
+def parquet_path(PATH):
+      """
+      PATH => Table path without extension
+
+      Returns the Parquet file, or a directory of Parquet parts, if either exists
+      """
+
+      for candidate in [f'{PATH}.parquet', PATH]:
+            if os.path.exists(candidate):
+                  return candidate
+
+      return None
+
+
+# ---- Read / write
+def write_table(DF, PATH, CSV_EXPORT=True):
+      """
+      DF => Pandas DataFrame object
+      PATH => Table path without extension (e.g., ../../data/geodata)
+      CSV_EXPORT => Also write PATH.csv for the R scripts
+
+      Writes a typed, compressed Parquet file (and optional CSV copy)
+      """
+
+      DF = dedupe_columns(DF.reset_index(drop=True))
+
+      if 'fips' in DF.columns:
+            DF['fips'] = normalize_fips(DF['fips'])
+
+      os.makedirs(os.path.dirname(PATH) or '.', exist_ok=True)
+      DF.to_parquet(f'{PATH}.parquet', compression=COMPRESSION, index=False)
+
+      if CSV_EXPORT:
+            DF.to_csv(f'{PATH}.csv', index=False)
+
+
+def read_table(PATH, COLUMNS=None, FILTERS=None):
+      """
+      PATH => Table path without extension
+      COLUMNS => Optional list of columns to load (projection)
+      FILTERS => Optional list of (column, op, value) tuples (predicate pushdown)
+
+      Reads Parquet when available, otherwise falls back to PATH.csv
+      """
+
+      source = parquet_path(PATH)
+
+      if source is not None:
+            return pd.read_parquet(source, columns=COLUMNS, filters=FILTERS)
+
+      # CSV fallback => keep FIPS as strings and drop stray index columns
+      usecols = None if COLUMNS is None else list(set(COLUMNS) | {c for c, _, _ in FILTERS or []})
+      DF = pd.read_csv(f'{PATH}.csv', usecols=usecols, dtype={'fips': str})
+      DF = DF.loc[:, ~DF.columns.astype(str).str.startswith('Unnamed:')]
+
+      if 'fips' in DF.columns:
+            DF['fips'] = normalize_fips(DF['fips'])
+
+      if FILTERS:
+            DF = apply_filters(DF, FILTERS)
+
+      return DF if COLUMNS is None else DF[COLUMNS]
+
+
+def iter_table(PATH, BATCH_SIZE=100_000, COLUMNS=None):
+      """
+      PATH => Table path without extension
+      BATCH_SIZE => Rows per yielded frame
+      COLUMNS => Optional list of columns to load (projection)
+
+      Yields the table as a stream of DataFrames so memory stays bounded
+      """
+
+      source = parquet_path(PATH)
+
+      if source is not None:
+            dataset = ds.dataset(source, format='parquet')
+
+            for batch in dataset.to_batches(columns=COLUMNS, batch_size=BATCH_SIZE):
+                  if batch.num_rows > 0:
+                        yield batch.to_pandas()
+
+            return
+
+      for DF in pd.read_csv(f'{PATH}.csv', usecols=COLUMNS, dtype={'fips': str}, chunksize=BATCH_SIZE):
+            DF = DF.loc[:, ~DF.columns.astype(str).str.startswith('Unnamed:')]
+
+            if 'fips' in DF.columns:
+                  DF['fips'] = normalize_fips(DF['fips'])
+
+            yield DF
+
+
+def drop_table(PATH):
+      """
+      PATH => Table path without extension
+
+      Removes every stored form of a table (file, partitioned directory, CSV copy)
+      so a stale copy can never shadow a fresh one
+      """
+
+      for candidate in [f'{PATH}.parquet', f'{PATH}.csv']:
+            if os.path.exists(candidate):
+                  os.remove(candidate)
+
+      if os.path.isdir(PATH):
+            shutil.rmtree(PATH)
+
+
+# ---- Streaming sink
+class PartitionedSink:
+      """
+      PATH => Directory for an append-only, partitioned table
+      DTYPES => Optional dtype map applied to every part (keeps schemas aligned)
+
+      Each batch is flushed to its own Parquet part as soon as it arrives and
+      recorded in PATH/_manifest.jsonl, so a restarted run can skip completed
+      partitions and memory stays flat regardless of total rows. read_table(PATH)
+      reads the directory back as one table
+      """
+
+      def __init__(self, PATH, DTYPES=None):
+            os.makedirs(PATH, exist_ok=True)
+
+            self.path = PATH
+            self.dtypes = DTYPES or {}
+            self.manifest = os.path.join(PATH, '_manifest.jsonl')
+            self.entries = self._load_manifest()
+            self.completed = {tuple(entry['key']) for entry in self.entries}
+
+
+      def _load_manifest(self):
+            if not os.path.exists(self.manifest):
+                  return []
+
+            with open(self.manifest, 'rb+') as incoming:
+                  data = incoming.read()
+
+                  # A crash mid-append can leave a torn last line - cut it, or the next
+                  # checkpoint would be appended onto the fragment and lost with it
+                  complete = data.rfind(b'\n') + 1
+
+                  if complete < len(data):
+                        incoming.truncate(complete)
+
+            entries = []
+
+            for line in data[:complete].decode('utf-8').splitlines():
+                  try:
+                        entries.append(json.loads(line))
+                  except json.JSONDecodeError:
+                        continue
+
+            return entries
+
+
+      def done(self, KEY):
+            """
+            KEY => Tuple naming the partition (e.g., (fips, place_id))
+
+            Returns True if this partition was already flushed
+            """
+
+            return tuple(str(k) for k in KEY) in self.completed
+
+
+      def write(self, DF, KEY):
+            """
+            DF => Pandas DataFrame object for one partition
+            KEY => Tuple naming the partition (e.g., (fips, place_id))
+
+            Atomically writes the part, then checkpoints it in the manifest
+            """
+
+            key = tuple(str(k) for k in KEY)
+            name = None
+
+            # Empty batches are still checkpointed so they aren't re-requested
+            if len(DF) > 0:
+                  name = '_'.join(re.sub(r'[^A-Za-z0-9-]', '-', k) for k in key) + '.parquet'
+                  temp = os.path.join(self.path, f'.{name}.tmp')
+
+                  DF.astype(self.dtypes).to_parquet(temp, compression=COMPRESSION, index=False)
+                  os.replace(temp, os.path.join(self.path, name))
+
+            entry = {'key': list(key), 'rows': len(DF), 'file': name}
+
+            with open(self.manifest, 'a') as outgoing:
+                  outgoing.write(json.dumps(entry) + '\n')
+                  outgoing.flush()
+                  os.fsync(outgoing.fileno())
+
+            self.entries.append(entry)
+            self.completed.add(key)
+
+
+      def parts(self):
+            """
+            Returns part file paths in the order they were written
+            """
+
+            return [os.path.join(self.path, e['file']) for e in self.entries if e['file']]
+
+
+      def export_csv(self, CSV_PATH):
+            """
+            CSV_PATH => Destination CSV (for the R scripts)
+
+            Streams parts to a single CSV one at a time
+            """
+
+            header = True
+
+            with open(CSV_PATH, 'w') as outgoing:
+                  for part in self.parts():
+                        pd.read_parquet(part).to_csv(outgoing, index=False, header=header)
+                        header = False